@@ -2,15 +2,21 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+import uuid
 from datetime import date
 from main import (
     greeting, lookup, scheduling_new, scheduling_returning, confirmation, mailing, setup_reminder_system,
-    validate_email, validate_phone
+    validate_email, validate_phone, release_slot_hold, next_slot_page, previous_slot_page, SLOT_CONFLICT_ERROR,
+    llm_metrics
 )
 import logging
 from logging.handlers import RotatingFileHandler
 from src.synthetic_data_generator import DataGenerator
 from src.google_calender import get_google_calendar_service,create_google_calendar_event
+from src.schedule_store import SCHEDULE_XLSX_PATH, get_schedule_store
+from src.availability import get_availability_index
+from src.appointment_journal import APPOINTMENTS_EXPORT_PATH, get_appointment_journal
+from src.patient_index import get_patient_index
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -28,56 +34,22 @@ if not logger.handlers:
     logger.addHandler(console_handler)
 
 def update_slot_availability(doctor_name, location, date, start_time, end_time, available=False):
-    """Update the availability status of a specific slot in doctor_schedules.xlsx"""
+    """Update the availability status of the slots between start_time and end_time in the schedule store"""
     try:
-        file_path = "data/doctor_schedules.xlsx"
-        
-        if not os.path.exists(file_path):
-            return False
-        
-        # Read the current schedule
-        df = pd.read_excel(file_path)
-        
-        if end_time != start_time:
-            # Convert time strings to datetime for comparison
-            start_dt = pd.to_datetime(start_time, format='%H:%M').time()
-            end_dt = pd.to_datetime(end_time, format='%H:%M').time()
-            
-            # Find slots that match the criteria
-            mask = (
-                (df['doctor_name'] == doctor_name) &
-                (df['location'] == location) &
-                (df['date'] == date) &
-                (pd.to_datetime(df['start_time'], format='%H:%M').dt.time >= start_dt) &
-                (pd.to_datetime(df['end_time'], format='%H:%M').dt.time <= end_dt)
-            )
-            
-            # Update availability
-            df.loc[mask, 'available'] = available
-            
-            # Save back to Excel
-            df.to_excel(file_path, index=False)
-            return True
-        else:
-            # For 30-minute appointments, find exact match
-            mask = (
-                (df['doctor_name'] == doctor_name) &
-                (df['location'] == location) &
-                (df['date'] == date) &
-                (df['start_time'] == start_time) &
-                (df['end_time'] == end_time)
-            )
-            
-            df.loc[mask, 'available'] = available
-            df.to_excel(file_path, index=False)
-            return True
+        # Point update through the store's lookup index plus a bit flip in the
+        # cached availability bitmap; the workbook is only rewritten by an
+        # explicit export, never on the booking path
+        updated = get_availability_index().set_availability(
+            doctor_name, location, date, start_time, end_time, available
+        )
+        return updated > 0
             
     except Exception as e:
         print(f"Error updating slot availability: {e}")
         return False
 
 def restore_slot_availability(doctor_name, location, date, start_time, end_time):
-    """Restore the availability status of a specific slot in doctor_schedules.xlsx (set to TRUE)"""
+    """Restore the availability status of a specific slot in the schedule store (set to TRUE)"""
     return update_slot_availability(doctor_name, location, date, start_time, end_time, available=True)
 
 # Calendly Integration Functions
@@ -340,6 +312,9 @@ def initialize_session_state():
     
     if 'show_form' not in st.session_state:
         st.session_state.show_form = False
+    
+    if 'step_memo' not in st.session_state:
+        st.session_state.step_memo = {}
 
 # def display_chat_history():
 #     """Display chat history"""
@@ -367,6 +342,56 @@ def add_to_chat_history(message_type: str, content: str):
         'timestamp': datetime.now()
     })
 
+@st.cache_data(show_spinner=False)
+def _cached_schedule_metadata(db_path, generation):
+    """Doctor/location catalogue shared by every session; generation is part of
+    the cache key, so importing a new workbook invalidates it"""
+    return get_schedule_store(db_path).catalog()
+
+def get_schedule_metadata():
+    """Doctors, locations and the doctor -> locations map for the forms"""
+    store = get_schedule_store()
+    return _cached_schedule_metadata(store.db_path, store.generation())
+
+def memoized_step(step, inputs, compute):
+    """Return compute() for a step, reusing the last result while inputs are unchanged
+
+    Streamlit reruns the whole script on every widget change; inputs holds the
+    state fields the step reads plus the version of the data behind it, so the
+    step only runs again when one of them changes. Only the latest result per
+    step is kept, so a session holds at most one entry per step.
+    """
+    cached = st.session_state.step_memo.get(step)
+    if cached is not None and cached[0] == inputs:
+        logger.info(f"Reusing {step} result")
+        return cached[1]
+    result = compute()
+    st.session_state.step_memo[step] = (inputs, result)
+    return result
+
+def _lookup_inputs(appt):
+    """What a lookup depends on: the patient's name and date of birth, and the
+    version of data/patients.csv (changed by every registration or outside edit)"""
+    return (appt.get('patient_name'), str(appt.get('date_of_birth')), get_patient_index().data_version())
+
+def _scheduling_inputs(appt):
+    """What a scheduling run depends on: the patient's choices, the page and
+    selection on screen, and the store's version for that doctor/location
+    (bumped by every booking and import)"""
+    doctor, location = appt.get('doctor') or '', appt.get('location') or ''
+    # Assigned here rather than by the first scheduling run, so that run's key already has it
+    session_id = appt.setdefault('session_id', uuid.uuid4().hex)
+    return (
+        appt.get('patient_type'), appt.get('appointment_duration'), doctor, location,
+        appt.get('slot_cursor'), appt.get('slot_selection'), session_id,
+        get_schedule_store().version(doctor, location),
+    )
+
+def _run_scheduling(appt):
+    if appt.get('patient_type') == 'existing':
+        return scheduling_returning(appt)
+    return scheduling_new(appt)
+
 def process_greeting_step():
     """Process the greeting step with form inputs"""
     logger.info("Entering process_greeting_step")
@@ -374,10 +399,10 @@ def process_greeting_step():
     
     with st.form("greeting_form"):
         col1, col2 = st.columns(2)
-        df=pd.read_excel("data/doctor_schedules.xlsx")
+        metadata = get_schedule_metadata()
         with col1:
-            # Get unique doctors and locations from the schedule
-            doctors = df["doctor_name"].unique().tolist()
+            # Get unique doctors and locations from the cached schedule catalogue
+            doctors = metadata["doctors"]
             patient_name = st.text_input("Full Name", placeholder="Enter your full name")
             
             date_of_birth = st.date_input("Date of Birth",value=None,min_value=date(1900, 1, 1))
@@ -388,7 +413,7 @@ def process_greeting_step():
         
         with col2:
             # Get unique locations from the schedule
-            locations = df["location"].unique().tolist()
+            locations = metadata["locations"]
             location = st.selectbox(
                 "Location",
                 locations
@@ -436,8 +461,9 @@ def process_lookup_step():
     logger.info("Entering process_lookup_step")
     st.markdown('<div class="step-header"> Patient Lookup</div>', unsafe_allow_html=True)
     
-    # Process lookup
-    state = lookup(st.session_state.appointment_state)
+    # Process lookup, once per patient and version of data/patients.csv
+    appt = st.session_state.appointment_state
+    state = memoized_step('lookup', _lookup_inputs(appt), lambda: lookup(appt))
     st.session_state.appointment_state.update(state)
     logger.info(f"Lookup result patient_type={state.get('patient_type')} patient_id={state.get('patient_id')}")
     
@@ -470,11 +496,9 @@ def process_scheduling_step():
     
     st.info(f"**Patient Type:** {patient_type.title()} | **Duration:** {duration}")
     
-    # Process scheduling
-    if patient_type == 'existing':
-        state = scheduling_returning(st.session_state.appointment_state)
-    else:
-        state = scheduling_new(st.session_state.appointment_state)
+    # Process scheduling; reruns with nothing changed reuse the last listing
+    appt = st.session_state.appointment_state
+    state = memoized_step('scheduling', _scheduling_inputs(appt), lambda: _run_scheduling(appt))
     
     st.session_state.appointment_state.update(state)
     
@@ -491,13 +515,24 @@ def process_scheduling_step():
         logger.warning("No available slots found")
         return False
     
-    st.success(f"Found {len(available_slots)} available appointment slots!")
-    logger.info(f"Found {len(available_slots)} available slots")
-    add_to_chat_history('bot', f"I found {len(available_slots)} available slots for {st.session_state.appointment_state.get('doctor')} at {st.session_state.appointment_state.get('location')}.")
+    page_number = len(st.session_state.appointment_state.get('slot_cursor_history') or []) + 1
+    st.success(f"Showing {len(available_slots)} available appointment slots (page {page_number})")
+    logger.info(f"Showing {len(available_slots)} available slots on page {page_number}")
+    add_to_chat_history('bot', f"Here are available slots for {st.session_state.appointment_state.get('doctor')} at {st.session_state.appointment_state.get('location')}.")
     
-    # Display available slots
+    # Display available slots, one page at a time
     st.markdown("### Available Time Slots:")
     
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        if st.button("◀ Earlier slots", disabled=page_number == 1, use_container_width=True):
+            previous_slot_page(st.session_state.appointment_state)
+            st.rerun()
+    with next_col:
+        if st.button("Later slots ▶", disabled=not state.get('next_slot_cursor'), use_container_width=True):
+            next_slot_page(st.session_state.appointment_state)
+            st.rerun()
+    
     slot_options = []
     for i, slot in enumerate(available_slots, 1):
         slot_display = f"{slot['date']} | {slot['start_time']} - {slot['end_time']}"
@@ -516,14 +551,12 @@ def process_scheduling_step():
         slot_index = slot_options.index(selected_slot_display)
         selected_slot = available_slots[slot_index]
         
-        # Update state with selection
-        st.session_state.appointment_state['slot_selection'] = str(slot_index + 1)
+        # Select by the slot's token: resolved without listing slots again
+        st.session_state.appointment_state['slot_selection'] = selected_slot['slot_token']
         
         # Re-process scheduling with selection
-        if patient_type == 'existing':
-            state = scheduling_returning(st.session_state.appointment_state)
-        else:
-            state = scheduling_new(st.session_state.appointment_state)
+        appt = st.session_state.appointment_state
+        state = memoized_step('scheduling', _scheduling_inputs(appt), lambda: _run_scheduling(appt))
         
         st.session_state.appointment_state.update(state)
         
@@ -645,30 +678,13 @@ def process_confirmation_step():
             logger.info("Confirm Appointment clicked")
             st.session_state.appointment_state['confirmation_input'] = 'yes'
             
-            # Process confirmation
+            # Process confirmation; this atomically reserves the slot in the schedule store
             state = confirmation(st.session_state.appointment_state)
             st.session_state.appointment_state.update(state)
             
             if state.get('appointment_confirmed'):
                 logger.info(f"Appointment confirmed id={state.get('appointment_id')}")
-                # Update slot availability to FALSE
-                doctor_name = st.session_state.appointment_state.get('doctor')
-                location = st.session_state.appointment_state.get('location')
-                date = st.session_state.appointment_state.get('selected_time_date')
-                start_time = st.session_state.appointment_state.get('selected_time_start')
-                end_time = st.session_state.appointment_state.get('selected_time_end')
-                
-                # Update the slot availability
-                slot_updated = update_slot_availability(
-                    doctor_name, location, date, start_time, end_time, available=False
-                )
-                logger.info(f"Slot availability update result: {slot_updated}")
-                
-                if slot_updated:
-                    st.success(" Appointment confirmed successfully! Slot marked as unavailable.")
-                else:
-                    st.success(" Appointment confirmed successfully!")
-                    st.warning(" Note: Could not update slot availability in schedule.")
+                st.success(" Appointment confirmed successfully! Slot marked as unavailable.")
                 
                 
                 # Create Calendly event
@@ -690,6 +706,14 @@ def process_confirmation_step():
                 
                 
                 return True
+            elif SLOT_CONFLICT_ERROR in state.get('errors', []):
+                # Another session confirmed this slot first; send the patient back to pick again
+                st.error(SLOT_CONFLICT_ERROR)
+                logger.warning(f"Slot conflict date={state.get('selected_time_date')} start={state.get('selected_time_start')}")
+                for key in ('slot_selection', 'selected_slot', 'selected_time_date', 'selected_time_start', 'selected_time_end'):
+                    st.session_state.appointment_state.pop(key, None)
+                st.session_state.current_step = "scheduling"
+                return False
             else:
                 st.error("Failed to confirm appointment. Please try again.")
                 logger.error("Appointment confirmation failed")
@@ -701,8 +725,8 @@ def process_confirmation_step():
             state = confirmation(st.session_state.appointment_state)
             st.session_state.appointment_state.update(state)
             
-            # If there was a selected slot, restore its availability
-            if st.session_state.appointment_state.get('selected_slot'):
+            # If this session reserved the slot, restore its availability
+            if st.session_state.appointment_state.get('slot_reserved'):
                 doctor_name = st.session_state.appointment_state.get('doctor')
                 location = st.session_state.appointment_state.get('location')
                 date = st.session_state.appointment_state.get('selected_time_date')
@@ -714,11 +738,15 @@ def process_confirmation_step():
                     doctor_name, location, date, start_time, end_time
                 )
                 
+                st.session_state.appointment_state['slot_reserved'] = False
+                
                 if slot_restored:
                     st.warning("Appointment cancelled. Slot availability restored.")
                 else:
                     st.warning("Appointment cancelled.")
             else:
+                # Not booked yet: let other patients have the held slot right away
+                release_slot_hold(st.session_state.appointment_state)
                 st.warning("Appointment cancelled.")
             
             add_to_chat_history('bot', "I understand you'd like to cancel. Please let me know if you need any assistance.")
@@ -727,6 +755,7 @@ def process_confirmation_step():
     with col3:
         if st.button(" Start Over", use_container_width=True):
             # Reset session state
+            release_slot_hold(st.session_state.appointment_state)
             st.session_state.appointment_state = {
                 "errors": [],
                 "retry_count": 0,
@@ -735,6 +764,7 @@ def process_confirmation_step():
                 "current_step": "greeting"
             }
             st.session_state.chat_history = []
+            st.session_state.step_memo = {}
             st.session_state.current_step = "greeting"
             st.rerun()
     
@@ -851,6 +881,9 @@ def main():
             st.write(f"**Type:** {st.session_state.appointment_state.get('patient_type', 'Unknown').title()}")
             if st.session_state.appointment_state.get('appointment_id'):
                 st.write(f"**Appointment ID:** {st.session_state.appointment_state.get('appointment_id')}")
+        
+        with st.expander("LLM metrics"):
+            st.json(llm_metrics())
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -897,6 +930,7 @@ def main():
         
         if st.button(" Reset Session", use_container_width=True):
             # Reset everything
+            release_slot_hold(st.session_state.appointment_state)
             st.session_state.appointment_state = {
                 "errors": [],
                 "retry_count": 0,
@@ -905,14 +939,17 @@ def main():
                 "current_step": "greeting"
             }
             st.session_state.chat_history = []
+            st.session_state.step_memo = {}
             st.session_state.current_step = "greeting"
             logger.info("Session reset to greeting")
             st.rerun()
         
         if st.button(" View Appointments", use_container_width=True):
-            # Show appointments export
-            if os.path.exists("data/appointments_export.xlsx"):
-                df = pd.read_excel("data/appointments_export.xlsx")
+            # Compact the booking journal into the admin workbook, then show it
+            journal = get_appointment_journal()
+            journal.compact(APPOINTMENTS_EXPORT_PATH)
+            df = journal.to_dataframe()
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No appointments exported yet.")
@@ -927,8 +964,9 @@ def main():
         
         if st.button(" View Schedule", use_container_width=True):
             # Show doctor schedule with availability status
-            if os.path.exists("data/doctor_schedules.xlsx"):
-                df = pd.read_excel("data/doctor_schedules.xlsx")
+            store = get_schedule_store()
+            if not store.is_empty():
+                df = store.to_dataframe()
                 # Show only available slots
                 available_slots = df[df['available'] == True]
                 st.dataframe(available_slots)
@@ -936,6 +974,11 @@ def main():
             else:
                 st.info("No schedule data available.")
         
+        if st.button(" Export Schedule", use_container_width=True):
+            # Materialize the schedule store as a workbook for admins
+            exported = get_schedule_store().export_excel(SCHEDULE_XLSX_PATH)
+            st.success(f"Exported {exported} schedule rows to {SCHEDULE_XLSX_PATH}")
+        
         # Calendly Integration Section
         st.markdown("###  Calendar Integration")
         
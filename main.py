@@ -1,12 +1,7 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_groq import ChatGroq
 from typing import Dict, List, Optional, TypedDict, Literal
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-from langchain.prompts import PromptTemplate
 import re 
-import json
-import pandas as pd
 from datetime import datetime, timedelta
 import os
 import uuid
@@ -14,20 +9,57 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-import smtplib
-from src.helpers import clean_llm_response, get_available_slots
+from src.helpers import (
+    encode_slot_token, get_slot_page, parse_duration_minutes, slot_from_token
+)
+from src.schedule_store import SCHEDULE_DB_PATH, get_schedule_store
+from src.availability import get_availability_index
+from src.patient_index import get_patient_index
+from src.appointment_journal import get_appointment_journal
+from src.llm_cache import cache_key, get_llm_cache
+from src.input_parser import extract_greeting, extract_greeting_fields, extract_insurance
+from src.llm_backends import LLM_BACKEND, create_llm
+from src.llm_chains import LLM_WARMUP, ChainRegistry
+from src.llm_gateway import GatewayBusyError, get_llm_gateway
+from src.smtp_pool import get_smtp_pool
+from src.llm_guard import (
+    LLM_CALL_TIMEOUT_SECONDS, LLM_MAX_ATTEMPTS, CircuitOpenError, get_circuit_breaker, guarded_call
+)
 from src.synthetic_data_generator import DataGenerator
 load_dotenv()
 
+# LLM_BACKEND=fake swaps Groq for the offline stand-in; its own name keeps their cache entries apart
+LLM_MODEL = 'gemma2-9b-it' if LLM_BACKEND == 'groq' else LLM_BACKEND
+
 try:
-    llm = ChatGroq(model='gemma2-9b-it')
+    llm = create_llm(LLM_BACKEND, LLM_MODEL, timeout=LLM_CALL_TIMEOUT_SECONDS)
 except Exception as e:
-    print(f"Warning: Could not initialize ChatGroq: {e}")
+    print(f"Warning: Could not initialize the {LLM_BACKEND} LLM backend: {e}")
     llm = None
 
+# Extraction chains are composed once and share the client's connection pool
+chains = ChainRegistry(llm)
+if LLM_WARMUP:
+    chains.warm_up_in_background()
+
 EMAIL_SENDER = os.getenv('EMAIL_SENDER')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 
+SLOT_CONFLICT_ERROR = "Selected slot is no longer available. Please choose another time."
+# Shown when the LLM is unavailable, so the next attempt can be parsed without it
+GREETING_FORMAT_HINT = "Please enter it as: Name: <full name>, DOB: YYYY-MM-DD, Doctor: <doctor>, Location: <location>"
+INSURANCE_FORMAT_HINT = "Please enter it as: Carrier: <carrier>, Member ID: <id>, Group: <group>"
+# Greeting fields, each with the error shown while it is missing or invalid
+GREETING_FIELDS = ["Full Name", "Date of Birth", "Preferred Doctor", "Location"]
+GREETING_FIELD_ERRORS = {
+    "Full Name": "Valid full name required",
+    "Date of Birth": "Date of birth in YYYY-MM-DD format required",
+    "Preferred Doctor": "Preferred doctor required",
+    "Location": "Location required",
+}
+# Minutes kept clear of other bookings before and after each visit (multiple of 15)
+SLOT_BUFFER_MINUTES = int(os.getenv('SLOT_BUFFER_MINUTES', '0'))
+
 class AgentState(TypedDict):
     # Patient Information
     patient_name: str
@@ -35,7 +67,7 @@ class AgentState(TypedDict):
     doctor: str
     location: str
     patient_type: Literal['new', 'existing']
-    appointment_duration: Literal['30 minutes', '60 minutes']
+    appointment_duration: str  # e.g. '30 minutes'; any multiple of 15 minutes is bookable
     selected_time_start: str
     selected_time_end: str
     selected_time_date: str
@@ -47,15 +79,21 @@ class AgentState(TypedDict):
     patient_email: str
     patient_contact: str
     appointment_confirmed: bool
+    slot_reserved: bool
+    session_id: str
     patient_id: Optional[int]
     message: str
     response: str
-    available_slots: List[Dict]
+    available_slots: List[Dict]  # current page only
+    slot_cursor: Optional[str]
+    next_slot_cursor: Optional[str]
+    slot_cursor_history: List[Optional[str]]
     user_input: bool
     mail_sent: bool
     errors: List[str]
     retry_count: int
     current_step: str
+    greeting_fields: Dict  # fields validated on earlier greeting attempts
 
 def validate_email(email: str) -> bool:
  
@@ -75,22 +113,70 @@ def validate_date_format(date_str: str) -> bool:
     except ValueError:
         return False
 
-def safe_llm_call(prompt_template: PromptTemplate, input_data: dict, max_retries: int = 3):
-    """Safely call LLM with retry logic"""
+def safe_llm_call(chain_name: str, input_data: dict, max_retries: int = LLM_MAX_ATTEMPTS):
+    """Safely call one of the registered extraction chains, within the step's latency budget"""
     if not llm:
-        return {"error": "LLM not initialized"}
+        return {"error": "LLM not initialized", "llm_unavailable": True}
     
-    for attempt in range(max_retries):
-        try:
-            chain = prompt_template | llm
-            response = chain.invoke(input_data)
-            extracted_text = response.content if hasattr(response, 'content') else response.text
-            return clean_llm_response(extracted_text)
-        except Exception as e:
-            if attempt == max_retries - 1:
-                print(f"LLM call failed after {max_retries} attempts: {e}")
-                return {"error": str(e)}
-            print(f"LLM call attempt {attempt + 1} failed, retrying...")
+    # Same prompt, model and (whitespace-normalized) input: reuse the earlier extraction
+    cache = get_llm_cache()
+    key = cache_key(chains.prompt(chain_name).template, LLM_MODEL, input_data)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    gateway = get_llm_gateway()
+    
+    def extract(timeout):
+        # Only rebind the request deadline when the remaining budget is tighter than the client's
+        # Structured (schema-validated) output where the model supports it, one-pass JSON scan otherwise
+        return chains.extract(chain_name, input_data, timeout if timeout < LLM_CALL_TIMEOUT_SECONDS else None)
+    
+    def call():
+        # Each attempt waits for a rate-limit token and a concurrency slot within its own deadline;
+        # a full gateway is our limit, not the endpoint failing: it neither counts for nor against
+        # the breaker (nor closes a half-open one) and doesn't use up an attempt
+        result = guarded_call(lambda timeout: gateway.run(extract, timeout), get_circuit_breaker(),
+                              attempts=max_retries, local_errors=(GatewayBusyError,))
+        cache.put(key, result)
+        return result
+    
+    try:
+        # Sessions sending the same request at the same time share one call (and its retries)
+        result = gateway.coalesce(key, call)
+    except CircuitOpenError as e:
+        print(f"LLM call skipped: {e}")
+        return {"error": str(e), "llm_unavailable": True}
+    except Exception as e:
+        print(f"LLM call failed: {e}")
+        return {"error": str(e)}
+    return dict(result)
+
+def llm_metrics() -> Dict:
+    """Extraction cache counters, per-chain latencies, the circuit breaker's state and gateway queueing"""
+    return {
+        "cache": get_llm_cache().stats(),
+        "latency": chains.latency.summary(),
+        "circuit": get_circuit_breaker().snapshot(),
+        "gateway": get_llm_gateway().metrics(),
+    }
+
+def _valid_greeting_fields(result: Dict) -> Dict:
+    """The extracted greeting fields that pass validation"""
+    fields = {}
+    full_name = result.get("Full Name", "Not Provided")
+    if full_name != "Not Provided" and len(full_name.strip()) >= 2:
+        fields["Full Name"] = full_name
+    dob = result.get("Date of Birth", "Not Provided")
+    if dob != "Not Provided" and validate_date_format(dob):
+        fields["Date of Birth"] = dob
+    doctor = result.get("Preferred Doctor", "Not Provided")
+    if doctor != "Not Provided":
+        fields["Preferred Doctor"] = doctor if doctor.startswith("Dr.") else f"Dr. {doctor}"
+    location = result.get("Location", "Not Provided")
+    if location != "Not Provided":
+        fields["Location"] = location
+    return fields
 
 def greeting(state: AgentState) -> AgentState:
     """Process greeting information - pure logic function"""
@@ -108,65 +194,43 @@ def greeting(state: AgentState) -> AgentState:
     if not message.strip():
         return {**state, "errors": ["Empty input provided"], "retry_count": state['retry_count'] + 1}
         
-    extract_info_prompt = PromptTemplate(
-        input_variables=["message"],
-        template="""
-        Extract the following information from the user's message. Be very careful about date formats.
-        
-        User Message: {message}
-        
-        Extract:
-        1. Full Name (first and last name)
-        2. Date of Birth (must be in YYYY-MM-DD format, convert if necessary)
-        3. Preferred Doctor (should include "Dr." title if not present)
-        4. Location (clinic location)
-        
-        Return JSON format:
-        {{
-            "Full Name": "<name or Not Provided>",
-            "Date of Birth": "<YYYY-MM-DD or Not Provided>", 
-            "Preferred Doctor": "<Dr. Name or Not Provided>",
-            "Location": "<location or Not Provided>"
-        }}
-        
-        JSON:"""
-    )
+    # Fields validated on an earlier attempt are kept; a retry only has to supply the rest
+    known = state.get('greeting_fields') or {}
+    missing = [field for field in GREETING_FIELDS if field not in known]
     
-    result = safe_llm_call(extract_info_prompt, {"message": message})
+    # Key/value input (the Streamlit form's) is parsed directly; only free text goes to the LLM
+    catalog = get_schedule_store().catalog()
+    result = extract_greeting(message, catalog["doctors"], catalog["locations"])
+    if result is None and known:
+        # A labelled or bare answer for just the missing fields, else a prompt asking only for them
+        result = extract_greeting_fields(message, missing, catalog["doctors"], catalog["locations"])
+        if result is None:
+            result = safe_llm_call("greeting_follow_up", {"message": message, "fields": ", ".join(missing)})
+            if "error" not in result:
+                result = {field: value for field, value in result.items() if field in missing}
+    if result is None:
+        result = safe_llm_call("greeting", {"message": message})
     
     if "error" in result:
-        return {**state, "errors": ["Failed to process information"], "retry_count": state['retry_count'] + 1}
-        
-    full_name = result.get("Full Name", "Not Provided")
-    dob = result.get("Date of Birth", "Not Provided") 
-    doctor = result.get("Preferred Doctor", "Not Provided")
-    location = result.get("Location", "Not Provided")
+        errors = ["Failed to process information"]
+        if result.get("llm_unavailable"):
+            errors.append(GREETING_FORMAT_HINT)
+        return {**state, "errors": errors, "retry_count": state['retry_count'] + 1}
     
-    current_errors = []
+    fields = {**known, **_valid_greeting_fields(result)}
+    current_errors = [GREETING_FIELD_ERRORS[field] for field in GREETING_FIELDS if field not in fields]
     
-    if full_name == "Not Provided" or len(full_name.strip()) < 2:
-        current_errors.append("Valid full name required")
-        
-    if dob == "Not Provided" or not validate_date_format(dob):
-        current_errors.append("Date of birth in YYYY-MM-DD format required")
-        
-    if doctor == "Not Provided":
-        current_errors.append("Preferred doctor required")
-    elif not doctor.startswith("Dr."):
-        doctor = f"Dr. {doctor}"
-        
-    if location == "Not Provided":
-        current_errors.append("Location required")
-        
     if current_errors:
-        return {**state, "errors": current_errors, "retry_count": state['retry_count'] + 1}
+        return {**state, "errors": current_errors, "greeting_fields": fields,
+                "retry_count": state['retry_count'] + 1}
     
     return {
         **state,
-        "patient_name": full_name,
-        "date_of_birth": dob,
-        "doctor": doctor,
-        "location": location,
+        "patient_name": fields["Full Name"],
+        "date_of_birth": fields["Date of Birth"],
+        "doctor": fields["Preferred Doctor"],
+        "location": fields["Location"],
+        "greeting_fields": {},
         "errors": [],
         "retry_count": 0
     }
@@ -182,33 +246,15 @@ def lookup(state: AgentState) -> AgentState:
                 "errors": ["Insufficient patient information"]}
     
     try:
-        # Load patient database
-        file_path = "data/patients.csv"
-        
-        if not os.path.exists(file_path):
-            # Create empty database
-            df = pd.DataFrame(columns=[
-                "id", "full_name", "last_name", "date_of_birth", 
-                "email", "phone", "insurance_carrier", "insurance_member_id", 
-                "insurance_group", "created_date"
-            ])
-            os.makedirs("data", exist_ok=True)
-            df.to_csv(file_path, index=False)
-        else:
-            df = pd.read_csv(file_path)
+        # Indexed lookup: reads only the matching record, rebuilding the index
+        # first if data/patients.csv changed outside the app
+        patient_row = get_patient_index().lookup(state['patient_name'], state['date_of_birth'])
         
-        # Search for patient (case-insensitive)
-        match = df[
-            (df['full_name'].str.lower() == state['patient_name'].lower()) & 
-            (df['date_of_birth'] == state['date_of_birth'])
-        ]
-        
-        if not match.empty:
-            patient_row = match.iloc[0]
+        if patient_row is not None:
             
             return {
                 **state,
-                "patient_id": int(patient_row['id']),
+                "patient_id": int(float(patient_row['id'])),
                 "patient_type": "existing",
                 "appointment_duration": "30 minutes",
                 "insurance_carrier": patient_row.get('insurance_carrier', ''),
@@ -241,31 +287,114 @@ def scheduling_returning(state: AgentState) -> AgentState:
     
     return _scheduling_logic(state, "existing", "30 minutes")
 
+def _load_slot_page(state: AgentState, duration_minutes: int, holder: str) -> Dict:
+    """Current page of slots (picked by state['slot_cursor']) and the cursor for the next one"""
+    def load():
+        return get_slot_page(
+            SCHEDULE_DB_PATH, duration_minutes, state['doctor'], state['location'],
+            cursor=state.get('slot_cursor'), holder=holder, buffer_minutes=SLOT_BUFFER_MINUTES
+        )
+    
+    page, next_cursor = load()
+    if not page and state.get('slot_cursor'):
+        # Everything past the cursor got booked meanwhile: go back to the first page
+        state['slot_cursor'], state['slot_cursor_history'] = None, []
+        page, next_cursor = load()
+    for slot in page:
+        slot['slot_token'] = encode_slot_token(duration_minutes, state['doctor'], state['location'], slot)
+    return {"available_slots": page, "next_slot_cursor": next_cursor}
+
+def _select_slot(state: AgentState, duration_minutes: int, holder: str) -> AgentState:
+    """Resolve state['slot_selection'] (a slot_token or a 1-based number into the
+    listing the patient saw) without listing slots again; only the chosen slot
+    is re-checked, then held"""
+    selection = str(state['slot_selection']).strip()
+    listing = state.get('available_slots') or []
+    
+    selected_slot = slot_from_token(selection, duration_minutes, state['doctor'], state['location'])
+    if selected_slot is None:
+        try:
+            slot_index = int(selection) - 1
+        except ValueError:
+            return {**state, "errors": ["Invalid slot selection. Please enter a number"]}
+        if not 0 <= slot_index < len(listing):
+            return {**state, "errors": [f"Invalid slot selection. Please choose 1-{len(listing)}"]}
+        selected_slot = slot_from_token(
+            listing[slot_index].get('slot_token'), duration_minutes, state['doctor'], state['location']
+        )
+        if selected_slot is None:
+            # The listing was for another doctor, location or visit length
+            return {**state, "errors": ["Slot list is out of date. Please choose again"],
+                    "slot_selection": None, **_load_slot_page(state, duration_minutes, holder)}
+    
+    # Re-check just this slot (buffer included) and hold it while the patient
+    # finishes insurance and confirmation
+    still_open = get_availability_index().is_open(
+        state['doctor'], state['location'], selected_slot['date'], selected_slot['start_time'],
+        duration_minutes, holder=holder, buffer_minutes=SLOT_BUFFER_MINUTES
+    )
+    if not still_open or not get_schedule_store().place_hold(
+            state['doctor'], state['location'], selected_slot['date'],
+            selected_slot['start_time'], selected_slot['end_time'], holder):
+        # Fresh listing; the old selection must not carry over onto it
+        return {**state, "errors": [SLOT_CONFLICT_ERROR],
+                "slot_selection": None, **_load_slot_page(state, duration_minutes, holder)}
+    
+    return {
+        **state,
+        "selected_time_start": selected_slot['start_time'],
+        "selected_time_end": selected_slot['end_time'], 
+        "selected_time_date": selected_slot['date'],
+        "selected_slot": selected_slot,
+        "errors": []
+    }
+
+def next_slot_page(state: AgentState) -> bool:
+    """Move the slot listing to the following page; False on the last page"""
+    if not state.get('next_slot_cursor'):
+        return False
+    state['slot_cursor_history'] = (state.get('slot_cursor_history') or []) + [state.get('slot_cursor')]
+    state['slot_cursor'] = state['next_slot_cursor']
+    state.pop('slot_selection', None)
+    return True
+
+def previous_slot_page(state: AgentState) -> bool:
+    """Move the slot listing back one page; False on the first page"""
+    history = state.get('slot_cursor_history') or []
+    if not history:
+        return False
+    state['slot_cursor'], state['slot_cursor_history'] = history[-1], history[:-1]
+    state.pop('slot_selection', None)
+    return True
+
 def _scheduling_logic(state: AgentState, patient_type: str, duration: str) -> AgentState:
     """Scheduling logic - pure function"""
     state['current_step'] = f'scheduling_{patient_type}'
+    # Identifies this booking session's slot hold
+    holder = state.setdefault('session_id', uuid.uuid4().hex)
     
     try:
-        file_path = "data/doctor_schedules.xlsx"
+        store = get_schedule_store()
         
-        if not os.path.exists(file_path):
+        if store.is_empty():
             return {**state, "errors": ["Schedule database not available"]}
             
-        df = pd.read_excel(file_path)
+        # Recomputed only when a schedule import bumps the store's generation
+        doctor_locations_map = store.catalog()["doctor_locations"]
         
         # Validate doctor
         if not state.get('doctor') or state['doctor'] == "Not Provided":
-            available_doctors = df['doctor_name'].unique().tolist()
+            available_doctors = list(doctor_locations_map)
             return {**state, "errors": ["Doctor selection required"], 
                     "available_doctors": available_doctors}
         
-        if state['doctor'] not in df['doctor_name'].values:
-            available_doctors = df['doctor_name'].unique().tolist()
+        if state['doctor'] not in doctor_locations_map:
+            available_doctors = list(doctor_locations_map)
             return {**state, "errors": [f"Doctor {state['doctor']} not available"], 
                     "available_doctors": available_doctors}
         
         # Validate location
-        doctor_locations = df[df['doctor_name'] == state['doctor']]['location'].unique().tolist()
+        doctor_locations = doctor_locations_map[state['doctor']]
         
         if not state.get('location') or state['location'] == "Not Provided":
             return {**state, "errors": ["Location selection required"], 
@@ -275,39 +404,25 @@ def _scheduling_logic(state: AgentState, patient_type: str, duration: str) -> Ag
             return {**state, "errors": [f"Location {state['location']} not available"], 
                     "available_locations": doctor_locations}
         
-        # Get available slots
-        duration_minutes = 60 if duration == "60 minutes" else 30
-        available_slots = get_available_slots(file_path, duration_minutes, state['doctor'], state['location'])
+        # an appointment_duration already in the state (e.g. "45 minutes")
+        # overrides the patient type's default length
+        duration_minutes = parse_duration_minutes(state.get('appointment_duration') or duration)
+        
+        # A selection from a listing already shown resolves against that listing
+        if state.get('slot_selection') is not None and state.get('available_slots'):
+            return _select_slot(state, duration_minutes, holder)
         
-        if not available_slots:
+        # Get available slots: only the current page is fetched and kept in the state
+        page = _load_slot_page(state, duration_minutes, holder)
+        
+        if not page['available_slots']:
             return {**state, "errors": ["No available appointment slots"], 
-                    "available_slots": []}
+                    **page}
         
         # Get user selection from state
-        slot_selection = state.get('slot_selection')
-        if slot_selection is None:
-            return {**state, "available_slots": available_slots, "errors": []}
-        
-        try:
-            slot_index = int(slot_selection) - 1
-            if 0 <= slot_index < len(available_slots):
-                selected_slot = available_slots[slot_index]
-                
-                return {
-                    **state,
-                    "selected_time_start": selected_slot['start_time'],
-                    "selected_time_end": selected_slot['end_time'], 
-                    "selected_time_date": selected_slot['date'],
-                    "selected_slot": selected_slot,
-                    "available_slots": available_slots,
-                    "errors": []
-                }
-            else:
-                return {**state, "errors": [f"Invalid slot selection. Please choose 1-{len(available_slots)}"], 
-                        "available_slots": available_slots}
-        except ValueError:
-            return {**state, "errors": ["Invalid slot selection. Please enter a number"], 
-                    "available_slots": available_slots}
+        if state.get('slot_selection') is None:
+            return {**state, **page, "errors": []}
+        return _select_slot({**state, **page}, duration_minutes, holder)
         
     except Exception as e:
         return {**state, "errors": [f"Scheduling system error: {str(e)}"]}
@@ -330,33 +445,15 @@ def insurance(state: AgentState) -> AgentState:
     if not message.strip():
         return {**state, "errors": ["Insurance information cannot be empty"], "retry_count": retry_count + 1}
         
-    # Extract insurance info
-    extract_info_prompt = PromptTemplate(
-        input_variables=["message"],
-        template="""
-        Extract insurance information from the user's message:
-        
-        User Message: {message}
-        
-        Extract:
-        1. Insurance Carrier (company name)
-        2. Member ID (ID number)  
-        3. Group (group number/name)
-        
-        JSON format:
-        {{
-            "Insurance Carrier": "<carrier or Not Provided>",
-            "Member ID": "<id or Not Provided>", 
-            "Group": "<group or Not Provided>"
-        }}
-        
-        JSON:"""
-    )
-    
-    result = safe_llm_call(extract_info_prompt, {"message": message})
+    result = extract_insurance(message)
+    if result is None:
+        result = safe_llm_call("insurance", {"message": message})
     
     if "error" in result:
-        return {**state, "errors": ["Failed to process insurance information"], "retry_count": retry_count + 1}
+        errors = ["Failed to process insurance information"]
+        if result.get("llm_unavailable"):
+            errors.append(INSURANCE_FORMAT_HINT)
+        return {**state, "errors": errors, "retry_count": retry_count + 1}
         
     carrier = result.get("Insurance Carrier", "Not Provided")
     member_id = result.get("Member ID", "Not Provided")
@@ -419,6 +516,16 @@ def confirmation(state: AgentState) -> AgentState:
     confirm = state.get('confirmation_input', '').strip().lower()
     
     if confirm in ['yes', 'y', 'confirm', 'ok', 'correct']:
+        # Claim the slot first: compare-and-set in the schedule store, so two
+        # sessions can never both confirm the same slot
+        if not state.get('slot_reserved'):
+            try:
+                reserved = _reserve_selected_slot(state)
+            except Exception as e:
+                return {**state, "appointment_confirmed": False, "errors": [f"Scheduling system error: {str(e)}"]}
+            if not reserved:
+                return {**state, "appointment_confirmed": False, "errors": [SLOT_CONFLICT_ERROR]}
+        
         # Generate appointment ID
         appointment_id = f"APT-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
         
@@ -430,6 +537,7 @@ def confirmation(state: AgentState) -> AgentState:
         return {
             **state,
             "appointment_confirmed": True,
+            "slot_reserved": True,
             "appointment_id": appointment_id,
             "errors": []
         }
@@ -440,27 +548,28 @@ def confirmation(state: AgentState) -> AgentState:
     else:
         return {**state, "errors": ["Please answer 'yes' or 'no'"]}
 
+def _reserve_selected_slot(state: AgentState) -> bool:
+    """Mark the selected slot booked only if it is still available and not held by another session"""
+    return get_availability_index().reserve_slot(
+        state['doctor'], state['location'], state['selected_time_date'],
+        state['selected_time_start'], state['selected_time_end'], holder=state.get('session_id')
+    )
+
+def release_slot_hold(state: AgentState) -> bool:
+    """Give up this session's slot hold, e.g. on cancel or start over"""
+    if not state.get('session_id'):
+        return False
+    try:
+        return get_schedule_store().release_hold(state['session_id']) > 0
+    except Exception as e:
+        print(f"Error releasing slot hold: {e}")
+        return False
+
 def _save_new_patient(state: AgentState) -> int:
     """Save new patient to database"""
     try:
-        file_path = "data/patients.csv"
-        
-        # Load existing data or create new
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.DataFrame(columns=[
-                "id", "full_name",  "date_of_birth",
-                "email", "phone", "insurance_carrier", "insurance_member_id",
-                "insurance_group", "created_date"
-            ])
-        
-        # Generate new ID
-        new_id = len(df) + 1 if not df.empty else 1
-        
         # Create patient record
         new_patient = {
-            "id": new_id,
             "full_name": state['patient_name'],
             "date_of_birth": state['date_of_birth'],
             "email": state['patient_email'],
@@ -471,41 +580,41 @@ def _save_new_patient(state: AgentState) -> int:
             "created_date": datetime.now().isoformat()
         }
         
-        df = pd.concat([df, pd.DataFrame([new_patient])], ignore_index=True)
-        df.to_csv(file_path, index=False)
-        
-        return new_id
+        # Append-only write; the ID comes from the index's durable sequence
+        return get_patient_index().add_patient(new_patient)
         
     except Exception as e:
         return None
 
+def _build_email(to_email: str, subject: str, body: str, attachment_path: Optional[str] = None) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    
+    # Add attachment if provided
+    if attachment_path and os.path.exists(attachment_path):
+        with open(attachment_path, "rb") as attachment:
+            part = MIMEBase("application", "octet-stream")
+            part.set_payload(attachment.read())
+            encoders.encode_base64(part)
+            part.add_header(
+                "Content-Disposition", 
+                f"attachment; filename={os.path.basename(attachment_path)}"
+            )
+            msg.attach(part)
+    return msg
+
 def send_email(to_email: str, subject: str, body: str, attachment_path: Optional[str] = None) -> bool:
 
     try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Add attachment if provided
-        if attachment_path and os.path.exists(attachment_path):
-            with open(attachment_path, "rb") as attachment:
-                part = MIMEBase("application", "octet-stream")
-                part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition", 
-                    f"attachment; filename={os.path.basename(attachment_path)}"
-                )
-                msg.attach(part)
+        msg = _build_email(to_email, subject, body, attachment_path)
         
         # Send email if credentials available
         if EMAIL_SENDER and EMAIL_PASSWORD:
-            with smtplib.SMTP("smtp.gmail.com", 587) as server:
-                server.starttls()
-                server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-                server.send_message(msg)
+            # Reuses a logged-in connection instead of connecting, STARTTLS and login per message
+            get_smtp_pool(EMAIL_SENDER, EMAIL_PASSWORD).send(msg)
             return True
         else:
             print("📧 Email credentials not configured - email content prepared")
@@ -577,43 +686,35 @@ MediCare Appointment System
     else:
         return {**state, "mail_sent": False}
 
-def _export_appointment_to_excel(state: AgentState):
+def _export_appointment_to_excel(state: AgentState) -> bool:
+    """Journal the booking; the admin workbook is materialized later by compaction"""
     try:
-        file_path = "data/appointments_export.xlsx"
-        
         appointment_data = {
-            "Appointment ID": [state['appointment_id']],
-            "Date Created": [datetime.now().isoformat()],
-            "Patient Name": [state['patient_name']],
-            "Patient Type": [state['patient_type']],
-            "Date of Birth": [state['date_of_birth']],
-            "Doctor": [state['doctor']],
-            "Location": [state['location']],
-            "Appointment Date": [state['selected_time_date']],
-            "Start Time": [state['selected_time_start']],
-            "End Time": [state['selected_time_end']],
-            "Duration": [state['appointment_duration']],
-            "Insurance Carrier": [state['insurance_carrier']],
-            "Member ID": [state['insurance_member_id']],
-            "Group": [state['insurance_group']],
-            "Email": [state['patient_email']],
-            "Phone": [state['patient_contact']],
-            "Email Sent": [state.get('mail_sent', False)]
+            "Appointment ID": state['appointment_id'],
+            "Date Created": datetime.now().isoformat(),
+            "Patient Name": state['patient_name'],
+            "Patient Type": state['patient_type'],
+            "Date of Birth": state['date_of_birth'],
+            "Doctor": state['doctor'],
+            "Location": state['location'],
+            "Appointment Date": state['selected_time_date'],
+            "Start Time": state['selected_time_start'],
+            "End Time": state['selected_time_end'],
+            "Duration": state['appointment_duration'],
+            "Insurance Carrier": state['insurance_carrier'],
+            "Member ID": state['insurance_member_id'],
+            "Group": state['insurance_group'],
+            "Email": state['patient_email'],
+            "Phone": state['patient_contact'],
+            "Email Sent": state.get('mail_sent', False)
         }
         
-        new_df = pd.DataFrame(appointment_data)
-        
-        if os.path.exists(file_path):
-            existing_df = pd.read_excel(file_path)
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-        else:
-            combined_df = new_df
-            os.makedirs("data", exist_ok=True)
-        
-        combined_df.to_excel(file_path, index=False)
+        get_appointment_journal().append(appointment_data)
+        return True
         
     except Exception as e:
-        pass  # Silent failure
+        print(f"Appointment export failed for {state.get('appointment_id')}: {e}")
+        return False
 
 def setup_reminder_system(state: AgentState) -> AgentState:
     """Setup automated reminder system - pure logic function"""
@@ -648,6 +749,55 @@ def setup_reminder_system(state: AgentState) -> AgentState:
     except Exception as e:
         return {**state, "reminders_set": False}
 
+def send_reminders(states: List[AgentState], now: Optional[datetime] = None, pool=None) -> int:
+    """Email every reminder of these bookings that is due and not yet sent, as one batch
+
+    The batch goes out back to back over one pooled SMTP connection (pool, or
+    the shared one). A reminder is marked sent only once the server accepted
+    it; one that fails, or can't go out because no credentials are
+    configured, stays unsent for the next run. Returns how many were sent.
+    """
+    now = now or datetime.now()
+    due = [
+        (state, reminder)
+        for state in states if state.get("reminders_set") and state.get("patient_email")
+        for reminder in state.get("reminders", [])
+        if reminder["date"] <= now and not reminder.get("sent")
+    ]
+    if not due:
+        return 0
+    if pool is None:
+        if not (EMAIL_SENDER and EMAIL_PASSWORD):
+            print(f"📧 Email credentials not configured - {len(due)} due reminders not sent")
+            return 0
+        pool = get_smtp_pool(EMAIL_SENDER, EMAIL_PASSWORD)
+    
+    messages = [
+        _build_email(
+            state['patient_email'],
+            f"Appointment Reminder - {state.get('appointment_id', '')}",
+            f"Dear {state.get('patient_name', 'Patient')},\n\n{reminder['message']}\n\n"
+            f"Doctor: {state.get('doctor')}\nDate: {state.get('selected_time_date')}\n"
+            f"Time: {state.get('selected_time_start')}\nLocation: {state.get('location')}\n\n"
+            f"MediCare Appointment System",
+        )
+        for state, reminder in due
+    ]
+    try:
+        results = pool.send_many(messages)
+    except Exception as e:
+        print(f"Reminder batch failed: {e}")
+        return 0
+    
+    sent = 0
+    for (state, reminder), error in zip(due, results):
+        if error is None:
+            reminder["sent"] = True
+            sent += 1
+        else:
+            print(f"Reminder to {state['patient_email']} failed: {error}")
+    return sent
+
 def handle_errors(state: AgentState) -> str:
     """Route based on errors in state"""
     errors = state.get('errors', [])
@@ -777,18 +927,29 @@ def main():
             print(f"Error: {state['errors'][0]}")
             return
         
-        # Show available slots and get selection
+        # Show available slots a page at a time and get selection
         available_slots = state.get('available_slots', [])
         if available_slots:
-            print(f"\n Found {len(available_slots)} available slots:")
-            print("=" * 50)
-            
-            for i, slot in enumerate(available_slots, 1):
-                print(f"{i:2}. {slot['date']} | {slot['start_time']} - {slot['end_time']}")
-            
+            show_page = True
             while True:
                 try:
-                    selection = input(f"\nSelect slot (1-{len(available_slots)}): ")
+                    available_slots = state.get('available_slots', [])
+                    if show_page:
+                        print(f"\n Available slots (page {len(state.get('slot_cursor_history') or []) + 1}):")
+                        print("=" * 50)
+                        for i, slot in enumerate(available_slots, 1):
+                            print(f"{i:2}. {slot['date']} | {slot['start_time']} - {slot['end_time']}")
+                        show_page = False
+                    
+                    selection = input(f"\nSelect slot (1-{len(available_slots)}, n = next page, p = previous page): ")
+                    if selection.strip().lower() in ('n', 'p'):
+                        moved = next_slot_page(state) if selection.strip().lower() == 'n' else previous_slot_page(state)
+                        if not moved:
+                            print("  No more slots in that direction")
+                            continue
+                        state = scheduling_returning(state) if patient_type == 'existing' else scheduling_new(state)
+                        show_page = True
+                        continue
                     state['slot_selection'] = selection
                     
                     # Re-process scheduling with selection
@@ -803,6 +964,8 @@ def main():
                         break
                     else:
                         print(f" {state['errors'][0]}")
+                        # The page was refreshed after a conflict: show it again
+                        show_page = SLOT_CONFLICT_ERROR in state['errors']
                         
                 except ValueError:
                     print("  Please enter a valid number")
@@ -905,7 +1068,7 @@ def main():
             
             if state.get('mail_sent'):
                 print("Confirmation email sent successfully!")
-                print(f" Appointment exported to data/appointments_export.xlsx")
+                print(f" Appointment recorded (run 'python src/appointment_journal.py compact' to refresh data/appointments_export.xlsx)")
             else:
                 print(" Failed to send confirmation email")
             
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Append-only journal of confirmed appointments
+
+Bookings are appended to a SQLite table on the hot path, so booking latency
+does not grow with history. compact() materializes
+data/appointments_export.xlsx for admins, only when there are new entries.
+
+Usage: python src/appointment_journal.py compact [xlsx_path]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import get_connection
+
+APPOINTMENTS_DB_PATH = "data/appointments.db"
+APPOINTMENTS_EXPORT_PATH = "data/appointments_export.xlsx"
+EXPORT_COLUMNS = [
+    "Appointment ID", "Date Created", "Patient Name", "Patient Type", "Date of Birth",
+    "Doctor", "Location", "Appointment Date", "Start Time", "End Time", "Duration",
+    "Insurance Carrier", "Member ID", "Group", "Email", "Phone", "Email Sent"
+]
+# A compactor that died mid-write stops blocking others after this long
+COMPACT_LEASE_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    appointment_id TEXT,
+    record TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_id ON appointments (appointment_id);
+CREATE TABLE IF NOT EXISTS journal_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class AppointmentJournal:
+    def __init__(self, db_path: str = APPOINTMENTS_DB_PATH):
+        self.db_path = db_path
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM journal_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def append(self, record: dict) -> int:
+        """Journal one booking; returns its sequence number
+
+        Idempotent on the appointment ID: the mailing step reruns with every
+        Streamlit interaction, and a booking already journaled keeps its entry.
+        """
+        conn = self._conn()
+        appointment_id = record.get("Appointment ID")
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO appointments (appointment_id, record) VALUES (?, ?)",
+            (appointment_id, json.dumps(record, default=str)),
+        )
+        if cursor.rowcount:
+            return cursor.lastrowid
+        return conn.execute("SELECT seq FROM appointments WHERE appointment_id = ?", (appointment_id,)).fetchone()[0]
+
+    def last_seq(self) -> int:
+        row = self._conn().execute("SELECT MAX(seq) FROM appointments").fetchone()
+        return row[0] or 0
+
+    def pending_count(self) -> int:
+        """Bookings journaled since the last compaction"""
+        conn = self._conn()
+        compacted = int(self._meta(conn, "compacted_seq", 0))
+        return conn.execute("SELECT COUNT(*) FROM appointments WHERE seq > ?", (compacted,)).fetchone()[0]
+
+    def to_dataframe(self, upto: int = None) -> pd.DataFrame:
+        """Every journaled booking, or those with seq <= upto"""
+        rows = self._conn().execute(
+            "SELECT record FROM appointments WHERE seq <= ? ORDER BY seq",
+            (upto if upto is not None else sys.maxsize,),
+        ).fetchall()
+        records = [json.loads(row[0]) for row in rows]
+        df = pd.DataFrame(records)
+        extra = [c for c in df.columns if c not in EXPORT_COLUMNS]
+        return df.reindex(columns=EXPORT_COLUMNS + extra)
+
+    def import_excel(self, xlsx_path: str = APPOINTMENTS_EXPORT_PATH) -> int:
+        """One-time seed from an existing export so earlier bookings are kept"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._meta(conn, "seeded") or not os.path.exists(xlsx_path):
+                conn.execute("ROLLBACK")
+                return 0
+            df = pd.read_excel(xlsx_path)
+            records = [
+                {k: (None if pd.isna(v) else v) for k, v in record.items()}
+                for record in df.to_dict("records")
+            ]
+            conn.executemany(
+                "INSERT OR IGNORE INTO appointments (appointment_id, record) VALUES (?, ?)",
+                [(r.get("Appointment ID"), json.dumps(r, default=str)) for r in records],
+            )
+            self._set_meta(conn, "seeded", 1)
+            last = conn.execute("SELECT MAX(seq) FROM appointments").fetchone()[0] or 0
+            self._set_meta(conn, "compacted_seq", last)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(records)
+
+    def _claim_compaction(self, conn, force: bool, xlsx_path: str):
+        """The last seq to compact up to, holding the compaction lease; None if there is nothing
+        to do or another compactor holds the lease"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last = conn.execute("SELECT MAX(seq) FROM appointments").fetchone()[0] or 0
+            up_to_date = int(self._meta(conn, "compacted_seq", 0)) >= last and os.path.exists(xlsx_path)
+            if (up_to_date and not force) or float(self._meta(conn, "compacting_until", 0)) > time.time():
+                conn.execute("ROLLBACK")
+                return None
+            self._set_meta(conn, "compacting_until", time.time() + COMPACT_LEASE_SECONDS)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return last
+
+    def _release_compaction(self, conn, compacted_seq: int = None):
+        """Drop the lease, recording compacted_seq if the workbook was written"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if compacted_seq is not None:
+                previous = int(self._meta(conn, "compacted_seq", 0))
+                self._set_meta(conn, "compacted_seq", max(previous, compacted_seq))
+            conn.execute("DELETE FROM journal_meta WHERE key = 'compacting_until'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def compact(self, xlsx_path: str = APPOINTMENTS_EXPORT_PATH, force: bool = False) -> int:
+        """Materialize the journal as a workbook; returns rows written (0 if already
+        up to date, or if another compactor is already at it)
+
+        Only claiming the lease and recording the result take the journal's
+        write lock, each for one short transaction: the rows are read and the
+        workbook written with no lock held, so bookings never wait on an
+        export. The lease makes concurrent compactors skip rather than repeat
+        the work.
+        """
+        conn = self._conn()
+        last = self._claim_compaction(conn, force, xlsx_path)
+        if last is None:
+            return 0
+        compacted = None
+        try:
+            df = self.to_dataframe(upto=last)
+            directory = os.path.dirname(xlsx_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write to a temp file of our own and swap it in, so readers never see a half-written workbook
+            fd, tmp_path = tempfile.mkstemp(dir=directory or ".", suffix=".xlsx")
+            os.close(fd)
+            try:
+                df.to_excel(tmp_path, index=False)
+                os.replace(tmp_path, xlsx_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            compacted = last
+        finally:
+            self._release_compaction(conn, compacted)
+        return len(df)
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_appointment_journal(db_path: str = APPOINTMENTS_DB_PATH,
+                            xlsx_path: str = APPOINTMENTS_EXPORT_PATH) -> AppointmentJournal:
+    """Shared journal per database file; seeds itself from the existing export on first use"""
+    with _journals_lock:
+        journal = _journals.get(db_path)
+        if journal is None:
+            journal = AppointmentJournal(db_path)
+            journal.import_excel(xlsx_path)
+            _journals[db_path] = journal
+        return journal
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        path = sys.argv[2] if len(sys.argv) > 2 else APPOINTMENTS_EXPORT_PATH
+        written = get_appointment_journal(xlsx_path=path).compact(path)
+        print(f"Wrote {written} appointments to {path}" if written else f"{path} is already up to date")
+    else:
+        print(__doc__)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+In-memory availability bitmaps over the schedule store
+
+Each (doctor, location, date) is one DayBitmap: the day is cut into
+UNIT_MINUTES units and bit u of an int stands for unit u (09:00 is unit 36).
+Finding N contiguous free units is a few shifts and ANDs instead of parsing
+and pairing "HH:MM" rows, so any visit length that is a multiple of the unit
+(15, 30, 45, 90, ... minutes) costs the same, and booking or restoring a slot
+flips its bits. An optional buffer keeps that many minutes clear of other
+bookings before and after each visit.
+
+Bitmaps are cached per doctor/location and checked against the store's
+version counter on every read, so writes from other sessions or processes
+are picked up without re-reading the whole schedule.
+"""
+
+import bisect
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.schedule_store import SCHEDULE_DB_PATH, get_schedule_store, normalize_date
+
+UNIT_MINUTES = 15
+
+
+def time_to_unit(value: str) -> int:
+    """"HH:MM" -> unit index from midnight"""
+    hours, minutes = str(value).strip().split(":")[:2]
+    offset = int(hours) * 60 + int(minutes)
+    if offset % UNIT_MINUTES:
+        raise ValueError(f"{value} is not on the {UNIT_MINUTES}-minute grid")
+    return offset // UNIT_MINUTES
+
+
+def unit_to_time(unit: int) -> str:
+    return f"{unit * UNIT_MINUTES // 60:02d}:{unit * UNIT_MINUTES % 60:02d}"
+
+
+def _span(start_unit: int, end_unit: int) -> int:
+    return ((1 << (end_unit - start_unit)) - 1) << start_unit
+
+
+def contiguous(mask: int, units: int) -> int:
+    """Bit u set when bits u .. u+units-1 of mask are all set"""
+    width = 1
+    # Doubling: after each step bit u means "width bits set from u"
+    while width < units and mask:
+        step = min(width, units - width)
+        mask &= mask >> step
+        width += step
+    return mask
+
+
+class DayBitmap:
+    """Availability of one doctor at one location on one day
+
+    scheduled - unit is covered by a schedule row
+    free      - unit is bookable
+    starts    - a schedule row starts at the unit
+
+    Slots start on schedule row boundaries, as they always have; a visit that
+    is not a whole number of rows ends part-way through a row.
+    """
+
+    __slots__ = ("scheduled", "free", "starts")
+
+    def __init__(self):
+        self.scheduled = 0
+        self.free = 0
+        self.starts = 0
+
+    def add_row(self, start_unit: int, end_unit: int, available: bool):
+        self.scheduled |= _span(start_unit, end_unit)
+        self.starts |= 1 << start_unit
+        self.mark(start_unit, end_unit, available)
+
+    def mark(self, start_unit: int, end_unit: int, available: bool):
+        if available:
+            # Gaps between rows never become bookable
+            self.free |= _span(start_unit, end_unit) & self.scheduled
+        else:
+            self.free &= ~_span(start_unit, end_unit)
+
+    def book(self, start_unit: int, end_unit: int):
+        """mark a booking busy; one ending part-way through a row splits the row
+        there, as ScheduleStore.reserve_slot does, so a visit can start at end_unit"""
+        self.mark(start_unit, end_unit, False)
+        if self.scheduled >> end_unit & 1:
+            self.starts |= 1 << end_unit
+
+    def slot_starts(self, units: int, blocked: int = 0, buffer_units: int = 0) -> int:
+        """Bit u set when a visit of units units can start at u
+
+        The visit's units must be free and, with a buffer, the buffer_units on
+        either side must not be booked or blocked (free or outside the
+        schedule is fine).
+        """
+        free = self.free & ~blocked
+        starts = contiguous(free, units) & self.starts
+        if buffer_units and starts:
+            clear = ~((self.scheduled & ~free) | blocked)
+            # Units before midnight count as clear
+            before = contiguous((clear << buffer_units) | ((1 << buffer_units) - 1), buffer_units)
+            after = contiguous(clear, buffer_units) >> units
+            starts &= before & after
+        return starts
+
+
+def iter_bits(mask: int):
+    """Indexes of the set bits, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def build_days(rows) -> dict:
+    """{date: DayBitmap} from (date, start_time, end_time, available) rows"""
+    days = {}
+    for date, start_time, end_time, available in rows:
+        day = days.get(date)
+        if day is None:
+            day = days[date] = DayBitmap()
+        day.add_row(time_to_unit(start_time), time_to_unit(end_time), bool(available))
+    return days
+
+
+def iter_day_slots(days: dict, duration_minutes: int, blocked: dict = None, buffer_minutes: int = 0,
+                   after: tuple = None):
+    """Yield (date, start_time, end_time) of each slot of duration_minutes, in time order
+
+    One bit-parallel pass per day, run only when the caller gets to that day;
+    blocked maps a date to units that are unavailable on top of the bitmap
+    (e.g. other sessions' holds). after=(date, start_time) resumes just past
+    that slot: earlier days are skipped by binary search and earlier starts on
+    its day are masked off.
+    """
+    if duration_minutes <= 0 or duration_minutes % UNIT_MINUTES or buffer_minutes % UNIT_MINUTES:
+        return
+    units = duration_minutes // UNIT_MINUTES
+    buffer_units = buffer_minutes // UNIT_MINUTES
+    blocked = blocked or {}
+    dates = sorted(days)
+    first, after_date, after_mask = 0, None, 0
+    if after is not None:
+        after_date = after[0]
+        first = bisect.bisect_left(dates, after_date)
+        after_mask = (1 << (time_to_unit(after[1]) + 1)) - 1
+    for date in dates[first:]:
+        starts = days[date].slot_starts(units, blocked.get(date, 0), buffer_units)
+        if date == after_date:
+            starts &= ~after_mask
+        for unit in iter_bits(starts):
+            yield date, unit_to_time(unit), unit_to_time(unit + units)
+
+
+def search_days(days: dict, duration_minutes: int, blocked: dict = None, buffer_minutes: int = 0) -> list:
+    """Every slot of iter_day_slots as a list"""
+    return list(iter_day_slots(days, duration_minutes, blocked, buffer_minutes))
+
+
+def bitmap_memory(days: dict) -> int:
+    """Approximate bytes held by a {date: DayBitmap} map (dict, keys, objects and ints)"""
+    total = sys.getsizeof(days)
+    for date, day in days.items():
+        total += sys.getsizeof(date) + sys.getsizeof(day)
+        total += sum(sys.getsizeof(getattr(day, name)) for name in DayBitmap.__slots__)
+    return total
+
+
+class AvailabilityIndex:
+    def __init__(self, store):
+        self.store = store
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def days(self, doctor_name: str, location: str) -> dict:
+        """Current bitmaps for one doctor/location, reloaded only if the store changed"""
+        key = (doctor_name.strip(), location.strip())
+        version = self.store.version(*key)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        # Version read before the rows: a write in between just forces another reload
+        df = self.store.fetch_slots(*key, available_only=False)
+        days = build_days(df[["date", "start_time", "end_time", "available"]].itertuples(index=False, name=None))
+        with self._lock:
+            self._cache[key] = (version, days)
+        return days
+
+    def _blocked(self, doctor_name, location, holder) -> dict:
+        blocked = {}
+        for date, start_time, end_time in self.store.held_ranges(doctor_name, location, holder):
+            blocked[date] = blocked.get(date, 0) | _span(time_to_unit(start_time), time_to_unit(end_time))
+        return blocked
+
+    def find_slots(self, doctor_name: str, location: str, duration_minutes: int, holder: str = None,
+                   buffer_minutes: int = 0) -> list:
+        """(date, start_time, end_time) of every bookable slot, in time order
+
+        Time under another session's active hold is masked out; holder still
+        sees its own.
+        """
+        days = self.days(doctor_name, location)
+        return search_days(days, duration_minutes, self._blocked(doctor_name, location, holder), buffer_minutes)
+
+    def iter_slots(self, doctor_name: str, location: str, duration_minutes: int, holder: str = None,
+                   buffer_minutes: int = 0, after: tuple = None):
+        """find_slots as a lazy stream: nothing is loaded until the first slot
+        is requested, and each day is searched only when reached"""
+        days = self.days(doctor_name, location)
+        yield from iter_day_slots(days, duration_minutes, self._blocked(doctor_name, location, holder),
+                                  buffer_minutes, after)
+
+    def is_open(self, doctor_name: str, location: str, date, start_time: str, duration_minutes: int,
+                holder: str = None, buffer_minutes: int = 0) -> bool:
+        """Re-check one slot against the current bitmap (holds and buffer included)
+        without listing anything else"""
+        if duration_minutes <= 0 or duration_minutes % UNIT_MINUTES or buffer_minutes % UNIT_MINUTES:
+            return False
+        date = normalize_date(date)
+        day = self.days(doctor_name, location).get(date)
+        if day is None:
+            return False
+        blocked = self._blocked(doctor_name, location, holder).get(date, 0)
+        starts = day.slot_starts(duration_minutes // UNIT_MINUTES, blocked, buffer_minutes // UNIT_MINUTES)
+        return bool(starts >> time_to_unit(start_time) & 1)
+
+    def _write_through(self, doctor_name, location, date, available, write) -> list:
+        """Run write against the store and flip the cached bits if it was the only change
+
+        write returns the (start_time, end_time) spans the store actually
+        changed; only those are flipped, never the whole requested range.
+        """
+        key = (doctor_name.strip(), location.strip())
+        with self._lock:
+            cached = self._cache.get(key)
+        spans = write()
+        if not spans or cached is None:
+            return spans
+        with self._lock:
+            # Exactly one bump since the cached copy means no other writer got in between
+            if self._cache.get(key) is cached and self.store.version(*key) == cached[0] + 1:
+                day = cached[1].get(normalize_date(date))
+                try:
+                    for start_time, end_time in spans if day is not None else ():
+                        if available:
+                            day.mark(time_to_unit(start_time), time_to_unit(end_time), True)
+                        else:
+                            day.book(time_to_unit(start_time), time_to_unit(end_time))
+                    self._cache[key] = (cached[0] + 1, cached[1])
+                except ValueError:
+                    self._cache.pop(key, None)
+            else:
+                self._cache.pop(key, None)
+        return spans
+
+    def set_availability(self, doctor_name, location, date, start_time, end_time, available: bool) -> int:
+        """Store update plus an in-place flip of the rows it updated; returns how many"""
+        return len(self._write_through(
+            doctor_name, location, date, available,
+            lambda: self.store.update_availability(doctor_name, location, date, start_time, end_time, available),
+        ))
+
+    def reserve_slot(self, doctor_name, location, date, start_time, end_time, holder: str = None) -> bool:
+        """ScheduleStore.reserve_slot, keeping the cached bitmap current"""
+        return bool(self._write_through(
+            doctor_name, location, date, False,
+            lambda: [(start_time, end_time)] if self.store.reserve_slot(
+                doctor_name, location, date, start_time, end_time, holder=holder) else [],
+        ))
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(bitmap_memory(days) for _, days in self._cache.values())
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_availability_index(db_path: str = SCHEDULE_DB_PATH) -> AvailabilityIndex:
+    """Shared availability index per schedule database"""
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is None:
+            index = _indexes[db_path] = AvailabilityIndex(get_schedule_store(db_path))
+        return index
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory and search time of the availability bitmaps against the row-based
+schedule (string dates and times), reported per million schedule rows
+
+Usage: python src/benchmark_availability.py [rows]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.availability import build_days, iter_bits
+from src.helpers import _slots_from_schedule
+from src.schedule_store import _normalize_frame
+from src.test_slot_engine import build_schedule
+
+DOCTORS = [f"Dr. Doctor{i:02d}" for i in range(20)]
+LOCATIONS = [f"Clinic {i}" for i in range(5)]
+ROWS_PER_DAY = 12 * len(DOCTORS) * len(LOCATIONS)
+
+
+def _traced(build):
+    """Build something and return it with the bytes it still holds"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, held
+
+
+def _bitmaps(df):
+    return {
+        key: build_days(group[["date", "start_time", "end_time", "available"]].itertuples(index=False, name=None))
+        for key, group in df.groupby(["doctor_name", "location"], sort=False)
+    }
+
+
+def _time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(rows):
+    days = max(1, rows // ROWS_PER_DAY)
+    df = _normalize_frame(build_schedule(DOCTORS, LOCATIONS, days=days, seed=1))
+    scale = 1_000_000 / len(df)
+    print(f"{len(df)} schedule rows ({len(DOCTORS) * len(LOCATIONS)} doctor/locations x {days} days)")
+
+    frame_bytes = df.memory_usage(deep=True).sum()
+    records, records_bytes = _traced(lambda: df.to_dict("records"))
+    del records
+    bitmaps, bitmap_bytes = _traced(lambda: _bitmaps(df))
+
+    print(f"{'representation':>22} {'MB per 1M rows':>15}")
+    print(f"{'DataFrame':>22} {frame_bytes * scale / 2**20:>15.1f}")
+    print(f"{'list of dicts':>22} {records_bytes * scale / 2**20:>15.1f}")
+    print(f"{'bitmaps':>22} {bitmap_bytes * scale / 2**20:>15.1f}")
+
+    doctor, location = DOCTORS[3], LOCATIONS[2]
+    rows_for_key = df[(df["doctor_name"] == doctor) & (df["location"] == location)]
+    key_days = bitmaps[(doctor, location)]
+    print(f"\n{'duration':>8} {'rows (s)':>10} {'bitmaps (s)':>12} {'speed-up':>9}")
+    for duration in (30, 60):
+        units = duration // 15
+        row_time = _time(lambda: _slots_from_schedule(rows_for_key, duration, doctor, location))
+        bitmap_time = _time(lambda: [
+            (date, unit) for date in sorted(key_days) for unit in iter_bits(key_days[date].slot_starts(units))
+        ])
+        print(f"{duration:>8} {row_time:>10.4f} {bitmap_time:>12.4f} {row_time / bitmap_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Load test of the booking flow (greeting, lookup, slot listing, insurance) in
+main.py against the offline LLM stand-in, so it runs with no Groq key or
+network. Free-text messages make every greeting and insurance step reach the
+LLM path (gateway, breaker, retries, cache).
+
+Latency and failures come from LLM_FAKE_LATENCY_MS (default here 300),
+LLM_FAKE_JITTER_MS, LLM_FAKE_ERROR_RATE and LLM_FAKE_SEED; the gateway's rate
+limit is lifted unless LLM_RATE_PER_MINUTE is set. Set LLM_BACKEND=groq to run
+the same load against Groq.
+
+Usage: python src/benchmark_booking_flow.py [sessions] [workers]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY_MS", "300")
+os.environ.setdefault("LLM_RATE_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_BURST", "1000")
+
+import main
+from src.schedule_store import get_schedule_store
+
+STEPS = ("greeting", "lookup", "scheduling", "insurance")
+
+
+def _session(i, doctor, location, timings):
+    state = {
+        "errors": [], "retry_count": 0, "appointment_confirmed": False, "mail_sent": False,
+        "current_step": "greeting",
+        "user_input": f"Hi, my name is Bench Patient{i}, born March {i % 28 + 1}, 1990. "
+                      f"I'd like to see {doctor} at {location}",
+    }
+    for step in STEPS:
+        started = time.perf_counter()
+        if step == "greeting":
+            state = main.greeting(state)
+        elif step == "lookup":
+            state = main.lookup(state)
+        elif step == "scheduling":
+            schedule = main.scheduling_returning if state.get("patient_type") == "existing" else main.scheduling_new
+            state = schedule(state)
+        else:
+            state["insurance_input"] = f"I'm covered by Blue Cross, member id BP{i:06d}, group GRP001"
+            state = main.insurance(state)
+        timings[step].append(time.perf_counter() - started)
+        if state.get("errors"):
+            return step
+    return None
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run(sessions, workers):
+    catalog = get_schedule_store().catalog()
+    doctor = next(iter(catalog["doctor_locations"]))
+    location = catalog["doctor_locations"][doctor][0]
+    print(f"{sessions} sessions across {workers} threads, LLM backend {main.LLM_BACKEND}")
+
+    timings = {step: [] for step in STEPS}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        failed_at = list(pool.map(lambda i: _session(i, doctor, location, timings), range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{'step':>12} {'runs':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'failed':>7}")
+    for step in STEPS:
+        values = sorted(timings[step])
+        if values:
+            print(f"{step:>12} {len(values):>6} {_percentile(values, 0.5):>9.1f} {_percentile(values, 0.95):>9.1f} "
+                  f"{values[-1] * 1000:>9.1f} {failed_at.count(step):>7}")
+    completed = failed_at.count(None)
+    print(f"{completed}/{sessions} sessions completed, {sessions / elapsed:.1f} sessions/s")
+    metrics = main.llm_metrics()
+    print(f"gateway: {metrics['gateway']}")
+    print(f"circuit: {metrics['circuit']}")
+    if hasattr(main.llm, "stats"):
+        print(f"backend: {main.llm.stats()}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    sessions = args[0] if len(args) > 0 else 50
+    workers = args[1] if len(args) > 1 else 8
+    run(sessions, workers)
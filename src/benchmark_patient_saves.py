@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark N parallel new-patient saves: the old read/concat/rewrite path
+against the append-only PatientIndex.add_patient path
+
+Usage: python src/benchmark_patient_saves.py [existing_patients] [saves] [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.patient_index import PATIENT_COLUMNS, PatientIndex
+
+
+def _record(i):
+    return {
+        "full_name": f"Bench Patient{i}",
+        "date_of_birth": "1990-01-01",
+        "email": f"bench{i}@example.com",
+        "phone": "555-000-0000",
+        "insurance_carrier": "Aetna",
+        "insurance_member_id": f"BP{i:06d}",
+        "insurance_group": "GRP001",
+        "created_date": datetime.now().isoformat(),
+    }
+
+
+def legacy_save(csv_path, record):
+    """The previous _save_new_patient body"""
+    df = pd.read_csv(csv_path)
+    new_id = len(df) + 1 if not df.empty else 1
+    df = pd.concat([df, pd.DataFrame([{"id": new_id, **record}])], ignore_index=True)
+    df.to_csv(csv_path, index=False)
+    return new_id
+
+
+def _seed(csv_path, existing):
+    rows = [{"id": i + 1, **_record(-(i + 1))} for i in range(existing)]
+    pd.DataFrame(rows, columns=PATIENT_COLUMNS).to_csv(csv_path, index=False)
+
+
+def _run(label, save, csv_path, saves, workers, existing):
+    started = time.perf_counter()
+    errors = 0
+    ids = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(save, _record(i)) for i in range(saves)]
+        for future in futures:
+            try:
+                ids.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    try:
+        lost = str(saves - (len(pd.read_csv(csv_path)) - existing))
+    except Exception:
+        lost = "corrupt"
+    duplicates = len(ids) - len(set(ids))
+    print(f"{label:>12} {saves / elapsed:>10.1f} {elapsed * 1000 / saves:>10.2f} "
+          f"{duplicates:>10} {lost:>9} {errors:>7}")
+
+
+def run(existing, saves, workers):
+    print(f"{existing} existing patients, {saves} saves across {workers} threads")
+    print(f"{'path':>12} {'saves/s':>10} {'ms/save':>10} {'dup IDs':>10} {'lost rows':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "legacy.csv")
+        _seed(csv_path, existing)
+        _run("rewrite", lambda r: legacy_save(csv_path, r), csv_path, saves, workers, existing)
+
+        csv_path = os.path.join(tmp, "append.csv")
+        _seed(csv_path, existing)
+        index = PatientIndex(csv_path, os.path.join(tmp, "index.db"))
+        index.rebuild()
+        _run("append", index.add_patient, csv_path, saves, workers, existing)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    existing = args[0] if len(args) > 0 else 100_000
+    saves = args[1] if len(args) > 1 else 200
+    workers = args[2] if len(args) > 2 else 8
+    run(existing, saves, workers)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized slot engine against the original row-by-row loops
+
+Usage: python src/benchmark_slot_engine.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.helpers import _slots_from_schedule
+from src.test_slot_engine import build_schedule, legacy_get_available_slots
+
+# 12 half-hour slots per doctor/location/day, 100 doctor/location pairs
+DOCTORS = [f"Dr. Doctor{i:02d}" for i in range(20)]
+LOCATIONS = [f"Clinic {i}" for i in range(5)]
+ROWS_PER_DAY = 12 * len(DOCTORS) * len(LOCATIONS)
+
+
+def _time(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(row_counts):
+    print(f"{'rows':>10} {'duration':>8} {'legacy (s)':>12} {'vectorized (s)':>15} {'speed-up':>9}")
+    for rows in row_counts:
+        days = max(1, rows // ROWS_PER_DAY)
+        df = build_schedule(DOCTORS, LOCATIONS, days=days, seed=1)
+        args_doctor, args_location = DOCTORS[3], LOCATIONS[2]
+        for duration in (30, 60):
+            repeat = 1 if len(df) >= 500_000 else 3
+            legacy = _time(legacy_get_available_slots, df, duration, args_doctor, args_location, repeat=repeat)
+            vectorized = _time(_slots_from_schedule, df, duration, args_doctor, args_location, repeat=repeat)
+            print(f"{len(df):>10} {duration:>8} {legacy:>12.3f} {vectorized:>15.3f} {legacy / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    run(counts)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-message email latency against a local SMTP sink: the old
+connect/login/send/quit per message against the pooled connection, one at a
+time and as a reminder batch
+
+rtt_ms is slept before every server reply (one network round trip);
+handshake_ms is added to the connect and login replies, standing in for the
+TLS handshake and Gmail's credential check.
+
+Usage: python src/benchmark_smtp.py [messages] [rtt_ms] [handshake_ms]
+"""
+
+import os
+import smtplib
+import statistics
+import sys
+import time
+from email.mime.text import MIMEText
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.smtp_pool import SMTPPool
+from src.smtp_sink import SMTPSink
+
+SENDER = "clinic@example.com"
+
+
+def _message(i):
+    msg = MIMEText(f"Reminder: your appointment is in 3 days (#{i})", "plain")
+    msg["From"] = SENDER
+    msg["To"] = f"patient{i}@example.com"
+    msg["Subject"] = "Appointment Reminder"
+    return msg
+
+
+def legacy_send(sink, msg):
+    """The previous send_email body (the sink has no TLS; its handshake delay stands in for STARTTLS)"""
+    with smtplib.SMTP(sink.host, sink.port) as server:
+        server.login(SENDER, "secret")
+        server.send_message(msg)
+
+
+def _report(label, latencies, connections):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    print(f"{label:>14} {statistics.fmean(latencies) * 1000:>9.1f} "
+          f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:>9.1f} "
+          f"{len(latencies) / total:>8.1f} {connections:>12}")
+
+
+def run(messages, rtt_ms, handshake_ms):
+    print(f"{messages} messages, {rtt_ms} ms per round trip, {handshake_ms} ms handshake/login")
+    print(f"{'path':>14} {'mean ms':>9} {'p95 ms':>9} {'msgs/s':>8} {'connections':>12}")
+    with SMTPSink(reply_delay=rtt_ms / 1000, connect_delay=handshake_ms / 1000) as sink:
+        latencies = []
+        for i in range(messages):
+            started = time.perf_counter()
+            legacy_send(sink, _message(i))
+            latencies.append(time.perf_counter() - started)
+        _report("per-message", latencies, sink.connections)
+
+        before = sink.connections
+        pool = SMTPPool(sink.host, sink.port, SENDER, "secret", starttls=False)
+        latencies = []
+        for i in range(messages):
+            started = time.perf_counter()
+            pool.send(_message(i))
+            latencies.append(time.perf_counter() - started)
+        _report("pooled", latencies, sink.connections - before)
+
+        before = sink.connections
+        batch = [_message(i) for i in range(messages)]
+        started = time.perf_counter()
+        errors = pool.send_many(batch)
+        elapsed = time.perf_counter() - started
+        assert not any(errors)
+        _report("pooled batch", [elapsed / messages] * messages, sink.connections - before)
+        pool.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    messages = args[0] if len(args) > 0 else 50
+    rtt_ms = args[1] if len(args) > 1 else 5
+    handshake_ms = args[2] if len(args) > 2 else 50
+    run(messages, rtt_ms, handshake_ms)
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import threading
+
+# One connection per (thread, database file); Streamlit runs each session in its own thread
+_local = threading.local()
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """Return this thread's connection to db_path, creating it on first use"""
+    connections = getattr(_local, "connections", None)
+    # SQLite connections must not be carried across fork(); start fresh in a child process
+    if connections is None or getattr(_local, "pid", None) != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    key = os.path.abspath(db_path)
+    conn = connections.get(key)
+    if conn is None:
+        directory = os.path.dirname(key)
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(key, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers proceed while another session or process is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[key] = conn
+    return conn
+
+
+def close_connections():
+    """Close this thread's cached connections (used by tests and scripts)"""
+    connections = getattr(_local, "connections", {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
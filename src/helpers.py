@@ -1,100 +1,395 @@
 
 import pandas as pd
 from datetime import datetime
+import base64
+import heapq
+from itertools import islice
 import re
 import json
 import os 
 from datetime import timedelta
+
+# Slots per page returned by get_slot_page
+SLOT_PAGE_SIZE = 20
+
+
+def _scan_json_object(text: str, start: int):
+    """Rewrite the object opening at text[start] as strict JSON in one pass
+
+    Double-quoted strings are copied as they are (apostrophes included),
+    single-quoted strings and bare keys are quoted, and trailing commas are
+    dropped. Returns the JSON text, or None if the object never closes.
+    """
+    out = []
+    depth = 0
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == "\\" else 1
+            if j >= n:
+                return None
+            body = text[i + 1:j]
+            if ch == "'":
+                body = body.replace("\\'", "'").replace('"', '\\"')
+            out.append(f'"{body}"')
+            i = j + 1
+            continue
+        if ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            rest = text[j:].lstrip()
+            # Bare keys get quotes; true/false/null and numbers stay as they are
+            out.append(f'"{word}"' if rest.startswith(":") and word not in ("true", "false", "null") else word)
+            i = j
+            continue
+        if ch == "," and text[i + 1:].lstrip()[:1] in ("}", "]"):
+            i += 1
+            continue
+        out.append(ch)
+        if ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return "".join(out)
+        i += 1
+    return None
+
+
 def clean_llm_response(text: str):
-    """Clean and parse LLM response to extract JSON"""
-      
-    text = text.strip()
-    
-    # Remove markdown code blocks
-    if "```json" in text:
-        text = text.split("```json")[1].split("```")[0]
-    elif "```" in text:
-        text = text.split("```")[1].split("```")[0]
-    
-    # Find JSON object
-    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(0)
-        # Fix common JSON issues
-        json_str = re.sub(r"'", '"', json_str)  # Replace single quotes
-        json_str = re.sub(r'(\w+):', r'"\1":', json_str)  # Add quotes to keys
-        
-        parsed = json.loads(json_str)
-        return {k: "" if v is None else str(v) for k, v in parsed.items()}
-    
+    """Parse the first JSON object in an LLM response (code fences and prose around it are fine)
+
+    Values come back as strings; None if there is no object to parse.
+    """
+    text = (text or "").strip()
+    start = text.find("{")
+    while start != -1:
+        try:
+            parsed, _ = json.JSONDecoder().raw_decode(text, start)
+        except ValueError:
+            scanned = _scan_json_object(text, start)
+            try:
+                parsed = json.loads(scanned) if scanned else None
+            except ValueError:
+                parsed = None
+        if isinstance(parsed, dict):
+            return {k: "" if v is None else str(v) for k, v in parsed.items()}
+        start = text.find("{", start + 1)
     return None
 
 
-def get_available_slots(dataset_path: str, duration: int, doctor_name: str, location: str):
+# Reference point used to turn "HH:MM" strings into offsets from midnight
+_TIME_EPOCH = pd.Timestamp("1900-01-01")
+
+
+def _format_durations(deltas: pd.Series) -> pd.Series:
+    """Render timedeltas as str(pd.Timedelta) (e.g. '0 days 00:30:00'), once per distinct value"""
+    labels = {d: str(pd.Timedelta(d)) for d in deltas.unique()}
+    return deltas.map(labels)
+
+
+def _format_slots(slots, duration: int, location: str):
+    """(date, start_time, end_time) tuples -> slot dicts in the shape the UI expects"""
+    label = str(pd.Timedelta(minutes=duration))
+    return [
+        {
+            # 30-minute slots have always carried a date object, the others a string
+            "date": datetime.strptime(date, "%Y-%m-%d").date() if duration == 30 else date,
+            "start_time": start_time,
+            "end_time": end_time,
+            "location": location.strip(),
+            "duration": label,
+        }
+        for date, start_time, end_time in slots
+    ]
+
+
+def _slots_from_runs(df: pd.DataFrame, duration: int, doctor_name: str, location: str, buffer_minutes: int = 0):
+    """Contiguous-run search for any duration, via per-day availability bitmaps of the frame"""
+    from src.availability import build_days, search_days
+
+    df = df[
+        (df["doctor_name"].str.strip() == doctor_name.strip()) &
+        (df["location"].str.strip() == location.strip())
+    ]
+    # Booked rows stay in: buffers must keep clear of them
+    days = build_days(zip(
+        pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"),
+        df["start_time"].astype(str),
+        df["end_time"].astype(str),
+        df["available"] == True,
+    ))
+    return _format_slots(search_days(days, duration, buffer_minutes=buffer_minutes), duration, location)
+
+
+def _slots_from_schedule(df: pd.DataFrame, duration: int, doctor_name: str, location: str,
+                         buffer_minutes: int = 0):
+    """Vectorized slot search over an in-memory schedule frame"""
+    if buffer_minutes or duration not in (30, 60):
+        return _slots_from_runs(df, duration, doctor_name, location, buffer_minutes)
+
+    # Normalize doctor + location input
+    doctor_name = doctor_name.strip()
+    location = location.strip()
+
+    # Filter first so the datetime arithmetic only touches candidate rows
+    df = df[
+        (df["doctor_name"].str.strip() == doctor_name) &
+        (df["location"].str.strip() == location) &
+        (df["available"] == True)
+    ]
+    if df.empty:
+        return []
+
+    # Columnar datetime arithmetic: day + offset from midnight
+    day = pd.to_datetime(df["date"]).dt.normalize()
+    start_dt = day + (pd.to_datetime(df["start_time"], format="%H:%M") - _TIME_EPOCH)
+    end_dt = day + (pd.to_datetime(df["end_time"], format="%H:%M") - _TIME_EPOCH)
+
+    if duration == 30:
+        slots = pd.DataFrame({
+            "date": day.dt.date,
+            "start_time": start_dt.dt.strftime("%H:%M"),
+            "end_time": end_dt.dt.strftime("%H:%M"),
+            "location": df["location"],
+            "duration": _format_durations(end_dt - start_dt),
+        })
+        return slots.to_dict("records")
+
+    if duration == 60:
+        frame = pd.DataFrame({
+            "start_dt": start_dt,
+            "end_dt": end_dt,
+            "location": df["location"],
+        }).sort_values("start_dt", kind="stable").reset_index(drop=True)
+
+        # Shift-based adjacency: a row pairs with the next one when it ends
+        # exactly where the next one starts, on the same day and location
+        next_rows = frame.shift(-1)
+        paired = (
+            (frame["end_dt"] == next_rows["start_dt"]) &
+            (frame["start_dt"].dt.normalize() == next_rows["start_dt"].dt.normalize()) &
+            (frame["location"] == next_rows["location"])
+        )
+        first = frame[paired]
+        second_end = next_rows.loc[paired, "end_dt"].astype(frame["end_dt"].dtype)
+
+        slots = pd.DataFrame({
+            "date": first["start_dt"].dt.strftime("%Y-%m-%d"),
+            "start_time": first["start_dt"].dt.strftime("%H:%M"),
+            "end_time": second_end.dt.strftime("%H:%M"),
+            "location": first["location"],
+            "duration": _format_durations(second_end - first["start_dt"]),
+        })
+        return slots.to_dict("records")
+
+
+def _slots_from_bitmaps(dataset_path: str, duration: int, doctor_name: str, location: str, holder: str = None,
+                        buffer_minutes: int = 0):
+    """Slot search over the cached availability bitmaps, in the same output shape"""
+    from src.availability import get_availability_index
+
+    slots = get_availability_index(dataset_path).find_slots(
+        doctor_name, location, duration, holder=holder, buffer_minutes=buffer_minutes
+    )
+    return _format_slots(slots, duration, location)
+
+
+def parse_duration_minutes(duration) -> int:
+    """'45 minutes' / '1 hour' / '1h 30m' / 90 -> minutes"""
+    if isinstance(duration, (int, float)):
+        return int(duration)
+    text = str(duration).strip().lower()
+    match = re.fullmatch(r"(?:(\d+)\s*h(?:ours?|rs?)?)?\s*(?:(\d+)\s*(?:m(?:in(?:ute)?s?)?)?)?", text)
+    if not text or not match or not any(match.groups()):
+        raise ValueError(f"Unrecognized duration: {duration}")
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+def get_available_slots(dataset_path: str, duration: int, doctor_name: str, location: str, holder: str = None,
+                        buffer_minutes: int = 0):
+    """Every slot of duration minutes (any multiple of 15), optionally keeping
+    buffer_minutes clear of other bookings on both sides"""
     try:
-        # Load schedule
-        df = pd.read_excel(dataset_path)
-
-        # Normalize doctor + location input
-        doctor_name = doctor_name.strip()
-        location = location.strip()
-
-        # Ensure datetime parsing
-        df["start_time"] = pd.to_datetime(df["start_time"], format="%H:%M").dt.time
-        df["end_time"] = pd.to_datetime(df["end_time"], format="%H:%M").dt.time
-
-        # Force date column to datetime.date
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-
-        # Filter for doctor/location/availability
-        df = df[
-            (df["doctor_name"].str.strip() == doctor_name) &
-            (df["location"].str.strip() == location) &
-            (df["available"] == True)
-        ].copy()
-        if df.empty:
-            return []
-
-        # Convert to datetime objects (merge with date column)
-        df["start_dt"] = df.apply(lambda r: datetime.combine(r["date"], r["start_time"]), axis=1)
-        df["end_dt"] = df.apply(lambda r: datetime.combine(r["date"], r["end_time"]), axis=1)
-
-        available_slots = []
-
-        if duration == 30:
-            for _, row in df.iterrows():
-                slot_duration = row["end_dt"] - row["start_dt"]
-                available_slots.append({
-                    "date": row["date"],
-                    "start_time": row["start_time"].strftime("%H:%M"),
-                    "end_time": row["end_time"].strftime("%H:%M"),
-                    "location": row["location"],
-                    "duration": str(slot_duration)
-                })
-                
-        elif duration == 60:
-            df_sorted = df.sort_values(["date", "start_dt"]).reset_index(drop=True)
-            for i in range(len(df_sorted) - 1):
-                row1, row2 = df_sorted.iloc[i], df_sorted.iloc[i+1]
-                if (
-                    row1["end_dt"] == row2["start_dt"] and
-                    row1["date"] == row2["date"] and
-                    row1["location"] == row2["location"]
-                ):
-                    slot_duration = row2["end_dt"] - row1["start_dt"]
-                    available_slots.append({
-                        "date": row1["date"].strftime("%Y-%m-%d"),
-                        "start_time": row1["start_time"].strftime("%H:%M"),
-                        "end_time": row2["end_time"].strftime("%H:%M"),
-                        "location": row1["location"],
-                        "duration": str(slot_duration)
-                    })
-
-        return available_slots
+        # Schedule database: bitmap search, hiding slots held by sessions other than holder.
+        # Times off the 15-minute grid fall back to the row-based search.
+        if dataset_path.endswith(".db"):
+            from src.schedule_store import get_schedule_store
+            try:
+                return _slots_from_bitmaps(dataset_path, duration, doctor_name, location, holder, buffer_minutes)
+            except ValueError:
+                df = get_schedule_store(dataset_path).fetch_slots(
+                    doctor_name, location, available_only=not buffer_minutes, holder=holder
+                )
+        else:
+            df = pd.read_excel(dataset_path)
+        return _slots_from_schedule(df, duration, doctor_name, location, buffer_minutes)
 
     except Exception as e:
         print(f"Error fetching slots: {e}")
         return []
+
+
+def _slot_query(duration: int, doctor_name: str, location: str, buffer_minutes: int) -> list:
+    return [doctor_name.strip(), location.strip(), int(duration), int(buffer_minutes)]
+
+
+def encode_slot_cursor(duration: int, doctor_name: str, location: str, buffer_minutes: int, date, start_time) -> str:
+    """Opaque continuation token: resume the same search after (date, start_time)"""
+    payload = {"q": _slot_query(duration, doctor_name, location, buffer_minutes), "after": [str(date), start_time]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_slot_cursor(cursor: str, duration: int, doctor_name: str, location: str, buffer_minutes: int = 0):
+    """(date, start_time) to resume after, or None if cursor is empty, malformed
+    or belongs to a different search (the listing then starts over)"""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if payload["q"] != _slot_query(duration, doctor_name, location, buffer_minutes):
+            return None
+        date, start_time = payload["after"]
+        return str(date), str(start_time)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def encode_slot_token(duration: int, doctor_name: str, location: str, slot: dict) -> str:
+    """Opaque, stable id for one listed slot; it carries everything needed to
+    act on the slot, so a selection never has to list slots again"""
+    payload = [doctor_name.strip(), location.strip(), int(duration), str(slot["date"]), slot["start_time"], slot["end_time"]]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def slot_from_token(token: str, duration: int, doctor_name: str, location: str):
+    """The slot dict a token stands for, or None if it is malformed or was
+    issued for a different doctor, location or duration"""
+    try:
+        doctor, loc, minutes, date, start_time, end_time = json.loads(base64.urlsafe_b64decode(str(token).encode()))
+    except (ValueError, TypeError):
+        return None
+    if [doctor, loc, minutes] != [doctor_name.strip(), location.strip(), int(duration)]:
+        return None
+    slot = _format_slots([(date, start_time, end_time)], duration, location)[0]
+    slot["slot_token"] = token
+    return slot
+
+
+def iter_available_slots(dataset_path: str, duration: int, doctor_name: str, location: str, holder: str = None,
+                         buffer_minutes: int = 0, after: tuple = None):
+    """get_available_slots as a generator, optionally resuming after (date, start_time)
+
+    Against the schedule database slots are produced day by day from the
+    bitmaps, so a caller that stops early never builds the full list.
+    """
+    if dataset_path.endswith(".db"):
+        from src.availability import get_availability_index
+        index = get_availability_index(dataset_path)
+        try:
+            index.days(doctor_name, location)
+        except ValueError:
+            pass  # Off the 15-minute grid: fall through to the row-based search
+        else:
+            slots = index.iter_slots(
+                doctor_name, location, duration, holder=holder, buffer_minutes=buffer_minutes, after=after
+            )
+            for slot in slots:
+                yield _format_slots([slot], duration, location)[0]
+            return
+    for slot in get_available_slots(dataset_path, duration, doctor_name, location, holder, buffer_minutes):
+        if after is None or (str(slot["date"]), slot["start_time"]) > after:
+            yield slot
+
+
+def get_slot_page(dataset_path: str, duration: int, doctor_name: str, location: str, page_size: int = SLOT_PAGE_SIZE,
+                  cursor: str = None, holder: str = None, buffer_minutes: int = 0):
+    """One page of slots plus the cursor for the next page (None on the last page)
+
+    Keyset pagination: the cursor records the last slot shown, so a page
+    costs the same however deep the patient scrolls, and slots booked in the
+    meantime don't shift later pages.
+    """
+    try:
+        after = decode_slot_cursor(cursor, duration, doctor_name, location, buffer_minutes)
+        slots = list(islice(
+            iter_available_slots(dataset_path, duration, doctor_name, location, holder, buffer_minutes, after),
+            page_size + 1,
+        ))
+        page = slots[:page_size]
+        next_cursor = None
+        if len(slots) > page_size:
+            last = page[-1]
+            next_cursor = encode_slot_cursor(
+                duration, doctor_name, location, buffer_minutes, last["date"], last["start_time"]
+            )
+        return page, next_cursor
+
+    except Exception as e:
+        print(f"Error fetching slot page: {e}")
+        return [], None
+
+
+def _tag_slots(slots, doctor_name: str, location: str):
+    for date, start_time, end_time in slots:
+        yield date, start_time, end_time, doctor_name, location
+
+
+def _slot_stream(index, dataset_path: str, doctor_name: str, location: str, duration: int, holder: str,
+                 buffer_minutes: int):
+    """One doctor/location's slots as time-ordered (date, start_time, end_time) tuples"""
+    try:
+        index.days(doctor_name, location)
+    except ValueError:
+        # Off the 15-minute grid: only this stream falls back to the row-based search
+        for slot in get_available_slots(dataset_path, duration, doctor_name, location, holder, buffer_minutes):
+            yield str(slot["date"]), slot["start_time"], slot["end_time"]
+        return
+    yield from index.iter_slots(doctor_name, location, duration, holder=holder, buffer_minutes=buffer_minutes)
+
+
+def get_first_available_slots(dataset_path: str, duration: int, doctor_name: str = None, location: str = None,
+                              k: int = 5, holder: str = None, buffer_minutes: int = 0):
+    """The k earliest slots across every doctor/location that matches
+
+    Leave doctor_name or location as None to search all of them ("any doctor
+    at Main Clinic", "Dr. Smith at any location"). Each doctor/location is a
+    lazy, time-ordered slot stream and a heap merges them, so only as many
+    slots are produced as it takes to find the first k. Needs the schedule
+    database; each slot also carries its doctor_name.
+    """
+    from src.availability import get_availability_index
+
+    try:
+        index = get_availability_index(dataset_path)
+        targets = [
+            (doctor, loc)
+            for doctor, locations in index.store.doctor_locations().items()
+            for loc in locations
+            if (doctor_name is None or doctor == doctor_name.strip()) and (location is None or loc == location.strip())
+        ]
+        streams = [
+            _tag_slots(_slot_stream(index, dataset_path, doctor, loc, duration, holder, buffer_minutes), doctor, loc)
+            for doctor, loc in targets
+        ]
+        slots = []
+        for date, start_time, end_time, doctor, loc in islice(heapq.merge(*streams), k):
+            slot = _format_slots([(date, start_time, end_time)], duration, loc)[0]
+            slot["doctor_name"] = doctor
+            slots.append(slot)
+        return slots
+
+    except Exception as e:
+        print(f"Error fetching first available slots: {e}")
+        return []
+
+
 def validate_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return bool(re.match(pattern, email or ""))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Rule-based extraction of greeting and insurance details
+
+The Streamlit forms collect each field separately and send
+"Name: ..., DOB: ..., Doctor: ..., Location: ..." and
+"Carrier: ..., Member ID: ..., Group: ...". These parsers read such
+key/value messages directly (common date formats, known doctor and location
+names, any case or spacing) and return the same keys as the LLM prompts.
+They return None for anything they can't read completely, so the caller falls
+back to the LLM only for free-form text. extract_greeting_fields reads a
+follow-up reply that only needs to supply the fields still missing.
+"""
+
+import re
+from datetime import date, datetime
+
+GREETING_LABELS = {
+    "Full Name": ("full name", "patient name", "name"),
+    "Date of Birth": ("date of birth", "birth date", "birthdate", "dob"),
+    "Preferred Doctor": ("preferred doctor", "doctor", "physician"),
+    "Location": ("location", "clinic"),
+}
+INSURANCE_LABELS = {
+    "Insurance Carrier": ("insurance carrier", "carrier", "insurance", "provider"),
+    "Member ID": ("member id", "member number", "member", "id"),
+    "Group": ("group number", "group"),
+}
+_NAME = re.compile(r"^[A-Za-z][A-Za-z.'-]*(?: [A-Za-z][A-Za-z.'-]*)+$")
+DATE_FORMATS = (
+    "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m-%d-%Y", "%d.%m.%Y",
+    "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y",
+)
+
+
+def _label_pattern(labels: dict):
+    # Longest labels first so "member id" wins over "id"
+    names = sorted((name for names in labels.values() for name in names), key=len, reverse=True)
+    alternatives = "|".join(re.escape(name).replace(r"\ ", r"\s+") for name in names)
+    return re.compile(rf"(?:^|[,;\n])\s*({alternatives})\s*[:=]\s*", re.IGNORECASE)
+
+
+_GREETING_PATTERN = _label_pattern(GREETING_LABELS)
+_INSURANCE_PATTERN = _label_pattern(INSURANCE_LABELS)
+
+
+def parse_key_values(message: str, labels: dict, pattern=None) -> dict:
+    """{field: value} for each "label: value" pair of message, keyed by the
+    field the label belongs to; the first occurrence of a field wins"""
+    pattern = pattern or _label_pattern(labels)
+    by_label = {name: field for field, names in labels.items() for name in names}
+    matches = list(pattern.finditer(message))
+    values = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(message)
+        field = by_label[" ".join(match.group(1).lower().split())]
+        value = " ".join(message[match.end():end].split()).strip(" ,;")
+        values.setdefault(field, value)
+    return values
+
+
+def parse_date(value: str):
+    """"YYYY-MM-DD" for a past date in one of DATE_FORMATS, else None"""
+    value = " ".join(str(value).split())
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+        if date(1900, 1, 1) <= parsed <= date.today():
+            return parsed.strftime("%Y-%m-%d")
+    return None
+
+
+def _key(name: str) -> str:
+    return " ".join(name.lower().replace(".", " ").split())
+
+
+def match_known(value: str, known: list, prefix: str = ""):
+    """Canonical spelling of value from known, ignoring case, dots, spacing and an
+    optional title (e.g. "dr smith" -> "Dr. Smith"); None if it is not there"""
+    wanted = _key(value)
+    for name in known:
+        key = _key(name)
+        if wanted == key or (prefix and f"{_key(prefix)} {wanted}" == key):
+            return name
+    return None
+
+
+def extract_greeting(message: str, doctors: list = None, locations: list = None):
+    """Greeting fields from a key/value message, or None to fall back to the LLM
+
+    With doctors/locations given, the doctor and location must be one of them
+    and come back in their canonical spelling.
+    """
+    values = parse_key_values(message or "", GREETING_LABELS, _GREETING_PATTERN)
+    if len(values) < len(GREETING_LABELS) or not all(values.values()):
+        return None
+
+    dob = parse_date(values["Date of Birth"])
+    doctor = values["Preferred Doctor"]
+    location = values["Location"]
+    if doctors:
+        doctor = match_known(doctor, doctors, prefix="Dr.")
+    if locations:
+        location = match_known(location, locations)
+    if dob is None or doctor is None or location is None:
+        return None
+    return {
+        "Full Name": values["Full Name"],
+        "Date of Birth": dob,
+        "Preferred Doctor": doctor,
+        "Location": location,
+    }
+
+
+def _greeting_value(field: str, value: str, doctors: list = None, locations: list = None):
+    """One greeting field's value, normalized, or None if it isn't a valid one"""
+    value = " ".join(str(value).split())
+    if field == "Date of Birth":
+        return parse_date(value)
+    if field == "Preferred Doctor":
+        return match_known(value, doctors, prefix="Dr.") if doctors else value or None
+    if field == "Location":
+        return match_known(value, locations) if locations else value or None
+    return value if _NAME.match(value) else None
+
+
+def extract_greeting_fields(message: str, fields: list, doctors: list = None, locations: list = None):
+    """Values for just the given greeting fields from a follow-up reply, or None to ask the LLM
+
+    The reply can label them ("Location: Main Clinic") or be a bare value: a
+    date, a known doctor or location, or, when only one field is missing, any
+    valid value for it.
+    """
+    labelled = parse_key_values(message or "", GREETING_LABELS, _GREETING_PATTERN)
+    found = {}
+    if labelled:
+        for field in fields:
+            value = _greeting_value(field, labelled.get(field, ""), doctors, locations)
+            if value is not None:
+                found[field] = value
+    else:
+        for field in fields:
+            unmistakable = field == "Date of Birth" or (field == "Preferred Doctor" and doctors) or \
+                (field == "Location" and locations)
+            if not unmistakable and len(fields) > 1:
+                continue
+            value = _greeting_value(field, message or "", doctors, locations)
+            if value is not None:
+                found[field] = value
+                break
+    return found if found and len(found) == len(fields) else None
+
+
+def extract_insurance(message: str):
+    """Insurance fields from a key/value message, or None to fall back to the LLM"""
+    values = parse_key_values(message or "", INSURANCE_LABELS, _INSURANCE_PATTERN)
+    if len(values) < len(INSURANCE_LABELS) or not all(values.values()):
+        return None
+    return {field: values[field] for field in INSURANCE_LABELS}
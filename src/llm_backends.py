@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+LLM backends, chosen by LLM_BACKEND
+
+- groq (default): ChatGroq on the shared keep-alive connection pool
+- fake: DeterministicFakeLLM, a local stand-in that needs no key or network.
+  It reads the extraction prompts' messages with the rule-based parser's label
+  tables plus a few patterns for free-form text, and answers the way the chains
+  expect (a tool call when a schema is bound, JSON text otherwise). Latency
+  (LLM_FAKE_LATENCY_MS, LLM_FAKE_JITTER_MS) and the share of calls that fail
+  (LLM_FAKE_ERROR_RATE) are configurable; jitter and failures come from a
+  seeded generator (LLM_FAKE_SEED), so benchmark runs are reproducible.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.input_parser import GREETING_LABELS, INSURANCE_LABELS, parse_date, parse_key_values
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+LLM_FAKE_JITTER_MS = float(os.getenv("LLM_FAKE_JITTER_MS", "0"))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", "0"))
+
+NOT_PROVIDED = "Not Provided"
+_USER_MESSAGE = re.compile(r"User Message:(.*?)(?:\n\s*\n|$)", re.DOTALL)
+_FOLLOW_UP_FIELDS = re.compile(r"Extract only these fields from their message:(.*)")
+_FREE_FORM = {
+    "Full Name": re.compile(r"\b(?:my name is|name is|i am|i'm|this is)\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)+)",
+                            re.IGNORECASE),
+    "Preferred Doctor": re.compile(r"\bdr\.?\s+([A-Z][\w'-]*)", re.IGNORECASE),
+    "Location": re.compile(r"\b(?:at|in)\s+(?:the\s+)?([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)"),
+    "Insurance Carrier": re.compile(r"\b(?:insured (?:with|by)|covered by|insurance is|carrier is)\s+"
+                                    r"([A-Z][\w&'-]*(?:\s+[A-Z][\w&'-]*)*)", re.IGNORECASE),
+    "Member ID": re.compile(r"\bmember(?:\s+id)?\s*(?:is|#|number)?\s*([A-Z0-9][A-Z0-9-]{3,})", re.IGNORECASE),
+    "Group": re.compile(r"\bgroup(?:\s+number)?\s*(?:is|#)?\s*([A-Z0-9][A-Z0-9-]+)", re.IGNORECASE),
+}
+_DATES = re.compile(
+    r"\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{4}|[A-Za-z]+\.? \d{1,2},? \d{4}|\d{1,2} [A-Za-z]+ \d{4}"
+)
+
+
+class InjectedLLMError(ConnectionError):
+    """A failure the fake backend was told to inject"""
+
+
+def _free_form_value(field: str, message: str):
+    if field == "Date of Birth":
+        for candidate in _DATES.findall(message):
+            value = parse_date(candidate.replace(".", ""))
+            if value:
+                return value
+        return None
+    match = _FREE_FORM[field].search(message)
+    return match.group(1).strip() if match else None
+
+
+def fake_extract(prompt: str) -> dict:
+    """What the fake backend answers for an extraction prompt, keyed like the prompt's JSON"""
+    match = _USER_MESSAGE.search(prompt)
+    message = " ".join(match.group(1).split()) if match else ""
+    follow_up = _FOLLOW_UP_FIELDS.search(prompt)
+    if follow_up:
+        fields = [field.strip() for field in follow_up.group(1).split(",") if field.strip() in GREETING_LABELS]
+        labels = GREETING_LABELS
+    else:
+        labels = INSURANCE_LABELS if "Insurance Carrier" in prompt else GREETING_LABELS
+        fields = list(labels)
+
+    labelled = parse_key_values(message, labels)
+    answer = {}
+    for field in fields:
+        value = labelled.get(field) or _free_form_value(field, message)
+        if value and field == "Date of Birth":
+            value = parse_date(value)
+        if value and field == "Preferred Doctor" and not value.startswith("Dr."):
+            value = f"Dr. {value}"
+        answer[field] = value or NOT_PROVIDED
+    return answer
+
+
+class DeterministicFakeLLM(BaseChatModel):
+    """Offline stand-in for the chat model, for benchmarks, load tests and CI"""
+
+    latency_ms: float = LLM_FAKE_LATENCY_MS
+    jitter_ms: float = LLM_FAKE_JITTER_MS
+    error_rate: float = LLM_FAKE_ERROR_RATE
+    seed: int = LLM_FAKE_SEED
+    timeout: Optional[float] = None
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _failures: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "deterministic-fake"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tool_schema=tools[0] if tools else None, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self._calls, "injected_failures": self._failures}
+
+    def _draw(self, timeout: float = None):
+        """(seconds to wait, error to raise after waiting or None) for the next call"""
+        with self._lock:
+            self._calls += 1
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+            self._failures += fail
+        timeout = timeout if timeout is not None else self.timeout
+        if timeout is not None and delay > timeout:
+            return timeout, TimeoutError("LLM request timed out")
+        return delay, InjectedLLMError("injected LLM failure") if fail else None
+
+    def _respond(self, messages, tool_schema=None) -> ChatResult:
+        prompt = messages[-1].content if messages else ""
+        if "User Message:" not in prompt:
+            # Warm-up pings and anything else that isn't an extraction prompt
+            message = AIMessage(content="ok")
+        elif tool_schema is not None:
+            fields = {info.serialization_alias or name: name for name, info in tool_schema.model_fields.items()}
+            args = {fields[key]: value for key, value in fake_extract(prompt).items() if key in fields}
+            message = AIMessage(content="", tool_calls=[
+                {"name": tool_schema.__name__, "args": args, "id": f"call_{self._calls}"}
+            ])
+        else:
+            message = AIMessage(content=json.dumps(fake_extract(prompt)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tool_schema=None, timeout=None, **kwargs):
+        delay, error = self._draw(timeout)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._respond(messages, tool_schema)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tool_schema=None, timeout=None, **kwargs):
+        delay, error = self._draw(timeout)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._respond(messages, tool_schema)
+
+
+def create_llm(backend: str = LLM_BACKEND, model: str = None, timeout: float = None):
+    """The chat model for backend ("groq" or "fake"); ValueError for anything else"""
+    if backend == "groq":
+        from langchain_groq import ChatGroq
+
+        from src.llm_chains import make_http_client
+
+        # Retries and backoff are ours (guarded_call), so the SDK doesn't retry on its own
+        return ChatGroq(model=model, http_client=make_http_client(), timeout=timeout, max_retries=0)
+    if backend == "fake":
+        return DeterministicFakeLLM(timeout=timeout)
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected groq or fake")
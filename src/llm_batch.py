@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Batched extraction for bulk intake (imported referrals, back-office queues)
+
+extract_stream() runs the registry's prompts over many messages on one event
+loop, at most `concurrency` LLM calls at a time (LLM_BATCH_CONCURRENCY), and
+yields each item's result as soon as it is done. An item that fails (bad
+answer, timeout, open circuit) is reported with its error; the rest of the
+batch carries on. Key/value messages are read by the rule-based parser and
+never reach the LLM; with a cache, so are messages extracted before.
+
+Usage: python src/llm_batch.py greeting|insurance MESSAGES_FILE [concurrency]
+(one message per line; prints one JSON result per line as they complete)
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.input_parser import extract_greeting, extract_insurance
+from src.llm_cache import cache_key
+from src.llm_gateway import GatewayBusyError
+from src.llm_guard import LLM_CALL_TIMEOUT_SECONDS, LLM_MAX_ATTEMPTS, backoff_delays
+
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+
+
+def default_parser(chain_name: str, doctors: list = None, locations: list = None):
+    """The rule-based extractor tried before the LLM for chain_name, if it has one"""
+    if chain_name == "greeting":
+        return lambda message: extract_greeting(message, doctors, locations)
+    if chain_name == "insurance":
+        return extract_insurance
+    return None
+
+
+async def _extract_one(registry, chain_name: str, index: int, message: str, semaphore, parser,
+                       cache, model: str, breaker, bucket, attempts: int, call_timeout: float,
+                       acquire_timeout: float) -> dict:
+    result = {"index": index, "message": message, "fields": None, "source": None, "error": None}
+    fields = parser(message) if parser else None
+    if fields:
+        result.update(fields=fields, source="parser")
+        return result
+
+    input_data = {"message": message}
+    key = cache_key(registry.prompt(chain_name).template, model, input_data) if cache else None
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        result.update(fields=dict(cached), source="cache")
+        return result
+
+    delays = backoff_delays(attempts)
+    for attempt in range(attempts):
+        if breaker is not None and not breaker.allow():
+            result["error"] = "LLM circuit breaker is open"
+            return result
+        try:
+            # The token is taken only once a slot is ours, right before the call: items queued
+            # for a slot don't drain the bucket shared with interactive traffic. Backoff holds no slot
+            async with semaphore:
+                if bucket is not None and not await asyncio.to_thread(bucket.acquire, acquire_timeout):
+                    raise GatewayBusyError("LLM rate limit: no token within the deadline")
+                fields = await asyncio.wait_for(registry.aextract(chain_name, input_data), call_timeout)
+        except GatewayBusyError as e:
+            # Never reached the endpoint: give back a half-open trial and record nothing
+            if breaker is not None:
+                breaker.release()
+            result["error"] = str(e)
+        except ValueError as e:
+            # The model answered, just not usably: not the endpoint's fault
+            if breaker is not None:
+                breaker.record(True)
+            result["error"] = str(e) or type(e).__name__
+        except Exception as e:
+            if breaker is not None:
+                breaker.record(False)
+            result["error"] = str(e) or type(e).__name__
+        else:
+            if breaker is not None:
+                breaker.record(True)
+            if cache:
+                cache.put(key, fields)
+            result.update(fields=fields, source="llm", error=None)
+            return result
+        if attempt < attempts - 1:
+            await asyncio.sleep(delays[attempt])
+    return result
+
+
+async def extract_stream(registry, chain_name: str, messages, concurrency: int = LLM_BATCH_CONCURRENCY,
+                         parser=None, cache=None, model: str = "", breaker=None, bucket=None,
+                         attempts: int = LLM_MAX_ATTEMPTS, call_timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+                         acquire_timeout: float = None):
+    """Yield {"index", "message", "fields", "source", "error"} for each message, in completion order
+
+    source is "parser", "cache" or "llm"; fields is None and error says why
+    when an item still failed after its attempts. breaker (CircuitBreaker) and
+    bucket (TokenBucket) are shared with interactive traffic when given. As in
+    the gateway, an attempt waits at most acquire_timeout (default call_timeout)
+    for a rate-limit token; one that gets none fails its attempt as busy.
+    """
+    if acquire_timeout is None:
+        acquire_timeout = call_timeout
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.ensure_future(_extract_one(registry, chain_name, index, message, semaphore, parser, cache, model,
+                                           breaker, bucket, attempts, call_timeout, acquire_timeout))
+        for index, message in enumerate(messages)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # The consumer stopped early: don't leave calls running
+        for task in tasks:
+            task.cancel()
+
+
+def extract_batch(registry, chain_name: str, messages, concurrency: int = LLM_BATCH_CONCURRENCY, **kwargs) -> list:
+    """extract_stream for synchronous callers: every result, in input order"""
+    async def collect():
+        return [result async for result in extract_stream(registry, chain_name, messages, concurrency, **kwargs)]
+
+    return sorted(asyncio.run(collect()), key=lambda result: result["index"])
+
+
+async def _main(chain_name: str, path: str, concurrency: int):
+    from main import LLM_MODEL, chains
+    from src.llm_cache import get_llm_cache
+    from src.llm_gateway import get_llm_gateway
+    from src.llm_guard import get_circuit_breaker
+    from src.schedule_store import get_schedule_store
+
+    with open(path, encoding="utf-8") as f:
+        messages = [line.strip() for line in f if line.strip()]
+    catalog = get_schedule_store().catalog()
+    failed = 0
+    async for result in extract_stream(chains, chain_name, messages, concurrency,
+                                       parser=default_parser(chain_name, catalog["doctors"], catalog["locations"]),
+                                       cache=get_llm_cache(), model=LLM_MODEL, breaker=get_circuit_breaker(),
+                                       bucket=get_llm_gateway().bucket):
+        failed += result["error"] is not None
+        print(json.dumps(result), flush=True)
+    print(f"{len(messages)} messages, {failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] not in ("greeting", "insurance"):
+        print("Usage: python src/llm_batch.py greeting|insurance MESSAGES_FILE [concurrency]")
+        sys.exit(1)
+    asyncio.run(_main(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else LLM_BATCH_CONCURRENCY))
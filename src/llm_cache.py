@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for LLM extraction results
+
+Entries are keyed by (prompt template hash, model name, normalized input), so
+the same message sent through the same prompt and model skips the network
+round trip. The in-memory tier is an LRU with a TTL; setting LLM_CACHE_DB
+adds an SQLite tier that every worker process shares. It is off by default
+because extraction inputs contain patient details.
+
+Usage: python src/llm_cache.py stats|clear
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import get_connection
+
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def normalize_input(value) -> str:
+    """Collapse whitespace so re-submitted or re-synthesized messages share an entry"""
+    return " ".join(str(value).split())
+
+
+def cache_key(template: str, model: str, input_data: dict) -> str:
+    template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        {"template": template_hash, "model": model,
+         "input": {k: normalize_input(v) for k, v in input_data.items()}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 db_path: str = LLM_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.db_path:
+            self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def get(self, key: str):
+        """Cached result for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[key]
+        if self.db_path:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                with self._lock:
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return dict(value)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: dict):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, dict(value))
+        if self.db_path:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def _remember(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers; returns how many disk rows went"""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+        if not self.db_path:
+            return 0
+        return self._conn().execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._conn().execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache used by safe_llm_call"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    cache = get_llm_cache()
+    if not cache.db_path:
+        print("Set LLM_CACHE_DB to use the on-disk tier")
+    elif command == "stats":
+        count = cache._conn().execute("SELECT COUNT(*) FROM llm_cache WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        print(f"{count} live entries in {cache.db_path}")
+    elif command == "clear":
+        cache.clear()
+        print(f"Cleared {cache.db_path}")
+    else:
+        print(__doc__)
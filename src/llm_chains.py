@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Extraction prompts and chains, built once per process
+
+greeting() and insurance() used to build a PromptTemplate, and safe_llm_call
+a new `prompt | llm` chain, on every call. The registry composes each chain
+once, the Groq client keeps its HTTP connections alive in a pool shared by all
+chains, and warm_up() (LLM_WARMUP=1) opens that connection at startup instead
+of on a patient's first request. Every call's latency is recorded per chain.
+
+Extraction asks for schema-constrained output: each prompt's pydantic model
+is bound as the tool the model must call, so the answer arrives as
+arguments that validate against the schema. Models without tool calling
+answer in text, which clean_llm_response scans in a single pass.
+"""
+
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+import httpx
+from langchain.prompts import PromptTemplate
+from pydantic import BaseModel, Field
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.helpers import clean_llm_response
+
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0") == "1"
+LLM_MAX_CONNECTIONS = 20
+LATENCY_WINDOW = 500
+
+GREETING_PROMPT = PromptTemplate(
+    input_variables=["message"],
+    template="""
+        Extract the following information from the user's message. Be very careful about date formats.
+
+        User Message: {message}
+
+        Extract:
+        1. Full Name (first and last name)
+        2. Date of Birth (must be in YYYY-MM-DD format, convert if necessary)
+        3. Preferred Doctor (should include "Dr." title if not present)
+        4. Location (clinic location)
+
+        Return JSON format:
+        {{
+            "Full Name": "<name or Not Provided>",
+            "Date of Birth": "<YYYY-MM-DD or Not Provided>",
+            "Preferred Doctor": "<Dr. Name or Not Provided>",
+            "Location": "<location or Not Provided>"
+        }}
+
+        JSON:"""
+)
+
+# Retry after validation: asks only for the fields still missing
+GREETING_FOLLOW_UP_PROMPT = PromptTemplate(
+    input_variables=["message", "fields"],
+    template="""
+        The user is answering a follow-up question. Extract only these fields from their message: {fields}
+
+        User Message: {message}
+
+        Date of Birth must be in YYYY-MM-DD format; Preferred Doctor should include the "Dr." title.
+        Return a JSON object with just those keys, using "Not Provided" for any the message doesn't give.
+
+        JSON:"""
+)
+
+INSURANCE_PROMPT = PromptTemplate(
+    input_variables=["message"],
+    template="""
+        Extract insurance information from the user's message:
+
+        User Message: {message}
+
+        Extract:
+        1. Insurance Carrier (company name)
+        2. Member ID (ID number)
+        3. Group (group number/name)
+
+        JSON format:
+        {{
+            "Insurance Carrier": "<carrier or Not Provided>",
+            "Member ID": "<id or Not Provided>",
+            "Group": "<group or Not Provided>"
+        }}
+
+        JSON:"""
+)
+
+PROMPTS = {"greeting": GREETING_PROMPT, "greeting_follow_up": GREETING_FOLLOW_UP_PROMPT, "insurance": INSURANCE_PROMPT}
+
+
+class GreetingExtraction(BaseModel):
+    """Patient details from a greeting message"""
+    full_name: str = Field("Not Provided", serialization_alias="Full Name",
+                           description="First and last name, or Not Provided")
+    date_of_birth: str = Field("Not Provided", serialization_alias="Date of Birth",
+                               description="Date of birth as YYYY-MM-DD, or Not Provided")
+    preferred_doctor: str = Field("Not Provided", serialization_alias="Preferred Doctor",
+                                  description='Doctor with the "Dr." title, or Not Provided')
+    location: str = Field("Not Provided", serialization_alias="Location",
+                          description="Clinic location, or Not Provided")
+
+
+class InsuranceExtraction(BaseModel):
+    """Insurance details from a patient's message"""
+    insurance_carrier: str = Field("Not Provided", serialization_alias="Insurance Carrier",
+                                   description="Insurance company name, or Not Provided")
+    member_id: str = Field("Not Provided", serialization_alias="Member ID",
+                           description="Member ID number, or Not Provided")
+    group: str = Field("Not Provided", serialization_alias="Group",
+                       description="Group number or name, or Not Provided")
+
+
+# Results are dumped by alias, so callers see the same keys as the JSON prompts
+SCHEMAS = {"greeting": GreetingExtraction, "greeting_follow_up": GreetingExtraction, "insurance": InsuranceExtraction}
+
+
+def make_http_client() -> httpx.Client:
+    """Keep-alive connection pool shared by every chain (and thread) in the process"""
+    return httpx.Client(limits=httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS, keepalive_expiry=60,
+    ))
+
+
+class LatencyStats:
+    """Recent call latencies per chain"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = {}
+        self._calls = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self._window)).append(seconds)
+            self._calls[name] = self._calls.get(name, 0) + 1
+
+    def summary(self) -> dict:
+        """{chain: {calls, mean_ms, p50_ms, p95_ms, max_ms}} over the recent window"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            calls = dict(self._calls)
+        summary = {}
+        for name, values in samples.items():
+            summary[name] = {
+                "calls": calls[name],
+                "mean_ms": round(statistics.fmean(values) * 1000, 1),
+                "p50_ms": round(values[len(values) // 2] * 1000, 1),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+        return summary
+
+
+def supports_tools(llm) -> bool:
+    try:
+        llm.bind_tools([GreetingExtraction])
+        return True
+    except NotImplementedError:
+        return False
+
+
+class ChainRegistry:
+    def __init__(self, llm, prompts: dict = PROMPTS, schemas: dict = SCHEMAS):
+        self.llm = llm
+        self.prompts = dict(prompts)
+        self.schemas = dict(schemas)
+        self.structured = llm is not None and supports_tools(llm)
+        self.chains = {name: prompt | self._model(name) for name, prompt in self.prompts.items()} if llm is not None else {}
+        self.latency = LatencyStats()
+
+    def _model(self, name: str, **kwargs):
+        schema = self.schemas.get(name)
+        if self.structured and schema is not None:
+            # Forcing the tool call makes the schema a constraint, not a suggestion
+            return self.llm.bind_tools([schema], tool_choice=schema.__name__, **kwargs)
+        return self.llm.bind(**kwargs) if kwargs else self.llm
+
+    def prompt(self, name: str) -> PromptTemplate:
+        return self.prompts[name]
+
+    def _chain(self, name: str, timeout: float = None):
+        if timeout is None:
+            return self.chains[name]
+        return self.prompts[name] | self._model(name, timeout=timeout)
+
+    def invoke(self, name: str, input_data: dict, timeout: float = None):
+        """Run a registered chain, recording how long it took (failures included)
+
+        timeout tightens the client's own request deadline for this call only.
+        """
+        chain = self._chain(name, timeout)
+        started = time.perf_counter()
+        try:
+            return chain.invoke(input_data)
+        finally:
+            self.latency.record(name, time.perf_counter() - started)
+
+    async def ainvoke(self, name: str, input_data: dict, timeout: float = None):
+        """invoke for asyncio callers"""
+        chain = self._chain(name, timeout)
+        started = time.perf_counter()
+        try:
+            return await chain.ainvoke(input_data)
+        finally:
+            self.latency.record(name, time.perf_counter() - started)
+
+    def parse(self, name: str, response) -> dict:
+        """Fields of a chain's response, keyed like the prompt's JSON; ValueError if there are none"""
+        tool_calls = getattr(response, "tool_calls", None)
+        schema = self.schemas.get(name)
+        if tool_calls and schema is not None:
+            # pydantic's ValidationError is a ValueError
+            return schema.model_validate(tool_calls[0]["args"]).model_dump(by_alias=True)
+        text = response.content if hasattr(response, "content") else str(response)
+        result = clean_llm_response(text)
+        if not isinstance(result, dict):
+            raise ValueError("No JSON object in LLM response")
+        return result
+
+    def extract(self, name: str, input_data: dict, timeout: float = None) -> dict:
+        """One call of a chain, parsed"""
+        return self.parse(name, self.invoke(name, input_data, timeout))
+
+    async def aextract(self, name: str, input_data: dict, timeout: float = None) -> dict:
+        return self.parse(name, await self.ainvoke(name, input_data, timeout))
+
+    def warm_up(self) -> bool:
+        """One single-token request, so the connection (TLS and all) is open before the first patient"""
+        if self.llm is None:
+            return False
+        started = time.perf_counter()
+        try:
+            self.llm.bind(max_tokens=1).invoke("ping")
+            return True
+        except Exception as e:
+            print(f"LLM warm-up failed: {e}")
+            return False
+        finally:
+            self.latency.record("warm_up", time.perf_counter() - started)
+
+    def warm_up_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, name="llm-warm-up", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Gateway in front of the LLM shared by every session in the process
+
+- a token bucket keeps the request rate under the provider's limit
+  (LLM_RATE_PER_MINUTE, bursts of LLM_BURST); with LLM_RATE_LIMIT_DB set the
+  bucket lives in SQLite and is shared by every worker process
+- a semaphore bounds requests in flight (LLM_MAX_CONCURRENCY)
+- identical requests already in flight are coalesced: later callers wait for
+  the first one's result instead of sending their own
+
+Queue depth, wait times and coalesced/rejected counts are reported by
+metrics().
+"""
+
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import get_connection
+
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "30"))
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RATE_LIMIT_DB_PATH = os.getenv("LLM_RATE_LIMIT_DB", "")
+WAIT_WINDOW = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class GatewayBusyError(Exception):
+    """No rate-limit token or concurrency slot came free within the caller's deadline"""
+
+
+class TokenBucket:
+    """capacity tokens, refilled at rate_per_second; one token per request"""
+
+    def __init__(self, rate_per_second: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if there is one; otherwise seconds until the next"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """The same bucket kept in an SQLite row, so every process draws from it"""
+
+    def __init__(self, db_path: str, rate_per_second: float, capacity: int, name: str = "llm",
+                 clock=time.time, sleep=time.sleep):
+        # Wall-clock time: the stored timestamp is compared across processes
+        super().__init__(rate_per_second, capacity, clock, sleep)
+        self.db_path = db_path
+        self.name = name
+        conn = get_connection(db_path)
+        conn.executescript(_SCHEMA)
+        conn.execute(
+            "INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            (name, float(capacity), clock()),
+        )
+
+    def _take(self) -> float:
+        conn = get_connection(self.db_path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated_at = conn.execute(
+                "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = self._clock()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("UPDATE token_buckets SET tokens = ?, updated_at = ? WHERE name = ?", (tokens, now, self.name))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class LLMGateway:
+    def __init__(self, bucket: TokenBucket, max_concurrency: int = LLM_MAX_CONCURRENCY, clock=time.monotonic):
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        self._queued = 0
+        self._active = 0
+        self._requests = 0
+        self._coalesced = 0
+        self._rejected = 0
+
+    def coalesce(self, key: str, fn):
+        """fn(), unless a call with the same key is already running: then its result (or error)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def run(self, fn, timeout: float = None):
+        """fn(remaining_timeout) once a rate-limit token and a concurrency slot are free
+
+        Waiting counts against timeout; GatewayBusyError if it runs out first.
+        """
+        started = self._clock()
+        deadline = None if timeout is None else started + timeout
+        with self._lock:
+            self._requests += 1
+            self._queued += 1
+        acquired = False
+        try:
+            if not self.bucket.acquire(timeout):
+                raise GatewayBusyError("LLM rate limit: no token within the deadline")
+            remaining = None if deadline is None else max(0.0, deadline - self._clock())
+            acquired = self._slots.acquire(timeout=remaining) if remaining is not None else self._slots.acquire()
+            if not acquired:
+                raise GatewayBusyError("LLM concurrency limit: no slot within the deadline")
+        except GatewayBusyError:
+            with self._lock:
+                self._queued -= 1
+                self._rejected += 1
+            raise
+        waited = self._clock() - started
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._waits.append(waited)
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - self._clock())
+            return fn(remaining)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._active -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._active,
+                "max_concurrency": self.max_concurrency,
+                "requests": self._requests,
+                "coalesced": self._coalesced,
+                "rejected": self._rejected,
+                "wait_mean_ms": round(statistics.fmean(waits) * 1000, 1) if waits else 0.0,
+                "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+            }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Gateway shared by every session in the process"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            rate = LLM_RATE_PER_MINUTE / 60
+            if LLM_RATE_LIMIT_DB_PATH:
+                bucket = SQLiteTokenBucket(LLM_RATE_LIMIT_DB_PATH, rate, LLM_BURST)
+            else:
+                bucket = TokenBucket(rate, LLM_BURST)
+            _gateway = LLMGateway(bucket, LLM_MAX_CONCURRENCY)
+        return _gateway
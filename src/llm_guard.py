@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Latency bounds for LLM calls: per-call deadlines, jittered exponential
+backoff, a per-step budget and a circuit breaker shared by every session
+
+Once the recent error rate crosses the threshold the breaker opens and calls
+fail immediately (callers fall back to rule-based parsing) instead of each
+session waiting out its own timeouts. After a cool-down one trial call is let
+through; success closes the breaker again.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "10"))
+LLM_STEP_BUDGET_SECONDS = float(os.getenv("LLM_STEP_BUDGET_SECONDS", "20"))
+LLM_MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_CAP_SECONDS = 4.0
+# No retry starts with less than this left of the step budget
+MIN_ATTEMPT_SECONDS = 0.5
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The breaker is refusing calls; use the non-LLM path"""
+
+
+def backoff_delays(attempts: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_CAP_SECONDS, rng=random):
+    """Sleep before each retry: "full jitter", uniform in [0, min(cap, base * 2**n)]"""
+    return [rng.uniform(0, min(cap, base * 2 ** n)) for n in range(max(0, attempts - 1))]
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class CircuitBreaker:
+    """Opens when at least min_calls of the last window calls saw an error rate of threshold or more"""
+
+    def __init__(self, threshold: float = 0.5, window: int = 20, min_calls: int = 5, cooldown_seconds: float = 30):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._times_opened = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; an open breaker lets one trial through after the cool-down"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._rejected += 1
+            return False
+
+    def release(self):
+        """Give back a trial that never reached the endpoint, recording nothing"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial_running = False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": state,
+                "recent_calls": calls,
+                "error_rate": round(self._outcomes.count(False) / calls, 3) if calls else 0.0,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+            }
+
+
+def guarded_call(call, breaker: CircuitBreaker, attempts: int = LLM_MAX_ATTEMPTS,
+                 call_timeout: float = LLM_CALL_TIMEOUT_SECONDS, budget_seconds: float = LLM_STEP_BUDGET_SECONDS,
+                 sleep=time.sleep, neutral_errors: tuple = (ValueError,), local_errors: tuple = ()):
+    """Return call(timeout), retrying failures with jittered backoff inside budget_seconds
+
+    Each attempt gets the per-call deadline cut to what is left of the budget.
+    neutral_errors are retried without counting against the endpoint (by
+    default ValueError: the model answered, but not usably). local_errors mean
+    the request never left the process (e.g. our own gateway was full): the
+    breaker's trial is given back, nothing is recorded and the attempt isn't
+    used up; only the budget limits those. Raises CircuitOpenError if the
+    breaker refuses an attempt, otherwise the last error once attempts or
+    budget run out.
+    """
+    deadline = Deadline(budget_seconds)
+    delays = backoff_delays(attempts)
+    error = None
+    attempt = 0
+    while attempt < attempts:
+        if not breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open") from error
+        try:
+            result = call(min(call_timeout, deadline.remaining()))
+        except local_errors as e:
+            breaker.release()
+            error = e
+            if deadline.remaining() < MIN_ATTEMPT_SECONDS:
+                break
+            continue
+        except neutral_errors as e:
+            breaker.record(True)
+            error = e
+        except Exception as e:
+            breaker.record(False)
+            error = e
+        else:
+            breaker.record(True)
+            return result
+        if attempt == attempts - 1 or deadline.remaining() < delays[attempt] + MIN_ATTEMPT_SECONDS:
+            break
+        sleep(delays[attempt])
+        attempt += 1
+    raise error
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Breaker shared by every session in the process"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
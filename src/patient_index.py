@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Persistent patient lookup index
+
+Maps a normalized (full_name, date_of_birth) key to the byte offset of the
+patient's record in data/patients.csv, so a lookup reads one record instead of
+parsing the whole file. The index remembers the size and mtime of the CSV it
+was built from and rebuilds itself when the file changes outside the app.
+
+New patients are appended to the CSV through add_patient, which also hands
+out IDs from a durable sequence. The index database's write lock serializes
+writers across sessions and processes.
+
+Usage: python src/patient_index.py rebuild
+"""
+
+import csv
+import io
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import get_connection
+
+PATIENTS_CSV_PATH = "data/patients.csv"
+PATIENT_INDEX_PATH = "data/patients_index.db"
+PATIENT_COLUMNS = [
+    "id", "full_name", "date_of_birth",
+    "email", "phone", "insurance_carrier", "insurance_member_id",
+    "insurance_group", "created_date"
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patient_keys (
+    name_key TEXT NOT NULL,
+    date_of_birth TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (name_key, date_of_birth)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def normalize_name(full_name) -> str:
+    """Case- and whitespace-insensitive name key"""
+    return " ".join(str(full_name).split()).lower()
+
+
+def normalize_dob(date_of_birth) -> str:
+    return str(date_of_birth).strip()
+
+
+def iter_csv_records(f, offset: int = 0):
+    """Yield (byte_offset, raw_bytes) for each CSV record in a binary file,
+    keeping quoted fields that span lines together"""
+    f.seek(offset)
+    position = offset
+    start = offset
+    buffer = b""
+    for line in iter(f.readline, b""):
+        if not buffer:
+            start = position
+        buffer += line
+        position += len(line)
+        # A record is complete once its quotes are balanced
+        if buffer.count(b'"') % 2 == 0:
+            yield start, buffer
+            buffer = b""
+    if buffer:
+        yield start, buffer
+
+
+def parse_record(raw: bytes) -> list:
+    rows = list(csv.reader(io.StringIO(raw.decode("utf-8"))))
+    return rows[0] if rows else []
+
+
+class PatientIndex:
+    def __init__(self, csv_path: str = PATIENTS_CSV_PATH, index_path: str = PATIENT_INDEX_PATH):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.index_path)
+
+    def _ensure_csv(self):
+        if not os.path.exists(self.csv_path):
+            directory = os.path.dirname(self.csv_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(PATIENT_COLUMNS)
+
+    def _csv_signature(self) -> str:
+        stat = os.stat(self.csv_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM index_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def data_version(self) -> str:
+        """Changes whenever data/patients.csv does (appended to or edited outside the app)"""
+        self._ensure_csv()
+        return self._csv_signature()
+
+    def is_current(self) -> bool:
+        self._ensure_csv()
+        return self._meta(self._conn(), "csv_signature") == self._csv_signature()
+
+    def refresh(self) -> bool:
+        """Rebuild the index if the CSV changed since it was built; True if rebuilt"""
+        if self.is_current():
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self) -> int:
+        """Scan the CSV once and record the offset of each patient's first record"""
+        self._ensure_csv()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._is_current_locked(conn):
+                # Another session rebuilt it while we waited for the lock
+                conn.execute("ROLLBACK")
+                return conn.execute("SELECT COUNT(*) FROM patient_keys").fetchone()[0]
+            count = self._rebuild_locked(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def _is_current_locked(self, conn) -> bool:
+        return self._meta(conn, "csv_signature") == self._csv_signature() and bool(self._meta(conn, "header"))
+
+    def _rebuild_locked(self, conn) -> int:
+        signature = self._csv_signature()
+        conn.execute("DELETE FROM patient_keys")
+        with open(self.csv_path, "rb") as f:
+            records = iter_csv_records(f)
+            header_record = next(records, None)
+            header = parse_record(header_record[1]) if header_record else PATIENT_COLUMNS
+            line_ending = "\r\n" if header_record and header_record[1].endswith(b"\r\n") else "\n"
+            name_col = header.index("full_name")
+            dob_col = header.index("date_of_birth")
+            id_col = header.index("id") if "id" in header else None
+            max_id = 0
+            keys = []
+            for offset, raw in records:
+                fields = parse_record(raw)
+                if len(fields) <= max(name_col, dob_col):
+                    continue
+                keys.append((normalize_name(fields[name_col]), normalize_dob(fields[dob_col]), offset))
+                if id_col is not None and id_col < len(fields):
+                    try:
+                        max_id = max(max_id, int(float(fields[id_col])))
+                    except ValueError:
+                        pass
+        # First occurrence wins, matching the old first-match lookup
+        conn.executemany(
+            "INSERT OR IGNORE INTO patient_keys (name_key, date_of_birth, offset) VALUES (?, ?, ?)",
+            keys,
+        )
+        # The ID sequence never moves backwards, even if rows were deleted
+        last_id = max(int(self._meta(conn, "last_patient_id") or 0), max_id)
+        self._set_meta(conn, "last_patient_id", str(last_id))
+        self._set_meta(conn, "header", ",".join(header))
+        self._set_meta(conn, "line_ending", line_ending)
+        self._set_meta(conn, "csv_signature", signature)
+        return len(keys)
+
+    def add_patient(self, record: dict) -> int:
+        """Append one patient record to the CSV and return its new ID
+
+        The record is written as a single appended line; the file is never
+        rewritten. IDs come from a sequence stored in the index database, and
+        BEGIN IMMEDIATE holds its write lock for the whole append, so
+        concurrent writers in other threads or processes wait their turn.
+        """
+        self._ensure_csv()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not self._is_current_locked(conn):
+                self._rebuild_locked(conn)
+            new_id = int(self._meta(conn, "last_patient_id") or 0) + 1
+            header = self._meta(conn, "header").split(",")
+            row = {**record, "id": new_id}
+
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator=self._meta(conn, "line_ending") or "\n").writerow(
+                ["" if row.get(column) is None else row.get(column) for column in header]
+            )
+            line = buffer.getvalue().encode("utf-8")
+
+            with open(self.csv_path, "r+b") as f:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                # Repair a missing trailing newline left by an external editor
+                if offset:
+                    f.seek(offset - 1)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                        offset += 1
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+            conn.execute(
+                "INSERT OR IGNORE INTO patient_keys (name_key, date_of_birth, offset) VALUES (?, ?, ?)",
+                (normalize_name(row.get("full_name", "")), normalize_dob(row.get("date_of_birth", "")), offset),
+            )
+            self._set_meta(conn, "last_patient_id", str(new_id))
+            self._set_meta(conn, "csv_signature", self._csv_signature())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return new_id
+
+    def lookup(self, full_name: str, date_of_birth: str):
+        """Return the patient's record as a dict, or None if not found"""
+        name_key, dob = normalize_name(full_name), normalize_dob(date_of_birth)
+        for _ in range(2):
+            self.refresh()
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT offset FROM patient_keys WHERE name_key = ? AND date_of_birth = ?",
+                (name_key, dob),
+            ).fetchone()
+            if row is None:
+                return None
+            header = self._meta(conn, "header").split(",")
+            with open(self.csv_path, "rb") as f:
+                _, raw = next(iter_csv_records(f, row[0]), (None, b""))
+            record = dict(zip(header, parse_record(raw)))
+            if normalize_name(record.get("full_name", "")) == name_key and \
+                    normalize_dob(record.get("date_of_birth", "")) == dob:
+                return record
+            # The file moved under us between the stat and the read; rebuild and retry
+            self.rebuild()
+        return None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_patient_index(csv_path: str = PATIENTS_CSV_PATH, index_path: str = PATIENT_INDEX_PATH) -> PatientIndex:
+    """Shared index per CSV file"""
+    with _indexes_lock:
+        index = _indexes.get((csv_path, index_path))
+        if index is None:
+            index = _indexes[(csv_path, index_path)] = PatientIndex(csv_path, index_path)
+        return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        index = PatientIndex()
+        print(f"Indexed {index.rebuild()} patient records from {index.csv_path}")
+    else:
+        print(__doc__)
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed doctor schedule store
+
+The booking path queries this store instead of parsing data/doctor_schedules.xlsx.
+The workbook stays the admin-facing format: import it once, export it on demand.
+
+A slot picked during scheduling gets a short-lived hold (slot_holds), stored
+as a time range so placing or dropping it never changes the schedule rows.
+Until it expires, other sessions don't see the slot and can't reserve it.
+
+Every availability change bumps a per-(doctor, location) version
+(schedule_versions), so in-memory views such as src/availability.py can tell
+when their copy is stale without re-reading the schedule. Each import bumps
+the store's generation, which keys caches of the doctor/location catalogue.
+
+Usage:
+    python src/schedule_store.py import [xlsx_path]
+    python src/schedule_store.py export [xlsx_path]
+"""
+
+import heapq
+import os
+import sys
+import threading
+import time
+from datetime import date as date_type
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import get_connection
+
+SCHEDULE_DB_PATH = "data/doctor_schedules.db"
+SCHEDULE_XLSX_PATH = "data/doctor_schedules.xlsx"
+SCHEDULE_COLUMNS = ["doctor_name", "location", "date", "start_time", "end_time", "available"]
+HOLD_TTL_SECONDS = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY,
+    doctor_name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    available INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_schedules_lookup
+    ON schedules (doctor_name, location, date, start_time, available);
+CREATE TABLE IF NOT EXISTS slot_holds (
+    holder TEXT PRIMARY KEY,
+    doctor_name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_slot_holds_slot ON slot_holds (doctor_name, location, date, expires_at);
+CREATE TABLE IF NOT EXISTS schedule_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule_versions (
+    doctor_name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (doctor_name, location)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_date(value) -> str:
+    """Dates are stored as YYYY-MM-DD strings"""
+    if isinstance(value, date_type):
+        return value.strftime("%Y-%m-%d")
+    return pd.to_datetime(str(value).strip()).strftime("%Y-%m-%d")
+
+
+def normalize_time(value) -> str:
+    """Times are stored as zero-padded HH:MM strings so they sort lexically"""
+    if hasattr(value, "strftime"):
+        return value.strftime("%H:%M")
+    return pd.to_datetime(str(value).strip(), format="%H:%M").strftime("%H:%M")
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    missing = [c for c in SCHEDULE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Schedule is missing columns: {', '.join(missing)}")
+    return pd.DataFrame({
+        "doctor_name": df["doctor_name"].astype(str).str.strip(),
+        "location": df["location"].astype(str).str.strip(),
+        "date": pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"),
+        "start_time": pd.to_datetime(df["start_time"].astype(str), format="%H:%M").dt.strftime("%H:%M"),
+        "end_time": pd.to_datetime(df["end_time"].astype(str), format="%H:%M").dt.strftime("%H:%M"),
+        "available": df["available"].astype(bool).astype(int),
+    })
+
+
+class HoldSweeper:
+    """Expires holds from a min-heap of deadlines instead of scanning the schedule
+
+    Each process tracks the holds it placed; sweep() pops only the entries
+    whose deadline has passed, so a sweep with nothing due is a single heap
+    peek. Queries also ignore expired holds, so correctness never waits on a
+    sweep; sweeping just keeps the table small.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def track(self, expires_at: float, holder: str):
+        with self._lock:
+            heapq.heappush(self._heap, (expires_at, holder))
+
+    def due(self, now: float) -> list:
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expired.append(heapq.heappop(self._heap))
+        return expired
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class ScheduleStore:
+    def __init__(self, db_path: str = SCHEDULE_DB_PATH):
+        self.db_path = db_path
+        self.sweeper = HoldSweeper()
+        self._catalog = None
+        self._catalog_lock = threading.Lock()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM schedules LIMIT 1").fetchone() is None
+
+    def import_excel(self, xlsx_path: str = SCHEDULE_XLSX_PATH, replace: bool = True) -> int:
+        """Replace the stored schedule with the contents of a workbook
+
+        With replace=False the import only happens if the store is still empty,
+        so several processes can seed the store at startup without racing.
+        """
+        df = _normalize_frame(pd.read_excel(xlsx_path))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not replace and conn.execute("SELECT 1 FROM schedules LIMIT 1").fetchone():
+                conn.execute("ROLLBACK")
+                return 0
+            conn.execute("DELETE FROM schedules")
+            conn.execute("DELETE FROM slot_holds")
+            conn.executemany(
+                "INSERT INTO schedules (doctor_name, location, date, start_time, end_time, available) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                df[SCHEDULE_COLUMNS].itertuples(index=False, name=None),
+            )
+            # Versions only ever grow, so no cached copy of the old schedule looks current
+            conn.execute(
+                "INSERT INTO schedule_meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+            conn.execute("UPDATE schedule_versions SET version = version + 1")
+            conn.execute(
+                "INSERT OR IGNORE INTO schedule_versions (doctor_name, location, version) "
+                "SELECT DISTINCT doctor_name, location, 1 FROM schedules"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(df)
+
+    def export_excel(self, xlsx_path: str = SCHEDULE_XLSX_PATH) -> int:
+        """Write the stored schedule back to a workbook for admins"""
+        df = self.to_dataframe()
+        directory = os.path.dirname(xlsx_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        df.to_excel(xlsx_path, index=False)
+        return len(df)
+
+    def to_dataframe(self, available_only: bool = False) -> pd.DataFrame:
+        query = f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedules"
+        if available_only:
+            query += " WHERE available = 1"
+        df = pd.read_sql_query(query + " ORDER BY id", self._conn())
+        df["available"] = df["available"].astype(bool)
+        return df
+
+    def fetch_slots(self, doctor_name: str, location: str, available_only: bool = True,
+                    holder: str = None) -> pd.DataFrame:
+        """Schedule rows for one doctor/location, served from the lookup index
+
+        With available_only, rows overlapping another session's active hold are
+        left out; the holder still sees the rows of its own hold.
+        """
+        query = (
+            f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedules s "
+            "WHERE doctor_name = ? AND location = ?"
+        )
+        params = [doctor_name.strip(), location.strip()]
+        if available_only:
+            self.sweep()
+            query += (
+                " AND available = 1 AND NOT EXISTS ("
+                "SELECT 1 FROM slot_holds h WHERE h.doctor_name = s.doctor_name AND h.location = s.location "
+                "AND h.date = s.date AND h.start_time < s.end_time AND h.end_time > s.start_time "
+                "AND h.expires_at > ? AND h.holder != ?)"
+            )
+            params += [time.time(), holder or ""]
+        rows = self._conn().execute(query + " ORDER BY id", params).fetchall()
+        df = pd.DataFrame([tuple(r) for r in rows], columns=SCHEDULE_COLUMNS)
+        df["available"] = df["available"].astype(bool)
+        return df
+
+    def doctor_locations(self) -> dict:
+        """Map each doctor to their locations, in order of first appearance"""
+        rows = self._conn().execute(
+            "SELECT doctor_name, location FROM schedules "
+            "GROUP BY doctor_name, location ORDER BY MIN(id)"
+        ).fetchall()
+        mapping = {}
+        for doctor_name, location in rows:
+            mapping.setdefault(doctor_name, []).append(location)
+        return mapping
+
+    def doctors(self) -> list:
+        return list(self.doctor_locations())
+
+    def generation(self) -> int:
+        """Import counter: the doctor/location catalogue only changes when this does"""
+        row = self._conn().execute("SELECT value FROM schedule_meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def catalog(self) -> dict:
+        """Doctors, locations and the doctor -> locations map, recomputed once per import
+
+        Costs one primary-key read while the generation is unchanged, instead of
+        grouping the whole schedule table.
+        """
+        generation = self.generation()
+        with self._catalog_lock:
+            if self._catalog is not None and self._catalog[0] == generation:
+                return self._catalog[1]
+        doctor_locations = self.doctor_locations()
+        catalog = {
+            "doctors": list(doctor_locations),
+            "locations": self.locations(),
+            "doctor_locations": doctor_locations,
+        }
+        with self._catalog_lock:
+            self._catalog = (generation, catalog)
+        return catalog
+
+    def locations(self) -> list:
+        rows = self._conn().execute(
+            "SELECT location FROM schedules GROUP BY location ORDER BY MIN(id)"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def version(self, doctor_name: str, location: str) -> int:
+        """Change counter for one doctor/location; 0 if it was never written"""
+        row = self._conn().execute(
+            "SELECT version FROM schedule_versions WHERE doctor_name = ? AND location = ?",
+            (doctor_name.strip(), location.strip()),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, conn, doctor_name, location):
+        conn.execute(
+            "INSERT INTO schedule_versions (doctor_name, location, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (doctor_name, location) DO UPDATE SET version = version + 1",
+            (doctor_name.strip(), location.strip()),
+        )
+
+    def set_availability(self, doctor_name, location, date, start_time, end_time, available: bool) -> int:
+        """Flip the availability of the slots between start_time and end_time; returns the rows updated"""
+        return len(self.update_availability(doctor_name, location, date, start_time, end_time, available))
+
+    def update_availability(self, doctor_name, location, date, start_time, end_time, available: bool) -> list:
+        """set_availability, returning (start_time, end_time) of each row it updated
+
+        Only rows lying entirely inside [start_time, end_time) change. A single
+        UPDATE that walks the lookup index from (doctor, location, date,
+        start_time), so it touches only the affected rows and is atomic with
+        respect to other sessions and processes.
+        """
+        params = [
+            int(bool(available)), doctor_name.strip(), location.strip(), normalize_date(date),
+            normalize_time(start_time), normalize_time(end_time),
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "UPDATE schedules SET available = ? "
+                "WHERE doctor_name = ? AND location = ? AND date = ? "
+                "AND start_time >= ? AND end_time <= ? RETURNING start_time, end_time",
+                params,
+            ).fetchall()
+            if rows:
+                self._bump_version(conn, doctor_name, location)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return sorted((row["start_time"], row["end_time"]) for row in rows)
+
+    def held_ranges(self, doctor_name: str, location: str, holder: str = None) -> list:
+        """(date, start_time, end_time) of every other session's active hold"""
+        return self._conn().execute(
+            "SELECT date, start_time, end_time FROM slot_holds "
+            "WHERE doctor_name = ? AND location = ? AND expires_at > ? AND holder != ?",
+            (doctor_name.strip(), location.strip(), time.time(), holder or ""),
+        ).fetchall()
+
+    def _claimable_rows(self, conn, doctor_name, location, date, start, end, holder):
+        """Rows covering [start, end) if they form one contiguous block that is
+        available and overlaps no hold but holder's; otherwise None
+
+        Slots start on a row boundary; the last row may run past end (e.g. a
+        45-minute visit over 30-minute rows).
+        """
+        if start >= end:
+            return None
+        rows = conn.execute(
+            "SELECT id, start_time, end_time, available FROM schedules "
+            "WHERE doctor_name = ? AND location = ? AND date = ? "
+            "AND start_time < ? AND end_time > ? ORDER BY start_time",
+            (doctor_name, location, date, end, start),
+        ).fetchall()
+        contiguous = (
+            bool(rows) and rows[0]["start_time"] == start and rows[-1]["end_time"] >= end and
+            all(a["end_time"] == b["start_time"] for a, b in zip(rows, rows[1:]))
+        )
+        if not contiguous or not all(row["available"] for row in rows):
+            return None
+        held_by_other = conn.execute(
+            "SELECT 1 FROM slot_holds WHERE doctor_name = ? AND location = ? AND date = ? "
+            "AND start_time < ? AND end_time > ? AND expires_at > ? AND holder != ? LIMIT 1",
+            (doctor_name, location, date, end, start, time.time(), holder or ""),
+        ).fetchone()
+        return None if held_by_other else rows
+
+    def _split_row(self, conn, row, boundary):
+        """Cut a row at boundary; the piece after it keeps the row's availability"""
+        conn.execute("UPDATE schedules SET end_time = ? WHERE id = ?", (boundary, row["id"]))
+        conn.execute(
+            "INSERT INTO schedules (doctor_name, location, date, start_time, end_time, available) "
+            "SELECT doctor_name, location, date, ?, ?, available FROM schedules WHERE id = ?",
+            (boundary, row["end_time"], row["id"]),
+        )
+
+    def reserve_slot(self, doctor_name, location, date, start_time, end_time, holder: str = None) -> bool:
+        """Atomically book the slot: compare-and-set on every row it covers
+
+        Succeeds only if the rows between start_time and end_time form one
+        contiguous, fully available block that no other session holds;
+        otherwise nothing changes and False is returned (someone else got there
+        first). BEGIN IMMEDIATE takes the database write lock, so the check and
+        the update cannot interleave with another thread or another server
+        process.
+
+        A visit ending part-way through a row (45 minutes over 30-minute rows)
+        splits that row at its end in the same transaction, so only the booked
+        time is taken; this is the only place schedule rows are ever cut.
+        """
+        doctor_name, location, date = doctor_name.strip(), location.strip(), normalize_date(date)
+        start, end = normalize_time(start_time), normalize_time(end_time)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._claimable_rows(conn, doctor_name, location, date, start, end, holder)
+            if rows is None:
+                conn.execute("ROLLBACK")
+                return False
+            if rows[-1]["end_time"] > end:
+                self._split_row(conn, rows[-1], end)
+            conn.executemany("UPDATE schedules SET available = 0 WHERE id = ?", [(row["id"],) for row in rows])
+            if holder:
+                conn.execute("DELETE FROM slot_holds WHERE holder = ?", (holder,))
+            self._bump_version(conn, doctor_name, location)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def place_hold(self, doctor_name, location, date, start_time, end_time, holder: str,
+                   ttl_seconds: float = HOLD_TTL_SECONDS) -> bool:
+        """Hold the slot for holder until the TTL runs out
+
+        A holder keeps at most one hold: placing a new one replaces the
+        previous one, and re-holding the same slot extends it. The hold is a
+        time range; the schedule rows are left as they are. Returns False if
+        the slot is booked or held by another session.
+        """
+        self.sweep()
+        doctor_name, location, date = doctor_name.strip(), location.strip(), normalize_date(date)
+        start, end = normalize_time(start_time), normalize_time(end_time)
+        expires_at = time.time() + ttl_seconds
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._claimable_rows(conn, doctor_name, location, date, start, end, holder) is None:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO slot_holds "
+                "(holder, doctor_name, location, date, start_time, end_time, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (holder, doctor_name, location, date, start, end, expires_at),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.sweeper.track(expires_at, holder)
+        return True
+
+    def release_hold(self, holder: str) -> int:
+        """Drop the holder's hold, e.g. when the patient cancels or starts over"""
+        return self._conn().execute("DELETE FROM slot_holds WHERE holder = ?", (holder,)).rowcount
+
+    def sweep(self, now: float = None) -> int:
+        """Delete holds whose deadline passed; cost is proportional to the holds that expired"""
+        now = time.time() if now is None else now
+        expired = self.sweeper.due(now)
+        if not expired:
+            return 0
+        conn = self._conn()
+        removed = 0
+        for _, holder in expired:
+            removed += conn.execute(
+                "DELETE FROM slot_holds WHERE holder = ? AND expires_at <= ?", (holder, now)
+            ).rowcount
+        return removed
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_schedule_store(db_path: str = SCHEDULE_DB_PATH, xlsx_path: str = None) -> ScheduleStore:
+    """Shared store per database file; seeds itself on first use from the
+    workbook next to it (data/doctor_schedules.db <- data/doctor_schedules.xlsx)"""
+    if xlsx_path is None:
+        xlsx_path = os.path.splitext(db_path)[0] + ".xlsx"
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = ScheduleStore(db_path)
+            if store.is_empty() and xlsx_path and os.path.exists(xlsx_path):
+                store.import_excel(xlsx_path, replace=False)
+            _stores[db_path] = store
+        return store
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    path = sys.argv[2] if len(sys.argv) > 2 else SCHEDULE_XLSX_PATH
+    store = ScheduleStore()
+    if command == "import":
+        print(f"Imported {store.import_excel(path)} schedule rows from {path} into {store.db_path}")
+    elif command == "export":
+        print(f"Exported {store.export_excel(path)} schedule rows from {store.db_path} to {path}")
+    else:
+        print(__doc__)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pool of logged-in SMTP connections shared by every session in the process
+
+send_email used to connect, STARTTLS and log in for every message: a TCP and
+TLS handshake plus several round trips before the message itself. The pool
+keeps up to SMTP_POOL_SIZE authenticated connections open and reuses them:
+
+- a connection idle for more than SMTP_CHECK_AFTER_SECONDS is checked with
+  NOOP before use; one idle for more than SMTP_IDLE_SECONDS is closed
+- a send that finds its connection dropped reconnects and tries once more
+- send_many() sends a batch (e.g. the reminders due now) back to back over one
+  connection, and reports each message's error without stopping the batch
+
+stats() counts connects, reuses, health checks, reconnects and sent/failed
+messages.
+"""
+
+import atexit
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# Gmail closes connections idle for a few minutes; close ours first
+SMTP_IDLE_SECONDS = 240
+SMTP_CHECK_AFTER_SECONDS = 10
+SMTP_TIMEOUT_SECONDS = 30
+
+# The connection is gone (server idle timeout, network); anything else is about the message
+_DROPPED = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _close(smtp):
+    try:
+        smtp.close()
+    except Exception:
+        pass
+
+
+def _quit(smtp):
+    try:
+        smtp.quit()
+    except Exception:
+        _close(smtp)
+
+
+class SMTPPool:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: str = None, password: str = None,
+                 starttls: bool = SMTP_STARTTLS, size: int = SMTP_POOL_SIZE, idle_seconds: float = SMTP_IDLE_SECONDS,
+                 check_after_seconds: float = SMTP_CHECK_AFTER_SECONDS, timeout: float = SMTP_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.check_after_seconds = check_after_seconds
+        self.timeout = timeout
+        self._idle = deque()  # (connection, last used), most recently used last
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {"connects": 0, "reuses": 0, "health_checks": 0, "reconnects": 0, "sent": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            _close(smtp)
+            raise
+        self._count("connects")
+        return smtp
+
+    def _checkout(self) -> smtplib.SMTP:
+        """The most recently used idle connection that is still alive, else a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle > self.idle_seconds:
+                _quit(smtp)
+                continue
+            if idle > self.check_after_seconds:
+                self._count("health_checks")
+                try:
+                    alive = smtp.noop()[0] == 250
+                except Exception:
+                    alive = False
+                if not alive:
+                    _close(smtp)
+                    continue
+            self._count("reuses")
+            return smtp
+        return self._connect()
+
+    def _checkin(self, smtp: smtplib.SMTP):
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+
+    def send_many(self, messages) -> list:
+        """Send messages back to back over one connection; None (sent) or the error for each
+
+        Raises TimeoutError if no connection is free within the pool's timeout.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No SMTP connection free")
+        results = []
+        smtp = None
+        try:
+            for msg in messages:
+                error = None
+                for attempt in range(2):
+                    try:
+                        if smtp is None:
+                            smtp = self._checkout()
+                        smtp.send_message(msg)
+                        error = None
+                        break
+                    except _DROPPED as e:
+                        if smtp is not None:
+                            _close(smtp)
+                            smtp = None
+                        error = e
+                        if attempt == 0:
+                            self._count("reconnects")
+                    except Exception as e:
+                        # Refused recipient, login failure, ...: retrying won't help
+                        error = e
+                        break
+                self._count("failed" if error else "sent")
+                results.append(error)
+        finally:
+            if smtp is not None:
+                self._checkin(smtp)
+            self._slots.release()
+        return results
+
+    def send(self, msg):
+        """Send one message, raising its error"""
+        error = self.send_many([msg])[0]
+        if error is not None:
+            raise error
+
+    def close(self):
+        """QUIT every idle connection"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for smtp, _ in idle:
+            _quit(smtp)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool(username: str = None, password: str = None) -> SMTPPool:
+    """Pool shared by every session in the process, logged in as username"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool(username=username, password=password)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for the SMTP pool's tests and benchmark
+
+Accepts EHLO/HELO, AUTH PLAIN (any credentials), MAIL, RCPT, DATA, RSET,
+NOOP and QUIT over plain TCP and keeps the messages in memory. reply_delay
+is slept before every reply (one network round trip); connect_delay is
+added before the greeting and the AUTH reply, standing in for the TLS
+handshake and the credential check. Recipients starting with "reject" are
+refused with 550.
+"""
+
+import socket
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, *lines):
+        time.sleep(self.server.sink.reply_delay)
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode())
+
+    def handle(self):
+        sink = self.server.sink
+        sink._opened(self.connection)
+        try:
+            time.sleep(sink.connect_delay)
+            self.reply("220 sink ESMTP")
+            recipients = []
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    self.reply("250-sink", "250-AUTH PLAIN", "250 8BITMIME")
+                elif verb == "AUTH":
+                    time.sleep(sink.connect_delay)
+                    self.reply("235 2.7.0 Authentication successful")
+                elif verb == "MAIL":
+                    recipients = []
+                    self.reply("250 OK")
+                elif verb == "RCPT":
+                    address = command.split(":", 1)[1].strip(" <>")
+                    if address.lower().startswith("reject"):
+                        self.reply("550 5.1.1 No such user")
+                    else:
+                        recipients.append(address)
+                        self.reply("250 OK")
+                elif verb == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    for line in iter(self.rfile.readline, b""):
+                        if line in (b".\r\n", b".\n"):
+                            break
+                        data.append(line)
+                    sink._received(recipients, b"".join(data))
+                    self.reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    self.reply("250 OK")
+                elif verb == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+        except OSError:
+            pass
+        finally:
+            sink._closed(self.connection)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, reply_delay: float = 0.0, connect_delay: float = 0.0):
+        self.reply_delay = reply_delay
+        self.connect_delay = connect_delay
+        self.messages = []  # (recipients, raw message)
+        self.connections = 0
+        self._open = set()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+
+    def _opened(self, conn):
+        with self._lock:
+            self.connections += 1
+            self._open.add(conn)
+
+    def _closed(self, conn):
+        with self._lock:
+            self._open.discard(conn)
+
+    def _received(self, recipients, data):
+        with self._lock:
+            self.messages.append((list(recipients), data))
+
+    def drop_connections(self):
+        """Close every open session from the server's side, like an idle timeout"""
+        with self._lock:
+            conns = list(self._open)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.drop_connections()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for the appointment journal and its xlsx compaction
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.appointment_journal import EXPORT_COLUMNS, AppointmentJournal, get_appointment_journal
+
+
+def _booking(i):
+    record = {column: f"value-{i}" for column in EXPORT_COLUMNS}
+    record["Appointment ID"] = f"APT-20250101-{i:08d}"
+    record["Email Sent"] = False
+    return record
+
+
+def test_append_then_compact_materializes_workbook():
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "appointments_export.xlsx")
+        journal = AppointmentJournal(os.path.join(tmp, "appointments.db"))
+        for i in range(3):
+            journal.append(_booking(i))
+        assert journal.pending_count() == 3
+        assert not os.path.exists(xlsx_path)
+
+        assert journal.compact(xlsx_path) == 3
+        df = pd.read_excel(xlsx_path)
+        assert list(df.columns) == EXPORT_COLUMNS
+        assert list(df["Appointment ID"]) == [f"APT-20250101-{i:08d}" for i in range(3)]
+        assert journal.pending_count() == 0
+
+        # Nothing new: compaction is a no-op
+        assert journal.compact(xlsx_path) == 0
+        journal.append(_booking(3))
+        assert journal.compact(xlsx_path) == 4
+
+
+def test_existing_export_is_kept():
+    """Bookings already in the workbook are seeded into the journal once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "appointments_export.xlsx")
+        db_path = os.path.join(tmp, "appointments.db")
+        pd.DataFrame([_booking(100), _booking(101)]).to_excel(xlsx_path, index=False)
+
+        journal = get_appointment_journal(db_path, xlsx_path)
+        assert journal.import_excel(xlsx_path) == 0
+        journal.append(_booking(102))
+        assert journal.compact(xlsx_path) == 3
+        assert list(pd.read_excel(xlsx_path)["Appointment ID"])[-1] == "APT-20250101-00000102"
+
+
+def test_concurrent_appends_are_not_lost():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "appointments.db")
+        AppointmentJournal(db_path)
+
+        def book(i):
+            return AppointmentJournal(db_path).append(_booking(i))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            seqs = list(pool.map(book, range(200)))
+        assert len(set(seqs)) == 200
+        assert len(AppointmentJournal(db_path).to_dataframe()) == 200
+
+
+def test_rerun_appends_booking_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = AppointmentJournal(os.path.join(tmp, "appointments.db"))
+        seq = journal.append(_booking(1))
+        # The mailing step reruns and journals the same booking again
+        assert journal.append(_booking(1)) == seq
+        assert journal.append(_booking(2)) != seq
+        assert journal.pending_count() == 2
+
+
+def test_bookings_not_blocked_by_compaction():
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "appointments_export.xlsx")
+        db_path = os.path.join(tmp, "appointments.db")
+        journal = AppointmentJournal(db_path)
+        journal.append(_booking(0))
+        export = journal.to_dataframe
+
+        def to_dataframe(upto=None):
+            # A booking arriving mid-export gets the write lock without waiting
+            booking = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+            booking.execute("BEGIN IMMEDIATE")
+            booking.execute("INSERT INTO appointments (appointment_id, record) VALUES ('APT-late', '{}')")
+            booking.execute("COMMIT")
+            booking.close()
+            return export(upto)
+
+        journal.to_dataframe = to_dataframe
+        assert journal.compact(xlsx_path) == 1
+        # The late booking wasn't part of this export, so it is still pending
+        assert journal.pending_count() == 1
+        assert len(pd.read_excel(xlsx_path)) == 1
+
+
+def test_concurrent_compactions_take_turns():
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "appointments_export.xlsx")
+        db_path = os.path.join(tmp, "appointments.db")
+        journal = AppointmentJournal(db_path)
+        for i in range(20):
+            journal.append(_booking(i))
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            written = list(pool.map(lambda _: AppointmentJournal(db_path).compact(xlsx_path), range(6)))
+        # One compaction writes the workbook; the others find it up to date
+        assert sorted(written) == [0] * 5 + [20]
+        assert len(pd.read_excel(xlsx_path)) == 20
+        # No temp workbooks left behind
+        assert [f for f in os.listdir(tmp) if f.endswith(".xlsx")] == ["appointments_export.xlsx"]
+
+
+if __name__ == "__main__":
+    test_append_then_compact_materializes_workbook()
+    test_existing_export_is_kept()
+    test_concurrent_appends_are_not_lost()
+    test_rerun_appends_booking_once()
+    test_bookings_not_blocked_by_compaction()
+    test_concurrent_compactions_take_turns()
+    print(" All appointment journal tests passed!")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for the availability bitmaps: same slots as the row-based engine,
+any visit length with buffers, in-place updates, and invalidation when
+another process writes
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.availability import AvailabilityIndex, DayBitmap, time_to_unit
+from src.helpers import _slots_from_schedule, get_available_slots
+from src.schedule_store import ScheduleStore
+from src.test_slot_engine import build_schedule
+
+DOCTORS = ["Dr. Smith", "Dr. Johnson"]
+LOCATIONS = ["Main Clinic", "Railway Clinic"]
+
+
+def _store(tmp, df):
+    xlsx_path = os.path.join(tmp, "schedules.xlsx")
+    df.to_excel(xlsx_path, index=False)
+    store = ScheduleStore(os.path.join(tmp, "schedules.db"))
+    store.import_excel(xlsx_path)
+    return store
+
+
+def test_bitmap_slots_match_row_engine():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, build_schedule(DOCTORS, LOCATIONS, days=5, seed=4))
+        for doctor in DOCTORS:
+            for location in LOCATIONS:
+                rows = store.fetch_slots(doctor, location)
+                for duration in (30, 60):
+                    assert get_available_slots(store.db_path, duration, doctor, location) == \
+                        _slots_from_schedule(rows, duration, doctor, location)
+
+
+def test_updates_flip_bits_in_place():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, build_schedule(["Dr. Smith"], ["Main Clinic"], days=1, seed=0, availability=1))
+        index = AvailabilityIndex(store)
+        days = index.days("Dr. Smith", "Main Clinic")
+        assert ("2025-01-06", "09:00", "10:00") in index.find_slots("Dr. Smith", "Main Clinic", 60)
+
+        assert index.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:30", "10:00", False) == 1
+        assert index.days("Dr. Smith", "Main Clinic") is days
+        starts = [s for _, s, _ in index.find_slots("Dr. Smith", "Main Clinic", 60)]
+        assert "09:00" not in starts and "09:30" not in starts and "10:00" in starts
+
+        assert index.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "10:00", "10:30")
+        assert not index.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "10:00", "10:30")
+        assert index.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:30", "10:30", True) == 2
+        assert index.days("Dr. Smith", "Main Clinic") is days
+        assert index.find_slots("Dr. Smith", "Main Clinic", 30) == [
+            (r.date, r.start_time, r.end_time) for r in store.fetch_slots("Dr. Smith", "Main Clinic").itertuples()
+        ]
+
+
+def test_partial_row_update_flips_only_updated_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, build_schedule(["Dr. Smith"], ["Main Clinic"], days=1, seed=0, availability=1))
+        index = AvailabilityIndex(store)
+        days = index.days("Dr. Smith", "Main Clinic")
+
+        # 09:30-10:00 is only partly inside the range, so the store leaves it free
+        assert index.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "09:45", False) == 1
+        assert index.days("Dr. Smith", "Main Clinic") is days
+        fresh = AvailabilityIndex(ScheduleStore(store.db_path))
+        for duration in (15, 30, 60):
+            assert index.find_slots("Dr. Smith", "Main Clinic", duration) == \
+                fresh.find_slots("Dr. Smith", "Main Clinic", duration)
+        assert index.is_open("Dr. Smith", "Main Clinic", "2025-01-06", "09:30", 30)
+
+
+def test_other_writers_invalidate_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, build_schedule(["Dr. Smith"], ["Main Clinic"], days=1, seed=0, availability=1))
+        index = AvailabilityIndex(store)
+        other = AvailabilityIndex(ScheduleStore(store.db_path))
+        index.days("Dr. Smith", "Main Clinic")
+
+        other.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "09:30", False)
+        assert index.find_slots("Dr. Smith", "Main Clinic", 30)[0][1] == "09:30"
+        # A local write racing another writer drops the cached copy instead of patching it
+        other.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:30", "10:00", False)
+        index.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "10:00", "10:30", False)
+        assert index.find_slots("Dr. Smith", "Main Clinic", 30)[0][1] == "10:30"
+
+
+def _reference_starts(df, duration, buffer=0):
+    """Brute force over minutes: starts on a row start whose whole visit is
+    available and whose buffers touch no booked row"""
+    free, booked = set(), set()
+    for row in df.itertuples():
+        start, end = time_to_unit(row.start_time) * 15, time_to_unit(row.end_time) * 15
+        (free if row.available else booked).update(range(start, end))
+    starts = []
+    for row in df.sort_values("start_time").itertuples():
+        start = time_to_unit(row.start_time) * 15
+        visit = set(range(start, start + duration))
+        around = set(range(start - buffer, start)) | set(range(start + duration, start + duration + buffer))
+        if visit <= free and not around & booked:
+            starts.append(row.start_time)
+    return starts
+
+
+def test_any_duration_and_buffers():
+    df = build_schedule(["Dr. Smith"], ["Main Clinic"], days=1, seed=2, availability=0.7)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, df)
+        xlsx_path = os.path.join(tmp, "schedules.xlsx")
+        for duration in (15, 30, 45, 60, 90, 120):
+            for buffer in (0, 15, 30):
+                expected = _reference_starts(df, duration, buffer)
+                for path in (store.db_path, xlsx_path):
+                    slots = get_available_slots(path, duration, "Dr. Smith", "Main Clinic", buffer_minutes=buffer)
+                    assert [s["start_time"] for s in slots] == expected, (path, duration, buffer)
+                    assert all(s["duration"] == str(pd.Timedelta(minutes=duration)) for s in slots)
+
+
+def test_partial_row_booking_splits_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, build_schedule(["Dr. Smith"], ["Main Clinic"], days=1, seed=0, availability=1))
+        index = AvailabilityIndex(store)
+        assert index.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "09:45")
+        # The rest of the 09:30 row is still bookable, from 09:45
+        starts = [s for _, s, _ in index.find_slots("Dr. Smith", "Main Clinic", 15)]
+        assert starts[:2] == ["09:45", "10:00"]
+        assert index.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:45", "10:30")
+        assert not index.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "10:15", "10:45")
+
+        rows = store.to_dataframe().sort_values("start_time")
+        morning = rows[rows["start_time"] < "11:00"]
+        assert list(zip(morning["start_time"], morning["end_time"], morning["available"])) == [
+            ("09:00", "09:30", False), ("09:30", "09:45", False), ("09:45", "10:00", False),
+            ("10:00", "10:30", False), ("10:30", "11:00", True),
+        ]
+
+
+def test_gaps_and_off_grid_times():
+    day = DayBitmap()
+    day.add_row(time_to_unit("09:00"), time_to_unit("09:30"), False)
+    day.add_row(time_to_unit("10:00"), time_to_unit("10:30"), False)
+    # Restoring a range that spans the 09:30 gap must not make the gap bookable
+    day.mark(time_to_unit("09:00"), time_to_unit("10:30"), True)
+    assert day.slot_starts(6) == 0
+    assert day.slot_starts(2) == (1 << time_to_unit("09:00")) | (1 << time_to_unit("10:00"))
+
+    df = pd.DataFrame([
+        {"doctor_name": "Dr. Smith", "location": "Main Clinic", "date": "2025-01-06",
+         "start_time": "09:10", "end_time": "09:40", "available": True},
+    ])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store(tmp, df)
+        slots = get_available_slots(store.db_path, 30, "Dr. Smith", "Main Clinic")
+        assert [(s["start_time"], s["end_time"]) for s in slots] == [("09:10", "09:40")]
+
+
+if __name__ == "__main__":
+    test_bitmap_slots_match_row_engine()
+    test_updates_flip_bits_in_place()
+    test_partial_row_update_flips_only_updated_rows()
+    test_other_writers_invalidate_cache()
+    test_any_duration_and_buffers()
+    test_partial_row_booking_splits_row()
+    test_gaps_and_off_grid_times()
+    print(" All availability bitmap tests passed!")
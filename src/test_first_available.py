@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-doctor "first available" search: the heap merge
+returns the same k earliest slots as sorting every slot, and stops early
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.availability import DayBitmap
+from src.helpers import get_available_slots, get_first_available_slots
+from src.schedule_store import get_schedule_store
+from src.test_slot_engine import build_schedule, seed_schedule
+
+DOCTORS = ["Dr. Smith", "Dr. Johnson", "Dr. Williams"]
+LOCATIONS = ["Main Clinic", "Railway Clinic"]
+
+
+def _key(slot):
+    return str(slot["date"]), slot["start_time"], slot["doctor_name"], slot["location"]
+
+
+def _brute_force(db_path, duration, doctors, locations, k):
+    slots = []
+    for doctor in doctors:
+        for location in locations:
+            for slot in get_available_slots(db_path, duration, doctor, location):
+                slots.append({**slot, "doctor_name": doctor})
+    return sorted(slots, key=_key)[:k]
+
+
+def test_merge_matches_full_sort():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, build_schedule(DOCTORS, LOCATIONS, days=4, seed=9, availability=0.3))
+        for duration in (30, 60):
+            for k in (1, 5, 40):
+                assert get_first_available_slots(db_path, duration, location="Main Clinic", k=k) == \
+                    _brute_force(db_path, duration, DOCTORS, ["Main Clinic"], k)
+                assert get_first_available_slots(db_path, duration, doctor_name="Dr. Smith", k=k) == \
+                    _brute_force(db_path, duration, ["Dr. Smith"], LOCATIONS, k)
+                assert get_first_available_slots(db_path, duration, k=k) == \
+                    _brute_force(db_path, duration, DOCTORS, LOCATIONS, k)
+
+        assert get_first_available_slots(db_path, 30, doctor_name="Dr. Nobody") == []
+
+
+def test_holds_and_laziness():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, build_schedule(DOCTORS, LOCATIONS, days=30, seed=9, availability=0.3))
+        first = get_first_available_slots(db_path, 30, location="Main Clinic", k=1)[0]
+        get_schedule_store(db_path).place_hold(
+            first["doctor_name"], "Main Clinic", first["date"], first["start_time"], first["end_time"], "alice"
+        )
+        assert get_first_available_slots(db_path, 30, location="Main Clinic", k=1, holder="alice") == [first]
+        assert get_first_available_slots(db_path, 30, location="Main Clinic", k=1, holder="bob") != [first]
+
+        # Only the first days of each stream get searched, not all 30 days of every doctor
+        calls = []
+        original = DayBitmap.slot_starts
+        DayBitmap.slot_starts = lambda self, *args: calls.append(1) or original(self, *args)
+        try:
+            get_first_available_slots(db_path, 30, k=3)
+        finally:
+            DayBitmap.slot_starts = original
+        assert len(calls) < len(DOCTORS) * len(LOCATIONS) * 3
+
+
+def test_off_grid_doctor_does_not_hide_others():
+    schedule = build_schedule(DOCTORS, ["Main Clinic"], days=2, seed=9, availability=0.3)
+    # One doctor's rows start at :10, off the bitmaps' 15-minute grid
+    off_grid = pd.DataFrame([
+        {"doctor_name": "Dr. Brown", "location": "Main Clinic", "date": "2025-01-06",
+         "start_time": f"{hour:02d}:10", "end_time": f"{hour:02d}:40", "available": True}
+        for hour in (9, 10, 11)
+    ])
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, pd.concat([schedule, off_grid], ignore_index=True))
+        doctors = DOCTORS + ["Dr. Brown"]
+        assert get_first_available_slots(db_path, 30, k=40) == _brute_force(db_path, 30, doctors, ["Main Clinic"], 40)
+        assert {slot["doctor_name"] for slot in get_first_available_slots(db_path, 30, k=40)} >= {"Dr. Brown", "Dr. Smith"}
+
+
+if __name__ == "__main__":
+    test_merge_matches_full_sort()
+    test_holds_and_laziness()
+    test_off_grid_doctor_does_not_hide_others()
+    print(" All first available search tests passed!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the rule-based greeting/insurance parser that runs before
+the LLM: the form's key/value messages parse without it, anything else
+falls through
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.input_parser import extract_greeting, extract_greeting_fields, extract_insurance, match_known, parse_date
+
+DOCTORS = ["Dr. Smith", "Dr. Johnson", "Dr. Williams"]
+LOCATIONS = ["Main Clinic", "Railway Clinic"]
+
+
+def test_form_messages_parse_without_llm():
+    message = "Name: Willie Mays, DOB: 2003-11-11, Doctor: Dr. Smith, Location: Main Clinic"
+    assert extract_greeting(message, DOCTORS, LOCATIONS) == {
+        "Full Name": "Willie Mays", "Date of Birth": "2003-11-11",
+        "Preferred Doctor": "Dr. Smith", "Location": "Main Clinic",
+    }
+    # Other spellings, order, separators and date formats
+    assert extract_greeting(
+        "location = railway  clinic; date of birth: 11/02/1990\nFull Name: Connie O'Donnell; doctor: dr johnson",
+        DOCTORS, LOCATIONS,
+    ) == {
+        "Full Name": "Connie O'Donnell", "Date of Birth": "1990-11-02",
+        "Preferred Doctor": "Dr. Johnson", "Location": "Railway Clinic",
+    }
+    assert extract_insurance("Carrier: Blue Cross, Member ID: AB123456, Group: GRP001") == {
+        "Insurance Carrier": "Blue Cross", "Member ID": "AB123456", "Group": "GRP001",
+    }
+
+
+def test_anything_else_falls_back_to_llm():
+    assert extract_greeting("Hi, I'm Willie Mays, born Nov 11 2003, I'd like Dr. Smith at Main Clinic") is None
+    # Missing, empty or unrecognized fields
+    assert extract_greeting("Name: Willie Mays, DOB: 2003-11-11, Doctor: Dr. Smith", DOCTORS, LOCATIONS) is None
+    assert extract_greeting("Name: , DOB: 2003-11-11, Doctor: Dr. Smith, Location: Main Clinic") is None
+    assert extract_greeting("Name: W M, DOB: yesterday, Doctor: Dr. Smith, Location: Main Clinic") is None
+    assert extract_greeting("Name: W M, DOB: 2003-11-11, Doctor: Dr. Who, Location: Main Clinic", DOCTORS) is None
+    assert extract_insurance("Blue Cross AB123456 GRP001") is None
+    assert extract_insurance("Carrier: Blue Cross, Member ID: AB123456") is None
+
+
+def test_dates_and_names():
+    for value in ("2003-11-11", "2003/11/11", "11/11/2003", "November 11, 2003", "11 Nov 2003", " Nov 11 2003 "):
+        assert parse_date(value) == "2003-11-11", value
+    assert parse_date("2999-01-01") is None
+    assert parse_date("1850-01-01") is None
+    assert parse_date("2003-13-40") is None
+
+    assert match_known("smith", DOCTORS, prefix="Dr.") == "Dr. Smith"
+    assert match_known("DR.SMITH", DOCTORS, prefix="Dr.") == "Dr. Smith"
+    assert match_known("Dr.  Smith", DOCTORS, prefix="Dr.") == "Dr. Smith"
+    assert match_known("railway clinic", LOCATIONS) == "Railway Clinic"
+    assert match_known("Railway", LOCATIONS) is None
+
+
+def test_follow_up_replies_for_missing_fields():
+    # Bare values: unmistakable ones for any missing field, anything valid for the only one missing
+    assert extract_greeting_fields("main clinic", ["Location"], DOCTORS, LOCATIONS) == {"Location": "Main Clinic"}
+    assert extract_greeting_fields("Nov 11 2003", ["Date of Birth"]) == {"Date of Birth": "2003-11-11"}
+    assert extract_greeting_fields("Willie Mays", ["Full Name"]) == {"Full Name": "Willie Mays"}
+    assert extract_greeting_fields("dr johnson", ["Preferred Doctor", "Location"], DOCTORS, LOCATIONS) is None
+    assert extract_greeting_fields("Willie Mays", ["Full Name", "Location"], DOCTORS, LOCATIONS) is None
+
+    # Labelled answers, only the fields asked for
+    assert extract_greeting_fields(
+        "Doctor: williams; Location: Railway Clinic, Name: Someone Else",
+        ["Preferred Doctor", "Location"], DOCTORS, LOCATIONS,
+    ) == {"Preferred Doctor": "Dr. Williams", "Location": "Railway Clinic"}
+
+    # Anything not recognized goes to the follow-up prompt
+    assert extract_greeting_fields("the one by the station", ["Location"], DOCTORS, LOCATIONS) is None
+    assert extract_greeting_fields("Location: Nowhere", ["Location"], DOCTORS, LOCATIONS) is None
+    assert extract_greeting_fields("", ["Full Name"]) is None
+
+
+if __name__ == "__main__":
+    test_form_messages_parse_without_llm()
+    test_anything_else_falls_back_to_llm()
+    test_dates_and_names()
+    test_follow_up_replies_for_missing_fields()
+    print(" All input parser tests passed!")
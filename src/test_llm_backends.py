@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline LLM stand-in: it answers the extraction chains
+(tool calls and JSON text) from structured and free-form messages, honours
+latency and per-call deadlines, and injects the same failures for the same seed
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_backends import DeterministicFakeLLM, InjectedLLMError, create_llm
+from src.llm_chains import ChainRegistry
+
+
+class TextOnlyFake(DeterministicFakeLLM):
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        raise NotImplementedError
+
+
+def test_answers_extraction_chains():
+    for llm in (DeterministicFakeLLM(), TextOnlyFake()):
+        registry = ChainRegistry(llm)
+        assert registry.structured == (type(llm) is DeterministicFakeLLM)
+        assert registry.extract("greeting", {
+            "message": "Name: Rahul Verma, DOB: 06/15/1985, Doctor: Johnson, Location: Main Clinic"
+        }) == {"Full Name": "Rahul Verma", "Date of Birth": "1985-06-15",
+               "Preferred Doctor": "Dr. Johnson", "Location": "Main Clinic"}
+        assert registry.extract("greeting", {
+            "message": "Hi, my name is Willie Mays, born March 5, 1990. I'd like to see Dr. Smith at Main Clinic"
+        }) == {"Full Name": "Willie Mays", "Date of Birth": "1990-03-05",
+               "Preferred Doctor": "Dr. Smith", "Location": "Main Clinic"}
+        assert registry.extract("insurance", {
+            "message": "I'm covered by Blue Cross, member id BC123456, group GRP001"
+        }) == {"Insurance Carrier": "Blue Cross", "Member ID": "BC123456", "Group": "GRP001"}
+        follow_up = registry.extract("greeting_follow_up", {"message": "It's 1990-04-18", "fields": "Date of Birth"})
+        assert follow_up["Date of Birth"] == "1990-04-18"
+        assert registry.extract("greeting", {"message": "hello"})["Full Name"] == "Not Provided"
+        assert registry.warm_up()
+
+
+def test_latency_and_deadlines():
+    registry = ChainRegistry(DeterministicFakeLLM(latency_ms=50))
+    started = time.perf_counter()
+    registry.extract("insurance", {"message": "Carrier: Aetna, Member ID: A1234, Group: G1"})
+    assert 0.05 <= time.perf_counter() - started < 0.5
+
+    # Slower than the request deadline: it times out at the deadline
+    started = time.perf_counter()
+    try:
+        registry.extract("insurance", {"message": "Carrier: Aetna"}, timeout=0.01)
+        assert False, "expected TimeoutError"
+    except TimeoutError:
+        pass
+    assert time.perf_counter() - started < 0.05
+
+    # Async calls overlap
+    async def many():
+        return await asyncio.gather(*[registry.aextract("insurance", {"message": f"Member ID: A{i:04d}"})
+                                      for i in range(10)])
+
+    started = time.perf_counter()
+    assert len(asyncio.run(many())) == 10
+    assert time.perf_counter() - started < 0.25
+
+
+def test_error_injection_is_reproducible():
+    def outcomes(llm):
+        result = []
+        for _ in range(50):
+            try:
+                llm.invoke("User Message: Carrier: Aetna\n\n")
+                result.append(True)
+            except InjectedLLMError:
+                result.append(False)
+        return result
+
+    first = outcomes(DeterministicFakeLLM(error_rate=0.3, seed=7))
+    assert first == outcomes(DeterministicFakeLLM(error_rate=0.3, seed=7))
+    assert first != outcomes(DeterministicFakeLLM(error_rate=0.3, seed=8))
+    assert 5 <= first.count(False) <= 25
+    assert all(outcomes(DeterministicFakeLLM(error_rate=0)))
+
+    assert isinstance(create_llm("fake"), DeterministicFakeLLM)
+    try:
+        create_llm("nonsense")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_answers_extraction_chains()
+    test_latency_and_deadlines()
+    test_error_injection_is_reproducible()
+    print(" All LLM backend tests passed!")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test script for batched extraction: results stream as items finish, a failing
+item doesn't stop the batch, exactly `concurrency` calls run at once, and
+parsable or cached messages never reach the LLM
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.llm_batch import default_parser, extract_batch, extract_stream
+from src.llm_cache import LLMCache
+from src.llm_chains import ChainRegistry
+from src.llm_gateway import TokenBucket
+from src.llm_guard import HALF_OPEN, CircuitBreaker
+
+CONCURRENT = {"now": 0, "peak": 0, "calls": 0}
+# Events the test sets to let held calls finish: "slow" messages wait on "slow", the rest on "all" if set
+GATES = {"slow": None, "all": None}
+
+
+class SlowFake(FakeListChatModel):
+    """Answers each message with its own name; "slow" ones wait for their gate, "garbled" ones get no JSON"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError("async only")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        CONCURRENT["calls"] += 1
+        CONCURRENT["now"] += 1
+        CONCURRENT["peak"] = max(CONCURRENT["peak"], CONCURRENT["now"])
+        prompt = messages[-1].content
+        gate = GATES["slow"] if "slow" in prompt else GATES["all"]
+        try:
+            if gate is not None:
+                await gate.wait()
+            await asyncio.sleep(self.sleep)
+        finally:
+            CONCURRENT["now"] -= 1
+        name = prompt.split("User Message:")[1].split("\n")[0].strip()
+        content = "no idea" if "garbled" in name else \
+            f'{{"Full Name": "{name}", "Date of Birth": "2003-11-11", "Preferred Doctor": "Dr. Smith", "Location": "Main Clinic"}}'
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+async def _collect(registry, messages, concurrency, **kwargs):
+    return [result async for result in extract_stream(registry, "greeting", messages, concurrency, **kwargs)]
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+def _reset():
+    CONCURRENT.update(now=0, peak=0, calls=0)
+    GATES.update(slow=None, all=None)
+
+
+def test_streams_in_completion_order_and_isolates_failures():
+    _reset()
+    registry = ChainRegistry(SlowFake(responses=[""], sleep=0.02))
+    messages = ["slow Willie Mays", "Hank Aaron", "garbled", "Babe Ruth"]
+
+    async def collect():
+        GATES["slow"] = asyncio.Event()
+        results = []
+        async for result in extract_stream(registry, "greeting", messages, concurrency=4, attempts=2):
+            results.append(result)
+            if len(results) == 3:
+                GATES["slow"].set()
+        return results
+
+    results = asyncio.run(collect())
+    assert len(results) == 4
+    # The slow first item is held until the other three have streamed out
+    assert results[-1]["index"] == 0 and results[-1]["fields"]["Full Name"] == "slow Willie Mays"
+    failed = [r for r in results if r["error"]]
+    assert [r["index"] for r in failed] == [2] and failed[0]["fields"] is None
+    assert all(r["source"] == "llm" for r in results if not r["error"])
+    # The garbled item was retried, the others called once
+    assert CONCURRENT["calls"] == 5
+
+
+def test_concurrency_limit_bounds_and_scales():
+    messages = [f"Patient {i}" for i in range(12)]
+    for concurrency in (2, 6):
+        _reset()
+        registry = ChainRegistry(SlowFake(responses=[""], sleep=0))
+
+        async def run():
+            GATES["all"] = asyncio.Event()
+            task = asyncio.ensure_future(_collect(registry, messages, concurrency))
+            # With every call held, exactly `concurrency` of them go out and no more
+            await asyncio.wait_for(_until(lambda: CONCURRENT["now"] == concurrency), 5)
+            assert CONCURRENT["calls"] == concurrency
+            GATES["all"].set()
+            return await task
+
+        results = sorted(asyncio.run(run()), key=lambda result: result["index"])
+        assert CONCURRENT["peak"] == concurrency and CONCURRENT["calls"] == 12
+        assert [r["index"] for r in results] == list(range(12))
+        assert all(r["fields"]["Full Name"] == f"Patient {r['index']}" for r in results)
+
+
+def test_parser_and_cache_skip_the_llm():
+    _reset()
+    registry = ChainRegistry(SlowFake(responses=[""], sleep=0.01))
+    cache = LLMCache()
+    messages = [
+        "Name: Willie Mays, DOB: 11/11/2003, Doctor: dr smith, Location: main clinic",
+        "I'm Hank Aaron",
+    ]
+    parser = default_parser("greeting", ["Dr. Smith"], ["Main Clinic"])
+    first = extract_batch(registry, "greeting", messages, parser=parser, cache=cache, model="test")
+    assert [r["source"] for r in first] == ["parser", "llm"]
+    assert first[0]["fields"]["Preferred Doctor"] == "Dr. Smith"
+    second = extract_batch(registry, "greeting", messages, parser=parser, cache=cache, model="test")
+    assert [r["source"] for r in second] == ["parser", "cache"]
+    assert second[1]["fields"] == first[1]["fields"]
+    assert CONCURRENT["calls"] == 1
+
+
+def test_rate_limit_wait_is_bounded():
+    _reset()
+    registry = ChainRegistry(SlowFake(responses=[""], sleep=0.01))
+    # One token and (practically) no refill: only one item gets to call
+    bucket = TokenBucket(rate_per_second=0.001, capacity=1)
+    breaker = CircuitBreaker()
+    results = extract_batch(registry, "greeting", ["Willie Mays", "Hank Aaron"], breaker=breaker,
+                            bucket=bucket, attempts=2, acquire_timeout=0.05)
+    assert sorted(r["error"] is None for r in results) == [False, True]
+    assert "rate limit" in next(r["error"] for r in results if r["error"])
+    assert CONCURRENT["calls"] == 1
+    # Only the call that went out was recorded
+    assert breaker.snapshot()["recent_calls"] == 1
+
+    # A rejected half-open trial is given back: the retry gets it again, and so does the next caller
+    breaker = CircuitBreaker(min_calls=1, cooldown_seconds=0)
+    breaker.record(False)
+    assert breaker.state == HALF_OPEN
+    results = extract_batch(registry, "greeting", ["Babe Ruth"], breaker=breaker, bucket=bucket,
+                            attempts=2, acquire_timeout=0.05)
+    assert "rate limit" in results[0]["error"]
+    assert breaker.state == HALF_OPEN and breaker.allow()
+    assert CONCURRENT["calls"] == 1
+
+def test_tokens_taken_only_by_items_about_to_call():
+    _reset()
+    registry = ChainRegistry(SlowFake(responses=[""], sleep=0))
+
+    class CountingBucket(TokenBucket):
+        taken = 0
+
+        def acquire(self, timeout=None):
+            CountingBucket.taken += 1
+            return super().acquire(timeout)
+
+    async def run():
+        GATES["all"] = asyncio.Event()
+        task = asyncio.ensure_future(_collect(registry, [f"Patient {i}" for i in range(6)], 2,
+                                              bucket=CountingBucket(rate_per_second=1000, capacity=100)))
+        await asyncio.wait_for(_until(lambda: CONCURRENT["now"] == 2), 5)
+        # Four items wait for a slot without holding tokens
+        for _ in range(20):
+            await asyncio.sleep(0.001)
+        assert CountingBucket.taken == 2
+        GATES["all"].set()
+        return await task
+
+    assert all(r["error"] is None for r in asyncio.run(run()))
+    assert CountingBucket.taken == 6
+
+
+if __name__ == "__main__":
+    test_streams_in_completion_order_and_isolates_failures()
+    test_concurrency_limit_bounds_and_scales()
+    test_parser_and_cache_skip_the_llm()
+    test_rate_limit_wait_is_bounded()
+    test_tokens_taken_only_by_items_about_to_call()
+    print(" All LLM batch tests passed!")
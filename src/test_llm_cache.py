@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM extraction cache: content-addressed keys, LRU and
+TTL eviction, hit/miss counters and the shared on-disk tier
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_cache import LLMCache, cache_key
+
+TEMPLATE = "Extract the name from: {message}"
+RESULT = {"Full Name": "Willie Mays"}
+
+
+def test_key_depends_on_template_model_and_normalized_input():
+    key = cache_key(TEMPLATE, "gemma2-9b-it", {"message": "Name: Willie Mays,  DOB: 2003-11-11"})
+    assert key == cache_key(TEMPLATE, "gemma2-9b-it", {"message": "  Name: Willie Mays, DOB:\n2003-11-11 "})
+    assert key != cache_key(TEMPLATE + " ", "gemma2-9b-it", {"message": "Name: Willie Mays, DOB: 2003-11-11"})
+    assert key != cache_key(TEMPLATE, "llama3-8b", {"message": "Name: Willie Mays, DOB: 2003-11-11"})
+    assert key != cache_key(TEMPLATE, "gemma2-9b-it", {"message": "Name: Willie Mays, DOB: 2003-11-12"})
+
+
+def test_lru_and_ttl_eviction():
+    cache = LLMCache(max_entries=2, ttl_seconds=60, db_path="")
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    assert cache.get("a") == RESULT
+    cache.put("c", RESULT)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT and cache.get("c") == RESULT
+
+    # Callers get copies, so they can't corrupt the cached entry
+    cache.get("a")["Full Name"] = "Someone Else"
+    assert cache.get("a") == RESULT
+    assert cache.stats()["hits"] == 5 and cache.stats()["misses"] == 1
+
+    short = LLMCache(ttl_seconds=0.05, db_path="")
+    short.put("a", RESULT)
+    time.sleep(0.1)
+    assert short.get("a") is None
+    assert short.stats()["entries"] == 0
+
+
+def test_disk_tier_shared_between_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "llm_cache.db")
+        LLMCache(db_path=db_path).put("a", RESULT)
+        # A fresh cache on the same file, as another worker process would have
+        other = LLMCache(db_path=db_path)
+        assert other.get("a") == RESULT
+        assert other.get("a") == RESULT
+        assert other.stats() == {"hits": 2, "disk_hits": 1, "misses": 0, "hit_rate": 1.0, "entries": 1}
+
+        expired = LLMCache(ttl_seconds=0, db_path=db_path)
+        expired.put("b", RESULT)
+        assert other.get("b") is None
+        assert expired.purge_expired() == 1
+
+
+if __name__ == "__main__":
+    test_key_depends_on_template_model_and_normalized_input()
+    test_lru_and_ttl_eviction()
+    test_disk_tier_shared_between_processes()
+    print(" All LLM cache tests passed!")
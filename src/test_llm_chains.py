@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the extraction chain registry: chains are composed once,
+calls are timed per chain, warm-up goes through the same client, and
+extraction reads schema-validated tool calls or scans text JSON in one pass
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.helpers import clean_llm_response
+from src.llm_chains import PROMPTS, ChainRegistry, LatencyStats
+
+
+BOUND_TOOLS = []
+
+
+class ToolCallingFake(GenericFakeChatModel):
+    """Replays canned messages and accepts bound tools, like a tool-calling chat model"""
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        BOUND_TOOLS.append(tool_choice)
+        return self.bind(**kwargs)
+
+GREETING_JSON = (
+    '{"Full Name": "Willie Mays", "Date of Birth": "2003-11-11", '
+    '"Preferred Doctor": "Dr. Smith", "Location": "Main Clinic"}'
+)
+
+
+def test_chains_built_once_and_timed():
+    registry = ChainRegistry(FakeListChatModel(responses=[GREETING_JSON]))
+    assert set(registry.chains) == set(PROMPTS)
+    chain = registry.chains["greeting"]
+
+    for _ in range(3):
+        response = registry.invoke("greeting", {"message": "I'm Willie Mays"})
+        assert clean_llm_response(response.content)["Full Name"] == "Willie Mays"
+    assert registry.chains["greeting"] is chain
+
+    stats = registry.latency.summary()
+    assert stats["greeting"]["calls"] == 3
+    assert stats["greeting"]["p50_ms"] <= stats["greeting"]["max_ms"]
+    assert "insurance" not in stats
+
+    assert registry.warm_up()
+    assert registry.latency.summary()["warm_up"]["calls"] == 1
+
+    # No client: nothing to compose or warm up
+    assert ChainRegistry(None).chains == {}
+    assert not ChainRegistry(None).warm_up()
+
+
+def test_latency_window():
+    stats = LatencyStats(window=3)
+    for seconds in (0.5, 0.001, 0.002, 0.003):
+        stats.record("greeting", seconds)
+    # Calls keep counting; percentiles cover only the recent window
+    assert stats.summary()["greeting"] == {"calls": 4, "mean_ms": 2.0, "p50_ms": 2.0, "p95_ms": 3.0, "max_ms": 3.0}
+
+
+def test_structured_output_validates_against_schema():
+    args = {"full_name": "Conan O'Brien", "date_of_birth": "1963-04-18",
+            "preferred_doctor": "Dr. Smith", "location": "Main Clinic"}
+    model = ToolCallingFake(messages=iter([
+        AIMessage(content="", tool_calls=[{"name": "GreetingExtraction", "args": args, "id": "1"}]),
+        AIMessage(content="", tool_calls=[{"name": "InsuranceExtraction", "args": {"member_id": 42}, "id": "2"}]),
+    ]))
+    registry = ChainRegistry(model)
+    assert registry.structured
+    assert {"GreetingExtraction", "InsuranceExtraction"} <= set(BOUND_TOOLS)
+
+    assert registry.extract("greeting", {"message": "..."}, timeout=2) == {
+        "Full Name": "Conan O'Brien", "Date of Birth": "1963-04-18",
+        "Preferred Doctor": "Dr. Smith", "Location": "Main Clinic",
+    }
+    try:
+        registry.extract("insurance", {"message": "..."})
+        assert False, "member_id must be a string"
+    except ValueError:
+        pass
+
+
+def test_text_answers_scanned_in_one_pass():
+    registry = ChainRegistry(FakeListChatModel(responses=[
+        'Sure!\n```json\n{"Full Name": "Conan O\'Brien", "Location": "Main Clinic",}\n```',
+        "no JSON here",
+    ]))
+    assert not registry.structured
+    assert registry.extract("greeting", {"message": "..."}) == {"Full Name": "Conan O'Brien", "Location": "Main Clinic"}
+    try:
+        registry.extract("greeting", {"message": "..."})
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    assert clean_llm_response("{'Group': 'GRP 1', Member_ID: \"A'1\", n: null}") == \
+        {"Group": "GRP 1", "Member_ID": "A'1", "n": ""}
+    assert clean_llm_response("prose {not json} then {\"a\": 1}") == {"a": "1"}
+    assert clean_llm_response('{"a": "unterminated') is None
+
+
+if __name__ == "__main__":
+    test_chains_built_once_and_timed()
+    test_latency_window()
+    test_structured_output_validates_against_schema()
+    test_text_answers_scanned_in_one_pass()
+    print(" All LLM chain registry tests passed!")
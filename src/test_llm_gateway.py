@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM gateway: the token bucket holds the request rate,
+in-flight requests stay under the concurrency limit, identical requests are
+coalesced, and the SQLite bucket is shared between processes
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_gateway import GatewayBusyError, LLMGateway, SQLiteTokenBucket, TokenBucket
+
+
+class FakeClock:
+    """Time that only moves when the code under test sleeps or the test advances it"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _wait_until(condition, timeout=5):
+    """Poll until the worker threads reach the state the test needs"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the workers"
+        time.sleep(0.001)
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=16, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(7):
+        assert bucket.acquire()
+    # 3 from the burst, then 4 more at 16/s
+    assert clock.now == 0.25
+    # Half a token's wait isn't enough; it gives up at the deadline
+    assert not bucket.acquire(timeout=1 / 32)
+    assert clock.now == 0.25 + 1 / 32
+
+
+def test_concurrency_bounded_and_waits_reported():
+    clock = FakeClock()
+    gateway = LLMGateway(TokenBucket(rate_per_second=1000, capacity=100), max_concurrency=2, clock=clock)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def slow(timeout):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+        return timeout
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(gateway.run, slow, 5) for _ in range(6)]
+        _wait_until(lambda: running[0] == 2 and gateway.metrics()["queue_depth"] == 4)
+        assert gateway.metrics()["in_flight"] == 2
+        # The other four queue for 100ms before the first two finish
+        clock.now += 0.1
+        release.set()
+        results = [f.result() for f in futures]
+    assert peak[0] == 2
+    # Time spent queued comes off the caller's deadline
+    assert sorted(round(remaining, 6) for remaining in results) == [4.9] * 4 + [5.0] * 2
+
+    metrics = gateway.metrics()
+    assert metrics["requests"] == 6 and metrics["queue_depth"] == 0 and metrics["in_flight"] == 0
+    assert metrics["wait_max_ms"] == 100.0 and metrics["wait_mean_ms"] == 66.7
+
+    # No slot within the deadline
+    busy = LLMGateway(TokenBucket(rate_per_second=1000, capacity=100), max_concurrency=1)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold(timeout):
+        entered.set()
+        release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(busy.run, hold)
+        assert entered.wait(5)
+        try:
+            busy.run(lambda t: None, timeout=0.05)
+            assert False, "expected GatewayBusyError"
+        except GatewayBusyError:
+            pass
+        release.set()
+        first.result()
+    assert busy.metrics()["rejected"] == 1
+
+
+def test_identical_requests_coalesced():
+    gateway = LLMGateway(TokenBucket(rate_per_second=1000, capacity=100), max_concurrency=4)
+    calls = []
+    release = threading.Event()
+
+    def extract():
+        calls.append(1)
+        release.wait(5)
+        return {"Full Name": "Willie Mays"}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(gateway.coalesce, "same", extract) for _ in range(5)]
+        _wait_until(lambda: gateway.metrics()["coalesced"] == 4)
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert results == [{"Full Name": "Willie Mays"}] * 5
+
+    # Errors reach every waiter, and the next call starts fresh
+    failing = threading.Event()
+
+    def fail():
+        failing.wait(5)
+        raise TimeoutError("slow endpoint")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(gateway.coalesce, "bad", fail) for _ in range(3)]
+        _wait_until(lambda: gateway.metrics()["coalesced"] == 6)
+        failing.set()
+        assert all(isinstance(f.exception(), TimeoutError) for f in futures)
+    assert gateway.coalesce("bad", lambda: "ok") == "ok"
+
+
+def test_sqlite_bucket_shared():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "rate.db")
+        first = SQLiteTokenBucket(db_path, rate_per_second=0.01, capacity=3)
+        # Another worker process's bucket draws from the same tokens
+        second = SQLiteTokenBucket(db_path, rate_per_second=0.01, capacity=3)
+        assert first.acquire(0) and second.acquire(0) and first.acquire(0)
+        assert not second.acquire(0)
+        assert not first.acquire(0.05)
+
+
+if __name__ == "__main__":
+    test_token_bucket_limits_rate()
+    test_concurrency_bounded_and_waits_reported()
+    test_identical_requests_coalesced()
+    test_sqlite_bucket_shared()
+    print(" All LLM gateway tests passed!")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for latency-bounded LLM calls: backoff stays within its caps,
+retries stop at the step budget, and the circuit breaker fails fast once the
+endpoint is erroring, then recovers after a trial call
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_gateway import GatewayBusyError
+from src.llm_guard import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, backoff_delays, guarded_call
+
+
+class Flaky:
+    """Fails the first `failures` calls with error, then returns "ok"; remembers each timeout"""
+
+    def __init__(self, failures, error=TimeoutError):
+        self.failures = failures
+        self.error = error
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.failures:
+            raise self.error("endpoint unavailable")
+        return "ok"
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = backoff_delays(8, base=0.25, cap=2.0, rng=random.Random(1))
+    assert len(delays) == 7
+    assert all(0 <= d <= min(2.0, 0.25 * 2 ** n) for n, d in enumerate(delays))
+    assert len(set(delays)) == len(delays)
+    assert backoff_delays(1) == []
+
+
+def test_retries_stay_within_budget():
+    sleeps = []
+    call = Flaky(failures=2)
+    assert guarded_call(call, CircuitBreaker(), attempts=3, call_timeout=5, budget_seconds=60,
+                        sleep=sleeps.append) == "ok"
+    assert len(call.timeouts) == 3 and len(sleeps) == 2
+    assert call.timeouts[0] == 5
+
+    # A budget shorter than the per-call deadline shortens the deadline, and no retry starts once it is spent
+    call = Flaky(failures=5)
+    started = time.monotonic()
+    try:
+        guarded_call(call, CircuitBreaker(), attempts=5, call_timeout=5, budget_seconds=0.3, sleep=time.sleep)
+        assert False, "expected the last error"
+    except TimeoutError:
+        pass
+    assert time.monotonic() - started < 0.3
+    assert len(call.timeouts) == 1 and call.timeouts[0] <= 0.3
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=4, cooldown_seconds=0.1)
+    for _ in range(2):
+        try:
+            guarded_call(Flaky(failures=2), breaker, attempts=2, sleep=lambda s: None)
+        except TimeoutError:
+            pass
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["error_rate"] == 1.0
+
+    # Open: nothing reaches the endpoint
+    call = Flaky(failures=0)
+    try:
+        guarded_call(call, breaker, sleep=lambda s: None)
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert call.timeouts == []
+    assert breaker.snapshot()["rejected"] == 1
+
+    # After the cool-down a single trial goes out; its success closes the breaker
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert guarded_call(Flaky(failures=0), breaker) == "ok"
+
+
+def test_unparseable_answers_do_not_trip_breaker():
+    breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=2)
+    for _ in range(3):
+        try:
+            guarded_call(Flaky(failures=3, error=ValueError), breaker, attempts=3, sleep=lambda s: None)
+        except ValueError:
+            pass
+    assert breaker.state == CLOSED
+    assert breaker.snapshot() == {"state": CLOSED, "recent_calls": 9, "error_rate": 0.0,
+                                  "times_opened": 0, "rejected": 0}
+
+
+def test_gateway_rejection_gives_back_half_open_trial():
+    breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=2, cooldown_seconds=0)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == HALF_OPEN
+
+    # Rejected by our own gateway: the endpoint was never called, so the breaker stays half-open
+    try:
+        guarded_call(Flaky(failures=1, error=GatewayBusyError), breaker, attempts=1, budget_seconds=0.1,
+                     local_errors=(GatewayBusyError,))
+        assert False, "expected GatewayBusyError"
+    except GatewayBusyError:
+        pass
+    assert breaker.state == HALF_OPEN
+    assert breaker.snapshot()["times_opened"] == 1
+
+    # ... and its trial is still available. A rejection doesn't use up the only attempt either
+    call = Flaky(failures=1, error=GatewayBusyError)
+    assert guarded_call(call, breaker, attempts=1, budget_seconds=60, local_errors=(GatewayBusyError,),
+                        sleep=lambda s: None) == "ok"
+    assert len(call.timeouts) == 2
+    assert breaker.state == CLOSED
+
+
+if __name__ == "__main__":
+    test_backoff_is_jittered_and_capped()
+    test_retries_stay_within_budget()
+    test_breaker_opens_fails_fast_and_recovers()
+    test_unparseable_answers_do_not_trip_breaker()
+    test_gateway_rejection_gives_back_half_open_trial()
+    print(" All LLM guard tests passed!")
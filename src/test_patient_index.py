@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent patient lookup index
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.patient_index import PATIENT_COLUMNS, PatientIndex
+
+
+def _write_patients(path, rows):
+    pd.DataFrame(rows, columns=PATIENT_COLUMNS).to_csv(path, index=False)
+
+
+def _patient(i, name, dob, **extra):
+    row = {
+        "id": i, "full_name": name, "date_of_birth": dob,
+        "email": f"p{i}@example.com", "phone": "555-000-0000",
+        "insurance_carrier": "Aetna", "insurance_member_id": f"AB{i:06d}",
+        "insurance_group": "GRP001", "created_date": "2025-09-06T11:22:48",
+    }
+    row.update(extra)
+    return row
+
+
+def test_lookup_matches_normalized_key():
+    """Lookups ignore case and extra whitespace and return the full record"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        _write_patients(csv_path, [
+            _patient(1, "Willie Mays", "2003-11-11"),
+            _patient(2, "Connie O'Donnell", "2001-01-02", phone="(555) 123-4567, ext 9"),
+            _patient(3, "Willie Mays", "2003-11-11", email="duplicate@example.com"),
+        ])
+        index = PatientIndex(csv_path, os.path.join(tmp, "index.db"))
+
+        record = index.lookup("  willie   MAYS ", "2003-11-11")
+        assert record["id"] == "1"
+        assert record["email"] == "p1@example.com"
+
+        record = index.lookup("Connie O'Donnell", "2001-01-02")
+        assert record["phone"] == "(555) 123-4567, ext 9"
+
+        assert index.lookup("Willie Mays", "1999-01-01") is None
+        assert index.lookup("Nobody", "2003-11-11") is None
+
+
+def test_index_rebuilds_when_csv_changes_outside_app():
+    """Edits made to the CSV by other tools are picked up on the next lookup"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        _write_patients(csv_path, [_patient(1, "Robert Phillips", "1954-09-17")])
+        index = PatientIndex(csv_path, os.path.join(tmp, "index.db"))
+        assert index.lookup("Robert Phillips", "1954-09-17")["id"] == "1"
+        assert index.is_current()
+        version = index.data_version()
+
+        _write_patients(csv_path, [
+            _patient(7, "James Baker", "1941-04-07"),
+            _patient(8, "Robert Phillips", "1954-09-17"),
+        ])
+        assert not index.is_current()
+        assert index.data_version() != version
+        assert index.lookup("Robert Phillips", "1954-09-17")["id"] == "8"
+        assert index.lookup("James Baker", "1941-04-07")["id"] == "7"
+        assert not index.refresh()
+
+
+def test_index_persists_across_instances():
+    """A second process opening the same index does not need to rebuild it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        index_path = os.path.join(tmp, "index.db")
+        _write_patients(csv_path, [_patient(1, "Willie Mays", "2003-11-11")])
+        PatientIndex(csv_path, index_path).rebuild()
+        assert PatientIndex(csv_path, index_path).is_current()
+
+
+def test_missing_csv_is_created_empty():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "data", "patients.csv")
+        index = PatientIndex(csv_path, os.path.join(tmp, "index.db"))
+        assert index.lookup("Willie Mays", "2003-11-11") is None
+        assert list(pd.read_csv(csv_path).columns) == PATIENT_COLUMNS
+
+
+def _new_patient(name):
+    record = _patient(0, name, "1990-01-01")
+    record.pop("id")
+    return record
+
+
+def _save_many(csv_path, index_path, prefix, count):
+    index = PatientIndex(csv_path, index_path)
+    return [index.add_patient(_new_patient(f"{prefix} Patient{i}")) for i in range(count)]
+
+
+def test_add_patient_appends_without_rewriting():
+    """New patients are appended after the existing bytes and found by lookup"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        _write_patients(csv_path, [_patient(1, "Willie Mays", "2003-11-11"), _patient(5, "James Baker", "1941-04-07")])
+        with open(csv_path, "rb") as f:
+            before = f.read()
+
+        index = PatientIndex(csv_path, os.path.join(tmp, "index.db"))
+        version = index.data_version()
+        new_id = index.add_patient(_new_patient("Connie O'Donnell"))
+        assert new_id == 6
+        assert index.data_version() != version
+
+        with open(csv_path, "rb") as f:
+            after = f.read()
+        assert after.startswith(before)
+        assert index.is_current()
+        assert index.lookup("connie o'donnell", "1990-01-01")["id"] == "6"
+        assert list(pd.read_csv(csv_path)["id"]) == [1, 5, 6]
+
+
+def test_ids_are_not_reused_after_rows_are_deleted():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        index_path = os.path.join(tmp, "index.db")
+        _write_patients(csv_path, [_patient(1, "Willie Mays", "2003-11-11")])
+        index = PatientIndex(csv_path, index_path)
+        assert index.add_patient(_new_patient("First New")) == 2
+        assert index.add_patient(_new_patient("Second New")) == 3
+
+        # An admin removes the last two rows by hand
+        _write_patients(csv_path, [_patient(1, "Willie Mays", "2003-11-11")])
+        assert index.add_patient(_new_patient("Third New")) == 4
+        assert index.lookup("Second New", "1990-01-01") is None
+
+
+def test_concurrent_writers_get_unique_ids():
+    """Threads and processes saving at once never share an ID or lose a row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "patients.csv")
+        index_path = os.path.join(tmp, "index.db")
+        _write_patients(csv_path, [_patient(1, "Willie Mays", "2003-11-11")])
+        PatientIndex(csv_path, index_path).rebuild()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            thread_ids = pool.map(lambda t: _save_many(csv_path, index_path, f"Thread{t}", 10), range(8))
+            ids = [i for batch in thread_ids for i in batch]
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(4) as pool:
+            for batch in pool.starmap(_save_many, [(csv_path, index_path, f"Proc{p}", 10) for p in range(4)]):
+                ids.extend(batch)
+
+        assert sorted(ids) == list(range(2, 2 + 120))
+        df = pd.read_csv(csv_path)
+        assert len(df) == 121
+        assert df["id"].is_unique
+        index = PatientIndex(csv_path, index_path)
+        assert index.is_current()
+        assert index.lookup("Proc3 Patient9", "1990-01-01") is not None
+
+
+if __name__ == "__main__":
+    test_lookup_matches_normalized_key()
+    test_index_rebuilds_when_csv_changes_outside_app()
+    test_index_persists_across_instances()
+    test_missing_csv_is_created_empty()
+    test_add_patient_appends_without_rewriting()
+    test_ids_are_not_reused_after_rows_are_deleted()
+    test_concurrent_writers_get_unique_ids()
+    print(" All patient index tests passed!")
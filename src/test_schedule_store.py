@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite schedule store: import, indexed slot queries,
+availability updates, export back to xlsx and the cached catalogue
+"""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.helpers import get_available_slots
+from src.schedule_store import ScheduleStore, get_schedule_store
+from src.test_slot_engine import build_schedule, seed_schedule
+
+DOCTORS = ["Dr. Smith", "Dr. Johnson"]
+LOCATIONS = ["Main Clinic", "Railway Clinic"]
+SCHEDULE = build_schedule(DOCTORS, LOCATIONS, days=3, seed=11)
+
+
+def test_import_and_query_match_workbook():
+    """Slots served from the store match slots computed from the workbook"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _, xlsx_path = seed_schedule(tmp, SCHEDULE, store=False)
+        db_path = os.path.join(tmp, "doctor_schedules.db")
+        store = get_schedule_store(db_path)
+        assert not store.is_empty()
+
+        for doctor in DOCTORS:
+            for location in LOCATIONS:
+                for duration in (30, 60):
+                    assert get_available_slots(db_path, duration, doctor, location) == \
+                        get_available_slots(xlsx_path, duration, doctor, location)
+
+        assert store.doctor_locations() == {d: LOCATIONS for d in DOCTORS}
+        assert store.doctors() == DOCTORS
+        assert store.locations() == LOCATIONS
+
+        plan = store._conn().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM schedules "
+            "WHERE doctor_name = ? AND location = ? AND available = 1",
+            ("Dr. Smith", "Main Clinic"),
+        ).fetchall()
+        assert any("idx_schedules_lookup" in row[-1] for row in plan)
+
+
+def test_set_availability_and_export_round_trip():
+    """Updates land in the store and survive an export/import round trip"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _, xlsx_path = seed_schedule(tmp, SCHEDULE, store=False)
+        store = ScheduleStore(os.path.join(tmp, "store.db"))
+        rows = store.import_excel(xlsx_path)
+        assert rows == len(pd.read_excel(xlsx_path))
+
+        first = store.fetch_slots("Dr. Smith", "Main Clinic").iloc[0]
+        updated = store.set_availability(
+            "Dr. Smith", "Main Clinic", first["date"], first["start_time"], first["end_time"], False
+        )
+        assert updated == 1
+        remaining = store.fetch_slots("Dr. Smith", "Main Clinic")
+        assert not ((remaining["date"] == first["date"]) & (remaining["start_time"] == first["start_time"])).any()
+
+        export_path = os.path.join(tmp, "export.xlsx")
+        assert store.export_excel(export_path) == rows
+        copy = ScheduleStore(os.path.join(tmp, "copy.db"))
+        copy.import_excel(export_path)
+        pd.testing.assert_frame_equal(copy.to_dataframe(), store.to_dataframe())
+
+
+def test_seeding_does_not_overwrite_existing_store():
+    """Seeding only imports into an empty store"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _, xlsx_path = seed_schedule(tmp, SCHEDULE, store=False)
+        store = ScheduleStore(os.path.join(tmp, "store.db"))
+        store.import_excel(xlsx_path)
+        store.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "17:00", False)
+        assert store.import_excel(xlsx_path, replace=False) == 0
+        assert store.fetch_slots("Dr. Smith", "Main Clinic")["date"].ne("2025-01-06").all()
+
+
+def test_concurrent_point_updates():
+    """Sessions booking different slots at once all land, without touching the workbook"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _, xlsx_path = seed_schedule(tmp, SCHEDULE, store=False)
+        mtime = os.stat(xlsx_path).st_mtime_ns
+        db_path = os.path.join(tmp, "store.db")
+        ScheduleStore(db_path).import_excel(xlsx_path)
+        rows = ScheduleStore(db_path).to_dataframe()
+
+        def book(row):
+            return ScheduleStore(db_path).set_availability(
+                row.doctor_name, row.location, row.date, row.start_time, row.end_time, False
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            updated = list(pool.map(book, rows.itertuples()))
+
+        assert updated == [1] * len(rows)
+        assert not ScheduleStore(db_path).to_dataframe()["available"].any()
+        assert os.stat(xlsx_path).st_mtime_ns == mtime
+
+
+def test_catalog_recomputed_only_on_import():
+    """The doctor/location catalogue is cached until the next import"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _, xlsx_path = seed_schedule(tmp, SCHEDULE, store=False)
+        store = ScheduleStore(os.path.join(tmp, "store.db"))
+        assert store.generation() == 0
+        store.import_excel(xlsx_path)
+        catalog = store.catalog()
+        assert catalog == {"doctors": DOCTORS, "locations": LOCATIONS,
+                           "doctor_locations": {d: LOCATIONS for d in DOCTORS}}
+
+        # Bookings don't touch the catalogue
+        store.set_availability("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "17:00", False)
+        assert store.catalog() is catalog
+
+        build_schedule(["Dr. Brown"], ["Main Clinic"], days=1, seed=3).to_excel(xlsx_path, index=False)
+        store.import_excel(xlsx_path)
+        assert store.generation() == 2
+        # Another process's store sees the import through the shared counter
+        assert ScheduleStore(store.db_path).generation() == 2
+        assert store.catalog() == {"doctors": ["Dr. Brown"], "locations": ["Main Clinic"],
+                                   "doctor_locations": {"Dr. Brown": ["Main Clinic"]}}
+
+
+if __name__ == "__main__":
+    test_import_and_query_match_workbook()
+    test_set_availability_and_export_round_trip()
+    test_seeding_does_not_overwrite_existing_store()
+    test_concurrent_point_updates()
+    test_catalog_recomputed_only_on_import()
+    print(" All schedule store tests passed!")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the vectorized slot engine returns the same slots as the
+original row-by-row implementation
+"""
+
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.helpers import _slots_from_schedule, get_available_slots
+from src.schedule_store import get_schedule_store
+
+
+def legacy_get_available_slots(df: pd.DataFrame, duration: int, doctor_name: str, location: str):
+    """Original iterrows/iloc implementation, kept as the reference output"""
+    df = df.copy()
+    doctor_name = doctor_name.strip()
+    location = location.strip()
+
+    df["start_time"] = pd.to_datetime(df["start_time"], format="%H:%M").dt.time
+    df["end_time"] = pd.to_datetime(df["end_time"], format="%H:%M").dt.time
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+
+    df = df[
+        (df["doctor_name"].str.strip() == doctor_name) &
+        (df["location"].str.strip() == location) &
+        (df["available"] == True)
+    ].copy()
+    if df.empty:
+        return []
+
+    df["start_dt"] = df.apply(lambda r: datetime.combine(r["date"], r["start_time"]), axis=1)
+    df["end_dt"] = df.apply(lambda r: datetime.combine(r["date"], r["end_time"]), axis=1)
+
+    available_slots = []
+
+    if duration == 30:
+        for _, row in df.iterrows():
+            slot_duration = row["end_dt"] - row["start_dt"]
+            available_slots.append({
+                "date": row["date"],
+                "start_time": row["start_time"].strftime("%H:%M"),
+                "end_time": row["end_time"].strftime("%H:%M"),
+                "location": row["location"],
+                "duration": str(slot_duration)
+            })
+
+    elif duration == 60:
+        df_sorted = df.sort_values(["date", "start_dt"]).reset_index(drop=True)
+        for i in range(len(df_sorted) - 1):
+            row1, row2 = df_sorted.iloc[i], df_sorted.iloc[i+1]
+            if (
+                row1["end_dt"] == row2["start_dt"] and
+                row1["date"] == row2["date"] and
+                row1["location"] == row2["location"]
+            ):
+                slot_duration = row2["end_dt"] - row1["start_dt"]
+                available_slots.append({
+                    "date": row1["date"].strftime("%Y-%m-%d"),
+                    "start_time": row1["start_time"].strftime("%H:%M"),
+                    "end_time": row2["end_time"].strftime("%H:%M"),
+                    "location": row1["location"],
+                    "duration": str(slot_duration)
+                })
+
+    return available_slots
+
+
+def build_schedule(doctors, locations, days, seed=0, availability=0.6, shuffle=False):
+    """Synthetic schedule in the same shape as data/doctor_schedules.xlsx"""
+    rng = random.Random(seed)
+    base_date = datetime(2025, 1, 6).date()
+    rows = []
+    for d in range(days):
+        current_date = (base_date + timedelta(days=d)).isoformat()
+        for doctor in doctors:
+            for location in locations:
+                for hour in list(range(9, 12)) + list(range(14, 17)):
+                    for minute in (0, 30):
+                        start = f"{hour:02d}:{minute:02d}"
+                        end = f"{hour:02d}:30" if minute == 0 else f"{hour + 1:02d}:00"
+                        rows.append({
+                            "doctor_name": doctor,
+                            "location": location,
+                            "date": current_date,
+                            "start_time": start,
+                            "end_time": end,
+                            "available": rng.random() < availability,
+                        })
+    if shuffle:
+        rng.shuffle(rows)
+    return pd.DataFrame(rows)
+
+
+def seed_schedule(tmp, schedule, store=True):
+    """Write a schedule workbook into tmp and seed a store from it; returns (db_path, xlsx_path)
+
+    schedule is a build_schedule() frame, or (start, end) rows that are all
+    available for Dr. Smith at Main Clinic on 2025-01-06. With store=False
+    only the workbook is written.
+    """
+    if not isinstance(schedule, pd.DataFrame):
+        schedule = pd.DataFrame([
+            {"doctor_name": "Dr. Smith", "location": "Main Clinic", "date": "2025-01-06",
+             "start_time": start, "end_time": end, "available": True}
+            for start, end in schedule
+        ])
+    db_path = os.path.join(tmp, "doctor_schedules.db")
+    xlsx_path = os.path.join(tmp, "doctor_schedules.xlsx")
+    schedule.to_excel(xlsx_path, index=False)
+    if store:
+        get_schedule_store(db_path, xlsx_path)
+    return db_path, xlsx_path
+
+
+def _assert_same(df, duration, doctor, location):
+    expected = legacy_get_available_slots(df, duration, doctor, location)
+    actual = _slots_from_schedule(df, duration, doctor, location)
+    assert actual == expected, f"Mismatch for {doctor}/{location}/{duration}"
+    return len(expected)
+
+
+def test_equivalence_on_synthetic_schedules():
+    """Vectorized output matches the legacy output for 30 and 60 minute visits"""
+    doctors = ["Dr. Smith", "Dr. Johnson", "Dr. Williams"]
+    locations = ["Main Clinic", "Downtown Office"]
+    for seed in range(5):
+        df = build_schedule(doctors, locations, days=4, seed=seed, shuffle=seed % 2 == 1)
+        total = 0
+        for doctor in doctors:
+            for location in locations:
+                for duration in (30, 60):
+                    total += _assert_same(df, duration, doctor, location)
+        assert total > 0
+
+
+def test_equivalence_edge_cases():
+    """Padding in names, duplicate rows and gaps behave as before"""
+    df = build_schedule(["Dr. Smith"], ["Main Clinic"], days=2, seed=3)
+    df.loc[::4, "doctor_name"] = " Dr. Smith "
+    df.loc[1::5, "location"] = "Main Clinic  "
+    df = pd.concat([df, df.iloc[:6]], ignore_index=True)
+
+    for duration in (30, 60):
+        _assert_same(df, duration, "Dr. Smith", "Main Clinic")
+        _assert_same(df, duration, "  Dr. Smith", "Main Clinic ")
+
+    assert _slots_from_schedule(df, 30, "Dr. Nobody", "Main Clinic") == []
+    # Durations off the 15-minute grid have no slots
+    assert _slots_from_schedule(df, 40, "Dr. Smith", "Main Clinic") == []
+
+
+def test_get_available_slots_reads_workbook():
+    """The public entry point still reads a workbook and returns the same slots"""
+    df = build_schedule(["Dr. Smith", "Dr. Robin"], ["Main Clinic"], days=3, seed=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schedule.xlsx")
+        df.to_excel(path, index=False)
+        stored = pd.read_excel(path)
+        for duration in (30, 60):
+            assert get_available_slots(path, duration, "Dr. Smith", "Main Clinic") == \
+                legacy_get_available_slots(stored, duration, "Dr. Smith", "Main Clinic")
+
+    assert get_available_slots("does/not/exist.xlsx", 30, "Dr. Smith", "Main Clinic") == []
+
+
+if __name__ == "__main__":
+    test_equivalence_on_synthetic_schedules()
+    test_equivalence_edge_cases()
+    test_get_available_slots_reads_workbook()
+    print(" All slot engine equivalence tests passed!")
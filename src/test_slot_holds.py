@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for TTL slot holds: a slot picked by one session is hidden from
+and unbookable by other sessions until it is confirmed, released or expires
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.helpers import get_available_slots
+from src.schedule_store import ScheduleStore, get_schedule_store
+from src.test_slot_engine import seed_schedule
+
+ROWS = [("09:00", "09:30"), ("09:30", "10:00"), ("10:00", "10:30")]
+SLOT = ("Dr. Smith", "Main Clinic", "2025-01-06")
+
+
+def _starts(db_path, duration, holder):
+    return [s["start_time"] for s in get_available_slots(db_path, duration, "Dr. Smith", "Main Clinic", holder=holder)]
+
+
+def test_hold_hidden_from_other_sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, ROWS)
+        store = get_schedule_store(db_path)
+        assert store.place_hold(*SLOT, "09:30", "10:00", holder="alice")
+
+        assert _starts(db_path, 30, "alice") == ["09:00", "09:30", "10:00"]
+        assert _starts(db_path, 30, "bob") == ["09:00", "10:00"]
+        # Both 60-minute slots overlap the held row
+        assert _starts(db_path, 60, "bob") == []
+
+        assert not store.place_hold(*SLOT, "09:00", "10:00", holder="bob")
+        assert not store.reserve_slot(*SLOT, "09:30", "10:00", holder="bob")
+        assert not store.reserve_slot(*SLOT, "09:30", "10:00")
+        assert store.reserve_slot(*SLOT, "09:30", "10:00", holder="alice")
+        assert _starts(db_path, 30, "alice") == ["09:00", "10:00"]
+
+
+def test_new_hold_replaces_previous_and_release_frees_it():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, ROWS)
+        store = get_schedule_store(db_path)
+        assert store.place_hold(*SLOT, "09:00", "09:30", holder="alice")
+        assert store.place_hold(*SLOT, "10:00", "10:30", holder="alice")
+        assert _starts(db_path, 30, "bob") == ["09:00", "09:30"]
+
+        assert store.release_hold("alice") == 1
+        assert _starts(db_path, 30, "bob") == ["09:00", "09:30", "10:00"]
+
+
+def test_abandoned_hold_expires():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ScheduleStore(seed_schedule(tmp, ROWS)[0])
+        assert store.place_hold(*SLOT, "09:00", "10:00", holder="alice", ttl_seconds=0.2)
+        assert store.sweep() == 0
+        assert len(store.fetch_slots("Dr. Smith", "Main Clinic", holder="bob")) == 1
+
+        time.sleep(0.3)
+        # Only the expired deadline is popped; the one hold covered both rows
+        assert store.sweep() == 1
+        assert len(store.sweeper) == 0
+        assert len(store.fetch_slots("Dr. Smith", "Main Clinic", holder="bob")) == 3
+        assert store.place_hold(*SLOT, "09:00", "09:30", holder="bob")
+        assert len(store.sweeper) == 1
+        count = store._conn().execute("SELECT COUNT(*) FROM slot_holds").fetchone()[0]
+        assert count == 1
+
+
+def test_released_hold_leaves_schedule_unchanged():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, ROWS)
+        store = get_schedule_store(db_path)
+        before = {duration: _starts(db_path, duration, "bob") for duration in (30, 60)}
+        rows = store.to_dataframe()
+
+        # 45 minutes over 30-minute rows: bob can't use 09:00-09:45, but the rows stay whole
+        assert store.place_hold(*SLOT, "09:00", "09:45", holder="alice")
+        assert _starts(db_path, 30, "bob") == ["10:00"]
+        assert store.release_hold("alice") == 1
+
+        assert {duration: _starts(db_path, duration, "bob") for duration in (30, 60)} == before
+        pd.testing.assert_frame_equal(store.to_dataframe(), rows)
+        xlsx_path = os.path.join(tmp, "export.xlsx")
+        store.export_excel(xlsx_path)
+        assert get_available_slots(xlsx_path, 30, "Dr. Smith", "Main Clinic") == \
+            get_available_slots(db_path, 30, "Dr. Smith", "Main Clinic")
+
+        # Booking the 45 minutes is what cuts the row, and only the booked time is taken
+        assert store.place_hold(*SLOT, "09:00", "09:45", holder="alice")
+        assert store.reserve_slot(*SLOT, "09:00", "09:45", holder="alice")
+        assert _starts(db_path, 15, "bob") == ["09:45", "10:00"]
+        assert store._conn().execute("SELECT COUNT(*) FROM slot_holds").fetchone()[0] == 0
+
+
+if __name__ == "__main__":
+    test_hold_hidden_from_other_sessions()
+    test_new_hold_replaces_previous_and_release_frees_it()
+    test_abandoned_hold_expires()
+    test_released_hold_leaves_schedule_unchanged()
+    print(" All slot hold tests passed!")
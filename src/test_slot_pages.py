@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for paginated slot listings: pages add up to the full listing,
+cursors are opaque and tied to their search, bookings between pages don't
+shift what comes next, and slot tokens resolve a selection without listing
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.availability import get_availability_index
+from src.helpers import (
+    decode_slot_cursor, encode_slot_token, get_available_slots, get_slot_page, iter_available_slots,
+    slot_from_token,
+)
+from src.schedule_store import get_schedule_store
+from src.test_slot_engine import build_schedule, seed_schedule
+
+DOCTOR, LOCATION = "Dr. Smith", "Main Clinic"
+SCHEDULE = build_schedule([DOCTOR, "Dr. Johnson"], [LOCATION], days=10, seed=5)
+
+
+def _all_pages(path, duration, page_size):
+    pages, cursor = [], None
+    while True:
+        page, cursor = get_slot_page(path, duration, DOCTOR, LOCATION, page_size=page_size, cursor=cursor)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_full_listing():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, xlsx_path = seed_schedule(tmp, SCHEDULE)
+        for duration in (30, 60):
+            full = get_available_slots(db_path, duration, DOCTOR, LOCATION)
+            assert list(iter_available_slots(db_path, duration, DOCTOR, LOCATION)) == full
+            for page_size in (1, 7, len(full), len(full) + 5):
+                pages = _all_pages(db_path, duration, page_size)
+                assert [slot for page in pages for slot in page] == full
+                assert all(len(page) == page_size for page in pages[:-1])
+            # Workbook paths page the same way
+            assert [s for p in _all_pages(xlsx_path, duration, 9) for s in p] == \
+                get_available_slots(xlsx_path, duration, DOCTOR, LOCATION)
+
+
+def test_cursor_is_tied_to_its_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, SCHEDULE)
+        first, cursor = get_slot_page(db_path, 30, DOCTOR, LOCATION, page_size=5)
+        assert decode_slot_cursor(cursor, 30, DOCTOR, LOCATION) == (str(first[-1]["date"]), first[-1]["start_time"])
+        # Another doctor, duration or a garbled token starts from the beginning
+        assert decode_slot_cursor(cursor, 60, DOCTOR, LOCATION) is None
+        assert decode_slot_cursor(cursor, 30, "Dr. Johnson", LOCATION) is None
+        assert decode_slot_cursor("not-a-cursor", 30, DOCTOR, LOCATION) is None
+        assert get_slot_page(db_path, 60, DOCTOR, LOCATION, page_size=5, cursor=cursor)[0] == \
+            get_slot_page(db_path, 60, DOCTOR, LOCATION, page_size=5)[0]
+
+
+def test_bookings_do_not_shift_later_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, SCHEDULE)
+        first, cursor = get_slot_page(db_path, 30, DOCTOR, LOCATION, page_size=5)
+        second, _ = get_slot_page(db_path, 30, DOCTOR, LOCATION, page_size=5, cursor=cursor)
+
+        # Someone books a slot on the first page; the second page is unchanged
+        booked = first[0]
+        get_schedule_store(db_path).reserve_slot(DOCTOR, LOCATION, booked["date"], booked["start_time"], booked["end_time"])
+        assert get_slot_page(db_path, 30, DOCTOR, LOCATION, page_size=5, cursor=cursor)[0] == second
+
+
+def test_slot_token_round_trip_and_recheck():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, SCHEDULE)
+        page, _ = get_slot_page(db_path, 30, DOCTOR, LOCATION, page_size=3)
+        token = encode_slot_token(30, DOCTOR, LOCATION, page[1])
+        assert slot_from_token(token, 30, DOCTOR, LOCATION) == {**page[1], "slot_token": token}
+        assert slot_from_token(token, 60, DOCTOR, LOCATION) is None
+        assert slot_from_token(token, 30, "Dr. Johnson", LOCATION) is None
+        assert slot_from_token("2", 30, DOCTOR, LOCATION) is None
+
+        index = get_availability_index(db_path)
+        slot = page[1]
+        assert index.is_open(DOCTOR, LOCATION, slot["date"], slot["start_time"], 30)
+        get_schedule_store(db_path).place_hold(DOCTOR, LOCATION, slot["date"], slot["start_time"], slot["end_time"], "alice")
+        assert index.is_open(DOCTOR, LOCATION, slot["date"], slot["start_time"], 30, holder="alice")
+        assert not index.is_open(DOCTOR, LOCATION, slot["date"], slot["start_time"], 30, holder="bob")
+        assert not index.is_open(DOCTOR, LOCATION, "2030-01-01", slot["start_time"], 30)
+
+
+if __name__ == "__main__":
+    test_pages_cover_full_listing()
+    test_cursor_is_tied_to_its_search()
+    test_bookings_do_not_shift_later_pages()
+    test_slot_token_round_trip_and_recheck()
+    print(" All slot pagination tests passed!")
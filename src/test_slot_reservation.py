@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Stress test for atomic slot reservation: many concurrent bookers, in threads
+and in separate processes, competing for a handful of slots
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.schedule_store import ScheduleStore
+from src.test_slot_engine import seed_schedule
+
+# Four half-hour rows; bookers ask for 30-minute slots and overlapping 60-minute slots
+ROWS = [("09:00", "09:30"), ("09:30", "10:00"), ("10:00", "10:30"), ("10:30", "11:00")]
+WANTED = ROWS + [("09:00", "10:00"), ("09:30", "10:30"), ("10:00", "11:00")]
+
+
+def _booker(db_path, seed, attempts=30):
+    """Try to book random slots; return the ones this booker won"""
+    rng = random.Random(seed)
+    store = ScheduleStore(db_path)
+    won = []
+    for _ in range(attempts):
+        start, end = rng.choice(WANTED)
+        if store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", start, end):
+            won.append((start, end))
+    return won
+
+
+def _assert_no_double_booking(db_path, wins):
+    # Every schedule row was claimed by at most one winning booking
+    claimed = {}
+    for start, end in wins:
+        for row in ROWS:
+            if start <= row[0] and row[1] <= end:
+                assert row not in claimed, f"{row} booked twice: {claimed[row]} and {(start, end)}"
+                claimed[row] = (start, end)
+
+    df = ScheduleStore(db_path).to_dataframe()
+    booked = set(zip(df.loc[~df["available"], "start_time"], df.loc[~df["available"], "end_time"]))
+    assert booked == set(claimed)
+
+
+def test_threads_never_double_book():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, ROWS)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: _booker(db_path, i), range(32)))
+        wins = [slot for won in results for slot in won]
+        assert wins
+        _assert_no_double_booking(db_path, wins)
+
+
+def test_processes_never_double_book():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, ROWS)
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(6) as pool:
+            results = pool.starmap(_booker, [(db_path, i) for i in range(12)])
+        wins = [slot for won in results for slot in won]
+        assert wins
+        _assert_no_double_booking(db_path, wins)
+
+
+def test_reserve_requires_whole_block_available():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ScheduleStore(seed_schedule(tmp, ROWS)[0])
+        assert store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:30", "10:00")
+        # Overlaps the booked row: must fail and leave 09:00 free
+        assert not store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "10:00")
+        assert store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "09:30")
+        # Not on row boundaries / not in the schedule at all
+        assert not store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "10:15", "10:45")
+        assert not store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-07", "10:00", "10:30")
+        assert store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "10:00", "11:00")
+
+
+if __name__ == "__main__":
+    test_threads_never_double_book()
+    test_processes_never_double_book()
+    test_reserve_requires_whole_block_available()
+    print(" All slot reservation stress tests passed!")
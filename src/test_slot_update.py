@@ -3,22 +3,36 @@
 Test script to verify slot availability update functionality
 """
 
-import pandas as pd
 import os
+import sys
+import tempfile
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.availability import get_availability_index
+from src.schedule_store import get_schedule_store
+from src.test_slot_engine import build_schedule, seed_schedule
+
 def test_slot_update():
     """Test the slot availability update functionality"""
     print("Testing slot availability update functionality...")
     
-    # Check if doctor_schedules.xlsx exists
-    file_path = "data/doctor_schedules.xlsx"
-    if not os.path.exists(file_path):
-        print(" doctor_schedules.xlsx not found. Please run the app first to generate data.")
-        return False
-    
+    # Slot searches and updates go through a schedule store seeded in a temp directory,
+    # so the app's data/doctor_schedules.db is left alone
+    import app
+    get_index = app.get_availability_index
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, _ = seed_schedule(tmp, build_schedule(["Dr. Smith", "Dr. Johnson"], ["Main Clinic"], days=2, seed=1))
+        app.get_availability_index = lambda: get_availability_index(db_path)
+        try:
+            return _check_slot_update(get_schedule_store(db_path), app)
+        finally:
+            app.get_availability_index = get_index
+
+def _check_slot_update(store, app):
     # Read the current schedule
-    df = pd.read_excel(file_path)
+    df = store.to_dataframe()
     print(f" Loaded schedule with {len(df)} total slots")
     
     # Show current availability status
@@ -40,14 +54,9 @@ def test_slot_update():
         test_slot = available_slots.iloc[0]
         print(f"\n Testing with slot: {test_slot['doctor_name']} at {test_slot['location']} on {test_slot['date']} from {test_slot['start_time']} to {test_slot['end_time']}")
         
-        # Import the update function
-        import sys
-        sys.path.append('.')
-        from app import update_slot_availability, restore_slot_availability
-        
         # Test setting to unavailable
         print(" Setting slot to unavailable...")
-        result1 = update_slot_availability(
+        result1 = app.update_slot_availability(
             test_slot['doctor_name'],
             test_slot['location'], 
             test_slot['date'],
@@ -60,7 +69,7 @@ def test_slot_update():
             print(" Successfully set slot to unavailable")
             
             # Verify the change
-            df_updated = pd.read_excel(file_path)
+            df_updated = store.to_dataframe()
             updated_slot = df_updated[
                 (df_updated['doctor_name'] == test_slot['doctor_name']) &
                 (df_updated['location'] == test_slot['location']) &
@@ -77,7 +86,7 @@ def test_slot_update():
             
             # Test restoring to available
             print("Restoring slot to available...")
-            result2 = restore_slot_availability(
+            result2 = app.restore_slot_availability(
                 test_slot['doctor_name'],
                 test_slot['location'],
                 test_slot['date'], 
@@ -89,7 +98,7 @@ def test_slot_update():
                 print(" Successfully restored slot to available")
                 
                 # Verify the restoration
-                df_restored = pd.read_excel(file_path)
+                df_restored = store.to_dataframe()
                 restored_slot = df_restored[
                     (df_restored['doctor_name'] == test_slot['doctor_name']) &
                     (df_restored['location'] == test_slot['location']) &
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the SMTP connection pool: logged-in connections are reused,
+dropped ones are detected and replaced, batches go over one connection with
+per-message errors, connections stay within the pool size, and due reminders
+are marked sent only once the server accepts them
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.mime.text import MIMEText
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.smtp_pool import SMTPPool
+from src.smtp_sink import SMTPSink
+
+
+def _message(to_email, subject="Appointment Confirmation"):
+    msg = MIMEText("See you soon", "plain")
+    msg["From"] = "clinic@example.com"
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    return msg
+
+
+def _pool(sink, **kwargs):
+    return SMTPPool(sink.host, sink.port, "clinic@example.com", "secret", starttls=False, timeout=5, **kwargs)
+
+
+def test_connections_reused():
+    with SMTPSink() as sink:
+        pool = _pool(sink)
+        for i in range(5):
+            pool.send(_message(f"patient{i}@example.com"))
+        assert sink.connections == 1
+        assert len(sink.messages) == 5 and sink.messages[0][0] == ["patient0@example.com"]
+        stats = pool.stats()
+        assert stats["connects"] == 1 and stats["reuses"] == 4 and stats["sent"] == 5
+        pool.close()
+        assert pool.stats()["idle"] == 0
+
+
+def test_dropped_connections_replaced():
+    with SMTPSink() as sink:
+        # Used again right away: the failed send itself reveals the drop
+        pool = _pool(sink)
+        pool.send(_message("a@example.com"))
+        sink.drop_connections()
+        time.sleep(0.05)
+        pool.send(_message("b@example.com"))
+        assert pool.stats()["reconnects"] == 1 and sink.connections == 2
+        assert [m[0] for m in sink.messages] == [["a@example.com"], ["b@example.com"]]
+
+        # Idle past the check interval: NOOP finds the drop before sending
+        checked = _pool(sink, check_after_seconds=0)
+        checked.send(_message("c@example.com"))
+        sink.drop_connections()
+        time.sleep(0.05)
+        checked.send(_message("d@example.com"))
+        stats = checked.stats()
+        assert stats["health_checks"] == 1 and stats["reconnects"] == 0 and stats["connects"] == 2
+        assert len(sink.messages) == 4
+
+
+def test_batches_and_pool_size():
+    with SMTPSink(reply_delay=0.002) as sink:
+        pool = _pool(sink, size=2)
+        batch = [_message("a@example.com"), _message("reject@example.com"), _message("c@example.com")]
+        results = pool.send_many(batch)
+        assert results[0] is None and results[2] is None
+        assert results[1] is not None
+        assert sink.connections == 1 and len(sink.messages) == 2
+        assert pool.stats()["failed"] == 1
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(lambda i: pool.send(_message(f"p{i}@example.com")), range(12)))
+        assert sink.connections <= 2
+        assert len(sink.messages) == 14
+
+
+def test_due_reminders_marked_sent_only_when_accepted():
+    import main
+
+    def booking(email):
+        return main.setup_reminder_system({
+            "appointment_confirmed": True, "selected_time_date": "2030-01-10", "selected_time_start": "09:00",
+            "patient_email": email, "patient_name": "Willie Mays", "appointment_id": "APT-1",
+            "doctor": "Dr. Smith", "location": "Main Clinic",
+        })
+
+    bookings = [booking("willie@example.com"), booking("reject@example.com")]
+    now = datetime(2030, 1, 9, 12, 0)
+    sender, password = main.EMAIL_SENDER, main.EMAIL_PASSWORD
+    try:
+        # No credentials and no pool: nothing goes out, so nothing is marked sent
+        main.EMAIL_SENDER = main.EMAIL_PASSWORD = None
+        assert main.send_reminders(bookings, now) == 0
+        assert not any(r.get("sent") for b in bookings for r in b["reminders"])
+    finally:
+        main.EMAIL_SENDER, main.EMAIL_PASSWORD = sender, password
+
+    with SMTPSink() as sink:
+        pool = _pool(sink)
+        # The 3-day and 1-day reminders are due; the 2-hour one isn't yet
+        assert main.send_reminders(bookings, now, pool=pool) == 2
+        assert [r.get("sent") for r in bookings[0]["reminders"]] == [True, True, None]
+        assert not any(r.get("sent") for r in bookings[1]["reminders"])
+        assert sink.connections == 1 and [m[0] for m in sink.messages] == [["willie@example.com"]] * 2
+
+        # Already sent ones aren't sent again; refused ones are retried
+        assert main.send_reminders(bookings, now, pool=pool) == 0
+        assert len(sink.messages) == 2
+
+
+if __name__ == "__main__":
+    test_connections_reused()
+    test_dropped_connections_replaced()
+    test_batches_and_pool_size()
+    test_due_reminders_marked_sent_only_when_accepted()
+    print(" All SMTP pool tests passed!")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-session step memo in app.py: a step's result is reused
+across Streamlit reruns while its inputs are unchanged, recomputed when the
+patient or schedule data behind it changes, and only the latest result per
+step is kept
+"""
+
+import os
+import sys
+import tempfile
+
+import streamlit as st
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.patient_index import PatientIndex
+from src.schedule_store import get_schedule_store
+from src.test_slot_engine import seed_schedule
+
+
+def _app():
+    # Imported here: loading the app sets up its data files and LLM client
+    import app
+    st.session_state.step_memo = {}
+    return app
+
+
+def _counter():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"run": len(calls)}
+
+    return calls, compute
+
+
+def test_unchanged_inputs_reuse_result():
+    app = _app()
+    calls, compute = _counter()
+    assert app.memoized_step("lookup", ("Willie Mays", "2003-11-11", "v1"), compute) == {"run": 1}
+    # A rerun with the same inputs reuses the result
+    assert app.memoized_step("lookup", ("Willie Mays", "2003-11-11", "v1"), compute) == {"run": 1}
+    assert app.memoized_step("lookup", ("Hank Aaron", "2003-11-11", "v1"), compute) == {"run": 2}
+    # Each step has its own entry
+    assert app.memoized_step("scheduling", ("Hank Aaron", "2003-11-11", "v1"), compute) == {"run": 3}
+    assert app.memoized_step("lookup", ("Hank Aaron", "2003-11-11", "v1"), compute) == {"run": 2}
+    assert len(calls) == 3
+
+
+def test_data_changes_invalidate():
+    app = _app()
+    get_patient_index, get_store = app.get_patient_index, app.get_schedule_store
+    with tempfile.TemporaryDirectory() as tmp:
+        index = PatientIndex(os.path.join(tmp, "patients.csv"), os.path.join(tmp, "patients_index.db"))
+        db_path, _ = seed_schedule(tmp, [("09:00", "09:30"), ("09:30", "10:00")])
+        store = get_schedule_store(db_path)
+        try:
+            app.get_patient_index = lambda: index
+            app.get_schedule_store = lambda: store
+
+            # Lookup: registering (or editing) a patient changes data/patients.csv
+            appt = {"patient_name": "Willie Mays", "date_of_birth": "2003-11-11"}
+            calls, compute = _counter()
+            app.memoized_step("lookup", app._lookup_inputs(appt), compute)
+            app.memoized_step("lookup", app._lookup_inputs(appt), compute)
+            assert len(calls) == 1
+            with open(index.csv_path, "a", encoding="utf-8") as f:
+                f.write("1,Willie,Mays,2003-11-11\n")
+            app.memoized_step("lookup", app._lookup_inputs(appt), compute)
+            assert len(calls) == 2
+
+            # Scheduling: a booking for this doctor/location bumps the store's version
+            appt = {"patient_type": "new", "appointment_duration": 30, "doctor": "Dr. Smith", "location": "Main Clinic"}
+            calls, compute = _counter()
+            app.memoized_step("scheduling", app._scheduling_inputs(appt), compute)
+            app.memoized_step("scheduling", app._scheduling_inputs(appt), compute)
+            assert len(calls) == 1
+            assert store.reserve_slot("Dr. Smith", "Main Clinic", "2025-01-06", "09:00", "09:30")
+            app.memoized_step("scheduling", app._scheduling_inputs(appt), compute)
+            assert len(calls) == 2
+            # So does paging through the slots
+            appt["slot_cursor"] = "next-page"
+            app.memoized_step("scheduling", app._scheduling_inputs(appt), compute)
+            assert len(calls) == 3
+        finally:
+            app.get_patient_index, app.get_schedule_store = get_patient_index, get_store
+
+
+def test_one_entry_per_step():
+    app = _app()
+    for i in range(50):
+        app.memoized_step("lookup", (f"Patient {i}",), lambda: i)
+        app.memoized_step("scheduling", (f"Patient {i}",), lambda: i)
+    # Every new input replaces the step's previous entry
+    assert sorted(st.session_state.step_memo) == ["lookup", "scheduling"]
+    assert st.session_state.step_memo["lookup"] == (("Patient 49",), 49)
+
+
+if __name__ == "__main__":
+    test_unchanged_inputs_reuse_result()
+    test_data_changes_invalidate()
+    test_one_entry_per_step()
+    print(" All step memo tests passed!")